@@ -0,0 +1,307 @@
+"""
+Public read-only JSON API (/api/v1/)
+Archives, insights and book reviews for the PWA, mobile clients and
+partners. Lists use the same keyset cursors as the site's grids, `fields=`
+limits both the JSON and the columns loaded (each field declares the
+model columns and relations it needs), and every response carries an ETag
+so unchanged results come back as 304 Not Modified.
+
+Query parameters: `fields` (comma separated; defaults omit the long text
+fields), `cursor`, `limit` (1-100) and the per-resource filters below.
+"""
+import hashlib
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_GET
+from archives.models import Archive
+from books.models import BookReview
+from core.images import srcset, thumbnail_url
+from core.pagination import keyset_paginate
+from insights.models import InsightPost
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+CACHE_MAX_AGE = 60
+
+
+class Field:
+    """One API field: how to compute it and which columns/relations it reads"""
+
+    def __init__(self, value, only=(), select=(), prefetch=()):
+        self.value = value
+        self.only = only
+        self.select = select
+        self.prefetch = prefetch
+
+
+def attr(name, only=None):
+    return Field(lambda obj, request: getattr(obj, name), only=only or (name,))
+
+
+def _user_field(relation):
+    return Field(
+        lambda obj, request: {
+            'username': getattr(obj, relation).username,
+            'name': getattr(obj, relation).get_display_name(),
+        },
+        only=(f'{relation}__username', f'{relation}__full_name', f'{relation}__email'),
+        select=(relation,),
+    )
+
+
+def _image_field(name):
+    def value(obj, request):
+        fieldfile = getattr(obj, name)
+        if not fieldfile:
+            return None
+        return {
+            'url': request.build_absolute_uri(fieldfile.url),
+            'thumbnail': request.build_absolute_uri(thumbnail_url(fieldfile)),
+            'srcset': srcset(fieldfile),
+        }
+    return Field(value, only=(name,))
+
+
+def _url_field(viewname, key):
+    return Field(
+        lambda obj, request: request.build_absolute_uri(reverse(viewname, args=[getattr(obj, key)])),
+        only=(key,),
+    )
+
+
+TAGS = Field(lambda obj, request: [tag.name for tag in obj.tags.all()], prefetch=('tags',))
+CONTENT = Field(lambda obj, request: obj.content, only=('content_json', 'legacy_content'))
+
+
+def _archive_media(obj, request):
+    primary = obj.get_primary_file()
+    preview = obj.image if obj.archive_type == 'image' else obj.featured_image
+    return {
+        'url': request.build_absolute_uri(primary.url) if primary else None,
+        'thumbnail': request.build_absolute_uri(thumbnail_url(preview)) if preview else None,
+        'srcset': srcset(preview) if preview else '',
+    }
+
+
+class Resource:
+    """A model exposed by the API, with its base queryset, fields and filters"""
+
+    def __init__(self, model, queryset, fields, default_fields, filters, lookup='pk'):
+        self.model = model
+        self.queryset = queryset
+        self.fields = fields
+        self.default_fields = default_fields
+        self.filters = filters
+        self.lookup = lookup
+
+    def select_fields(self, request):
+        """The requested field names, or raise ValueError naming the unknown ones"""
+        requested = request.GET.get('fields')
+        if not requested:
+            return self.default_fields
+        names = [name.strip() for name in requested.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(self.fields)}")
+        return names
+
+    def get_queryset(self, names):
+        """The base queryset loading only the columns and relations `names` need"""
+        only, select, prefetch = {'created_at'}, set(), set()
+        for name in names:
+            field = self.fields[name]
+            only.update(field.only)
+            select.update(field.select)
+            prefetch.update(field.prefetch)
+        queryset = self.queryset().only(*only)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+    def serialize(self, obj, names, request):
+        return {name: self.fields[name].value(obj, request) for name in names}
+
+
+ARCHIVES = Resource(
+    Archive,
+    queryset=lambda: Archive.objects.filter(is_approved=True),
+    fields={
+        'id': attr('id'),
+        'url': _url_field('archives:detail', 'pk'),
+        'title': attr('title'),
+        'description': attr('description'),
+        'archive_type': attr('archive_type'),
+        'category': Field(
+            lambda obj, request: {'slug': obj.category.slug, 'name': obj.category.name} if obj.category else None,
+            only=('category__slug', 'category__name'),
+            select=('category',),
+        ),
+        'tags': TAGS,
+        'caption': attr('caption'),
+        'alt_text': attr('alt_text'),
+        'original_author': attr('original_author'),
+        'date_created': attr('date_created'),
+        'circa_date': attr('circa_date'),
+        'location': attr('location'),
+        'media': Field(
+            _archive_media,
+            only=('archive_type', 'image', 'video', 'document', 'audio', 'featured_image'),
+        ),
+        'uploaded_by': _user_field('uploaded_by'),
+        'created_at': attr('created_at'),
+        'updated_at': attr('updated_at'),
+    },
+    default_fields=[
+        'id', 'url', 'title', 'archive_type', 'category', 'tags', 'caption', 'original_author',
+        'date_created', 'circa_date', 'location', 'media', 'created_at',
+    ],
+    filters={
+        'type': lambda queryset, value: queryset.filter(archive_type=value),
+        'category': lambda queryset, value: queryset.filter(category__slug=value),
+        'tag': lambda queryset, value: queryset.filter(tags__name=value),
+    },
+)
+
+INSIGHTS = Resource(
+    InsightPost,
+    queryset=lambda: InsightPost.objects.filter(is_published=True, is_approved=True),
+    fields={
+        'id': attr('id'),
+        'slug': attr('slug'),
+        'url': _url_field('insights:detail', 'slug'),
+        'title': attr('title'),
+        'excerpt': attr('excerpt'),
+        'content': CONTENT,
+        'content_html': attr('content_html'),
+        'featured_image': _image_field('featured_image'),
+        'alt_text': attr('alt_text'),
+        'tags': TAGS,
+        'author': _user_field('author'),
+        'created_at': attr('created_at'),
+        'updated_at': attr('updated_at'),
+    },
+    default_fields=['id', 'slug', 'url', 'title', 'excerpt', 'featured_image', 'tags', 'author', 'created_at'],
+    filters={
+        'tag': lambda queryset, value: queryset.filter(tags__name=value),
+    },
+    lookup='slug',
+)
+
+BOOKS = Resource(
+    BookReview,
+    queryset=lambda: BookReview.objects.filter(is_published=True, is_approved=True),
+    fields={
+        'id': attr('id'),
+        'slug': attr('slug'),
+        'url': _url_field('books:detail', 'slug'),
+        'book_title': attr('book_title'),
+        'author': attr('author'),
+        'isbn': attr('isbn'),
+        'publisher': attr('publisher'),
+        'publication_year': attr('publication_year'),
+        'review_title': attr('review_title'),
+        'rating': attr('rating'),
+        'content': CONTENT,
+        'content_html': attr('content_html'),
+        'cover_image': _image_field('cover_image'),
+        'tags': TAGS,
+        'reviewer': _user_field('reviewer'),
+        'created_at': attr('created_at'),
+        'updated_at': attr('updated_at'),
+    },
+    default_fields=[
+        'id', 'slug', 'url', 'book_title', 'author', 'review_title', 'rating', 'cover_image', 'tags',
+        'reviewer', 'created_at',
+    ],
+    filters={
+        'tag': lambda queryset, value: queryset.filter(tags__name=value),
+        'rating': lambda queryset, value: queryset.filter(rating__gte=int(value)),
+    },
+    lookup='slug',
+)
+
+
+def _error(message, status):
+    response = JsonResponse({'error': message}, status=status)
+    response['Access-Control-Allow-Origin'] = '*'
+    return response
+
+
+def _conditional_json(request, data):
+    """Serialise `data` and answer If-None-Match with a 304 when the body is unchanged"""
+    content = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+    etag = '"%s"' % hashlib.md5(content.encode()).hexdigest()
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={CACHE_MAX_AGE}'
+    response['Access-Control-Allow-Origin'] = '*'
+    return response
+
+
+def resource_list(request, resource):
+    try:
+        names = resource.select_fields(request)
+        limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        queryset = resource.get_queryset(names)
+        for param, apply_filter in resource.filters.items():
+            if request.GET.get(param):
+                queryset = apply_filter(queryset, request.GET[param])
+    except ValueError as e:
+        return _error(str(e), 400)
+
+    page = keyset_paginate(queryset, request.GET.get('cursor'), limit, querydict=request.GET)
+    next_url = None
+    if page.next_cursor:
+        next_url = request.build_absolute_uri(f'{request.path}?{page.next_querystring}')
+    return _conditional_json(request, {
+        'results': [resource.serialize(obj, names, request) for obj in page],
+        'next': next_url,
+    })
+
+
+def resource_detail(request, resource, key):
+    try:
+        names = resource.select_fields(request)
+    except ValueError as e:
+        return _error(str(e), 400)
+    obj = resource.get_queryset(names).filter(**{resource.lookup: key}).first()
+    if obj is None:
+        return _error('Not found', 404)
+    return _conditional_json(request, resource.serialize(obj, names, request))
+
+
+@require_GET
+def archive_list(request):
+    return resource_list(request, ARCHIVES)
+
+
+@require_GET
+def archive_detail(request, pk):
+    return resource_detail(request, ARCHIVES, pk)
+
+
+@require_GET
+def insight_list(request):
+    return resource_list(request, INSIGHTS)
+
+
+@require_GET
+def insight_detail(request, slug):
+    return resource_detail(request, INSIGHTS, slug)
+
+
+@require_GET
+def book_list(request):
+    return resource_list(request, BOOKS)
+
+
+@require_GET
+def book_detail(request, slug):
+    return resource_detail(request, BOOKS, slug)
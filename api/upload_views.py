@@ -0,0 +1,124 @@
+"""
+Resumable upload endpoints (a subset of the tus 1.0 protocol: core,
+creation, checksum and termination extensions).
+
+    POST   /api/uploads/          Upload-Length, Upload-Metadata -> 201 + Location
+    HEAD   /api/uploads/<id>/     -> Upload-Offset, Upload-Length
+    PATCH  /api/uploads/<id>/     Upload-Offset, optional Upload-Checksum: sha256 <base64>
+    DELETE /api/uploads/<id>/     abandon the upload
+
+Upload-Metadata carries base64 values for `filename`, `kind` (video or audio)
+and optionally `checksum` (hex SHA-256 of the whole file).
+"""
+import base64
+import binascii
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_http_methods
+from archives.models import ChunkedUpload
+from archives.uploads import UploadError, append_chunk, create_upload, discard_upload
+
+TUS_VERSION = '1.0.0'
+
+
+def _tus_response(status=204, **headers):
+    response = HttpResponse(status=status)
+    response['Tus-Resumable'] = TUS_VERSION
+    response['Cache-Control'] = 'no-store'
+    for name, value in headers.items():
+        response[name.replace('_', '-')] = str(value)
+    return response
+
+
+def _error_response(error):
+    response = JsonResponse({'status': 'error', 'message': str(error)}, status=error.status)
+    response['Tus-Resumable'] = TUS_VERSION
+    return response
+
+
+def _parse_metadata(header):
+    metadata = {}
+    for pair in filter(None, (part.strip() for part in header.split(','))):
+        key, _, value = pair.partition(' ')
+        try:
+            metadata[key] = base64.b64decode(value).decode() if value else ''
+        except (binascii.Error, UnicodeDecodeError):
+            raise UploadError(f'Invalid Upload-Metadata value for {key}')
+    return metadata
+
+
+def _parse_int_header(request, name):
+    try:
+        value = int(request.headers.get(name, ''))
+    except ValueError:
+        raise UploadError(f'{name} header is required')
+    if value < 0:
+        raise UploadError(f'{name} must not be negative')
+    return value
+
+
+@login_required
+@require_http_methods(["OPTIONS", "POST"])
+def upload_create(request):
+    """Start a resumable upload"""
+    if request.method == 'OPTIONS':
+        return _tus_response(
+            Tus_Version=TUS_VERSION,
+            Tus_Extension='creation,checksum,termination',
+            Tus_Checksum_Algorithm='sha256',
+            Tus_Max_Chunk_Size=settings.CHUNKED_UPLOAD_MAX_CHUNK,
+        )
+    try:
+        size = _parse_int_header(request, 'Upload-Length')
+        metadata = _parse_metadata(request.headers.get('Upload-Metadata', ''))
+        upload = create_upload(
+            request.user,
+            metadata.get('kind', ''),
+            metadata.get('filename', ''),
+            size,
+            metadata.get('checksum', ''),
+        )
+    except UploadError as e:
+        return _error_response(e)
+    return _tus_response(
+        status=201,
+        Location=request.build_absolute_uri(reverse('api:upload_detail', args=[upload.pk])),
+        Upload_Offset=0,
+    )
+
+
+@login_required
+@require_http_methods(["HEAD", "PATCH", "DELETE"])
+def upload_detail(request, upload_id):
+    """Report, extend or abandon a resumable upload"""
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+
+    if request.method == 'HEAD':
+        return _tus_response(status=200, Upload_Offset=upload.offset, Upload_Length=upload.size)
+
+    if request.method == 'DELETE':
+        discard_upload(upload)
+        return _tus_response()
+
+    if request.content_type != 'application/offset+octet-stream':
+        return _tus_response(status=415)
+    try:
+        offset = _parse_int_header(request, 'Upload-Offset')
+        length = _parse_int_header(request, 'Content-Length')
+        chunk_checksum = None
+        if request.headers.get('Upload-Checksum'):
+            algorithm, _, encoded = request.headers['Upload-Checksum'].partition(' ')
+            if algorithm != 'sha256':
+                raise UploadError('Unsupported checksum algorithm')
+            try:
+                chunk_checksum = base64.b64decode(encoded)
+            except binascii.Error:
+                raise UploadError('Invalid Upload-Checksum')
+        # Read the body as a stream so chunks never go through request.body
+        upload = append_chunk(upload, offset, request, length, chunk_checksum)
+    except UploadError as e:
+        return _error_response(e)
+    return _tus_response(Upload_Offset=upload.offset)
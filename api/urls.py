@@ -1,6 +1,8 @@
 from django.urls import path
 from . import views
 from . import push_views
+from . import upload_views
+from . import rest_views
 
 app_name = 'api'
 
@@ -10,4 +12,12 @@ urlpatterns = [
     path('archive-media-browser/', views.archive_media_browser, name='archive_media_browser'),
     path('upload-image/', views.upload_image, name='upload_image'),
     path('get-categories/', views.get_categories, name='get_categories'),
+    path('uploads/', upload_views.upload_create, name='upload_create'),
+    path('uploads/<uuid:upload_id>/', upload_views.upload_detail, name='upload_detail'),
+    path('v1/archives/', rest_views.archive_list, name='v1_archive_list'),
+    path('v1/archives/<int:pk>/', rest_views.archive_detail, name='v1_archive_detail'),
+    path('v1/insights/', rest_views.insight_list, name='v1_insight_list'),
+    path('v1/insights/<slug:slug>/', rest_views.insight_detail, name='v1_insight_detail'),
+    path('v1/books/', rest_views.book_list, name='v1_book_list'),
+    path('v1/books/<slug:slug>/', rest_views.book_detail, name='v1_book_detail'),
 ]
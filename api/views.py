@@ -6,6 +6,10 @@ from django.core.paginator import Paginator
 from django.core.files.storage import default_storage
 from push_notifications.models import WebPushDevice
 from archives.models import Archive, Category
+from archives.search import archive_index
+from core.search import render_snippet
+from core.images import srcset, thumbnail_url
+from core.tags import sync_tags
 from insights.models import UploadedImage
 import json
 import os
@@ -78,7 +82,7 @@ def archive_media_browser(request):
     archives = Archive.objects.filter(is_approved=True)
     
     if search:
-        archives = archives.filter(title__icontains=search)
+        archives = archive_index.search(archives, search)
     
     if archive_type:
         archives = archives.filter(archive_type=archive_type)
@@ -109,16 +113,20 @@ def archive_media_browser(request):
             'alt_text': archive.alt_text,
         }
         
+        if search:
+            archive_data['snippet'] = str(render_snippet(archive.search_snippet))
+        
         # Get the appropriate file URL
         if archive.archive_type == 'image' and archive.image:
             archive_data['url'] = archive.image.url
-            archive_data['thumbnail'] = archive.image.url
+            archive_data['thumbnail'] = thumbnail_url(archive.image)
+            archive_data['srcset'] = srcset(archive.image)
         elif archive.archive_type == 'video' and archive.video:
             archive_data['url'] = archive.video.url
-            archive_data['thumbnail'] = archive.featured_image.url if archive.featured_image else ''
+            archive_data['thumbnail'] = thumbnail_url(archive.featured_image)
         elif archive.archive_type == 'audio' and archive.audio:
             archive_data['url'] = archive.audio.url
-            archive_data['thumbnail'] = archive.featured_image.url if archive.featured_image else ''
+            archive_data['thumbnail'] = thumbnail_url(archive.featured_image)
         elif archive.archive_type == 'document' and archive.document:
             archive_data['url'] = archive.document.url
             archive_data['thumbnail'] = ''
@@ -173,6 +181,7 @@ def upload_image(request):
         uploaded_by=request.user,
         is_approved=False  # Require admin approval to assign category
     )
+    sync_tags(archive, request.POST.get('tags', ''))
     
     file_url = request.build_absolute_uri(archive.image.url)
     
@@ -0,0 +1,117 @@
+"""
+Archive list facets
+Counts per category, archive type and decade for the archive list filters.
+All three come from a single grouped query over (category, type, year); each
+facet is then folded in Python with every *other* active filter applied, so
+the counts show what picking an option would return. Results are cached per
+filter signature and invalidated whenever an archive changes.
+"""
+import hashlib
+import json
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.functions import ExtractYear
+from .models import Archive, Category
+from .search import archive_index
+
+FACETS_VERSION_KEY = 'archive-facets-version'
+FACETS_TIMEOUT = 60 * 60
+
+
+def parse_decade(value):
+    """The decade start year for a `decade` filter value such as '1910', or None"""
+    try:
+        decade = int(value)
+    except (TypeError, ValueError):
+        return None
+    return decade - decade % 10
+
+
+def filter_by_decade(queryset, decade):
+    return queryset.filter(date_created__year__gte=decade, date_created__year__lt=decade + 10)
+
+
+def _version():
+    version = cache.get(FACETS_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.set(FACETS_VERSION_KEY, version, None)
+    return version
+
+
+def invalidate_facets():
+    """Make every cached facet result stale"""
+    try:
+        cache.incr(FACETS_VERSION_KEY)
+    except ValueError:
+        cache.set(FACETS_VERSION_KEY, 1, None)
+
+
+def _grouped_rows(search):
+    queryset = Archive.objects.filter(is_approved=True)
+    if search:
+        queryset = queryset.filter(pk__in=archive_index.search(Archive.objects.all(), search).values('pk'))
+    return [
+        (row['category_id'], row['archive_type'], row['year'], row['count'])
+        for row in queryset.order_by()
+        .annotate(year=ExtractYear('date_created'))
+        .values('category_id', 'archive_type', 'year')
+        .annotate(count=Count('id'))
+    ]
+
+
+def _fold(rows, category_id, archive_type, decade, skip):
+    """Sum rows by the `skip` dimension, applying the other active filters"""
+    counts = {}
+    for row_category, row_type, year, count in rows:
+        row_decade = year - year % 10 if year else None
+        if skip != 'category' and category_id is not None and row_category != category_id:
+            continue
+        if skip != 'type' and archive_type and row_type != archive_type:
+            continue
+        if skip != 'decade' and decade is not None and row_decade != decade:
+            continue
+        key = {'category': row_category, 'type': row_type, 'decade': row_decade}[skip]
+        if key is not None:
+            counts[key] = counts.get(key, 0) + count
+    return counts
+
+
+def archive_facets(category='', archive_type='', decade=None, search=''):
+    """
+    Facet options for the archive list, given the active filters:
+    {'category': [{'value', 'label', 'count'}], 'type': [...], 'decade': [...]}
+    """
+    signature = json.dumps([category or '', archive_type or '', decade, search or ''])
+    key = f'archive-facets:{_version()}:{hashlib.md5(signature.encode()).hexdigest()}'
+    facets = cache.get(key)
+    if facets is not None:
+        return facets
+
+    categories = list(Category.objects.order_by('name').values_list('id', 'slug', 'name'))
+    category_id = next((pk for pk, slug, name in categories if slug == category), None) if category else None
+    rows = _grouped_rows(search)
+
+    category_counts = _fold(rows, category_id, archive_type, decade, 'category')
+    type_counts = _fold(rows, category_id, archive_type, decade, 'type')
+    decade_counts = _fold(rows, category_id, archive_type, decade, 'decade')
+    if decade is not None:
+        # Keep the active decade selectable even when nothing else matches
+        decade_counts.setdefault(decade, 0)
+
+    facets = {
+        'category': [
+            {'value': slug, 'label': name, 'count': category_counts.get(pk, 0)}
+            for pk, slug, name in categories
+        ],
+        'type': [
+            {'value': value, 'label': label, 'count': type_counts.get(value, 0)}
+            for value, label in Archive.ARCHIVE_TYPES
+        ],
+        'decade': [
+            {'value': str(start), 'label': f'{start}s', 'count': count}
+            for start, count in sorted(decade_counts.items())
+        ],
+    }
+    cache.set(key, facets, FACETS_TIMEOUT)
+    return facets
@@ -0,0 +1,217 @@
+"""
+IIIF endpoints for image archives
+Serves the IIIF Image API 3.0 (level 0) from the precomputed tile pyramids in
+core/tiles.py, plus a Presentation 3.0 manifest, so OpenSeadragon, Mirador
+and other IIIF viewers can deep-zoom into an archive photo while fetching
+only the tiles in view. Tiles are static files, delivered by send_media_file
+with its ETag, Range and sendfile handling.
+"""
+import math
+import re
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse
+from django.views.decorators.http import require_GET
+from core.images import thumbnail_url
+from core.media import send_media_file
+from core.tiles import level_size, pyramid_info, tile_name
+from .models import Archive
+
+IMAGE_CONTEXT = 'http://iiif.io/api/image/3/context.json'
+PRESENTATION_CONTEXT = 'http://iiif.io/api/presentation/3/context.json'
+JSON_LD = 'application/ld+json;profile="{}"'
+
+REGION_RE = re.compile(r'^(\d+),(\d+),(\d+),(\d+)$')
+SIZE_RE = re.compile(r'^(\d*),(\d*)$')
+
+
+def _archive_and_info(pk):
+    archive = get_object_or_404(Archive, pk=pk, is_approved=True, archive_type='image')
+    info = pyramid_info(archive.image)
+    if info is None:
+        raise Http404('Tiles for this image have not been generated yet')
+    return archive, info
+
+
+def _json(request, data, context):
+    response = JsonResponse(data, json_dumps_params={'indent': 2})
+    if 'application/ld+json' in request.headers.get('Accept', ''):
+        response['Content-Type'] = JSON_LD.format(context)
+    # Viewers are often hosted on other sites
+    response['Access-Control-Allow-Origin'] = '*'
+    return response
+
+
+def _error(status, message):
+    response = HttpResponse(message, status=status, content_type='text/plain')
+    response['Access-Control-Allow-Origin'] = '*'
+    return response
+
+
+def service_id(request, pk):
+    return request.build_absolute_uri(reverse('archives:iiif_base', args=[pk]))
+
+
+def full_sizes(info):
+    """Whole-image sizes available as single tiles, smallest first"""
+    return [
+        dict(zip(('width', 'height'), level_size(info, scale)))
+        for scale in reversed(info['scale_factors'])
+        if max(level_size(info, scale)) <= info['tile_size']
+    ]
+
+
+def parse_region(region, info):
+    """(x, y, w, h) in full-resolution pixels, clipped to the image"""
+    width, height = info['width'], info['height']
+    if region == 'full':
+        return 0, 0, width, height
+    match = REGION_RE.match(region)
+    if not match:
+        return None
+    x, y, w, h = map(int, match.groups())
+    if x >= width or y >= height or not w or not h:
+        return None
+    return x, y, min(w, width - x), min(h, height - y)
+
+
+def parse_size(size, region_width, region_height):
+    """Requested (w, h), accepting the v3 `max` and `w,h` forms and the v2 `full`/`w,`/`,h` forms"""
+    if size in ('max', 'full'):
+        return region_width, region_height
+    match = SIZE_RE.match(size)
+    if not match or not any(match.groups()):
+        return None
+    w, h = (int(value) if value else None for value in match.groups())
+    if w is None:
+        w = round(region_width * h / region_height)
+    if h is None:
+        h = round(region_height * w / region_width)
+    return w, h
+
+
+def find_tile(info, region, size):
+    """The (scale, col, row) of the stored tile answering this request, or None"""
+    x, y, w, h = region
+    tile = info['tile_size']
+    for scale in info['scale_factors']:
+        span = tile * scale
+        if x % span or y % span:
+            continue
+        if (w, h) != (min(span, info['width'] - x), min(span, info['height'] - y)):
+            continue
+        expected = (math.ceil(w / scale), math.ceil(h / scale))
+        # Allow for clients rounding the last row/column differently
+        if abs(size[0] - expected[0]) <= 1 and abs(size[1] - expected[1]) <= 1:
+            return scale, x // span, y // span
+    return None
+
+
+@require_GET
+def iiif_base(request, pk):
+    """The image service URI redirects to its description"""
+    return redirect('archives:iiif_info', pk=pk, permanent=False)
+
+
+@require_GET
+def iiif_info(request, pk):
+    """IIIF Image API 3.0 info.json"""
+    archive, info = _archive_and_info(pk)
+    return _json(request, {
+        '@context': IMAGE_CONTEXT,
+        'id': service_id(request, pk),
+        'type': 'ImageService3',
+        'protocol': 'http://iiif.io/api/image',
+        'profile': 'level0',
+        'width': info['width'],
+        'height': info['height'],
+        'tiles': [{'width': info['tile_size'], 'scaleFactors': info['scale_factors']}],
+        'sizes': full_sizes(info),
+    }, IMAGE_CONTEXT)
+
+
+@require_GET
+def iiif_image(request, pk, region, size, rotation, quality, format):
+    """
+    IIIF Image API request. Only the tiles and sizes advertised in info.json
+    exist (level 0); anything else is a 400.
+    """
+    archive, info = _archive_and_info(pk)
+    if rotation != '0' or quality not in ('default', 'color') or format != 'jpg':
+        return _error(400, 'Only rotation 0, default quality and jpg format are supported')
+    parsed_region = parse_region(region, info)
+    if parsed_region is None:
+        return _error(400, f'Invalid region: {region}')
+    parsed_size = parse_size(size, parsed_region[2], parsed_region[3])
+    if parsed_size is None:
+        return _error(400, f'Invalid size: {size}')
+    tile = find_tile(info, parsed_region, parsed_size)
+    if tile is None:
+        return _error(400, 'This server only serves the tiles and sizes listed in info.json')
+    response = send_media_file(request, tile_name(archive.image.name, *tile))
+    response['Access-Control-Allow-Origin'] = '*'
+    return response
+
+
+@require_GET
+def iiif_manifest(request, pk):
+    """IIIF Presentation 3.0 manifest with one canvas for the archive image"""
+    archive, info = _archive_and_info(pk)
+    manifest_id = request.build_absolute_uri(reverse('archives:iiif_manifest', args=[pk]))
+    service = service_id(request, pk)
+    largest = full_sizes(info)[-1]
+    metadata = [
+        (label, value) for label, value in (
+            ('Creator', archive.original_author),
+            ('Date', archive.date_created.isoformat() if archive.date_created else archive.circa_date),
+            ('Location', archive.location),
+            ('Category', archive.category.name if archive.category else ''),
+        ) if value
+    ]
+    canvas_id = f'{manifest_id}/canvas/1'
+    manifest = {
+        '@context': PRESENTATION_CONTEXT,
+        'id': manifest_id,
+        'type': 'Manifest',
+        'label': {'none': [archive.title]},
+        'summary': {'none': [archive.description]},
+        'metadata': [{'label': {'en': [label]}, 'value': {'none': [value]}} for label, value in metadata],
+        'homepage': [{
+            'id': request.build_absolute_uri(reverse('archives:detail', args=[pk])),
+            'type': 'Text',
+            'label': {'none': [archive.title]},
+            'format': 'text/html',
+        }],
+        'thumbnail': [{
+            'id': request.build_absolute_uri(thumbnail_url(archive.image)),
+            'type': 'Image',
+            'format': 'image/jpeg',
+        }],
+        'items': [{
+            'id': canvas_id,
+            'type': 'Canvas',
+            'width': info['width'],
+            'height': info['height'],
+            'items': [{
+                'id': f'{canvas_id}/page',
+                'type': 'AnnotationPage',
+                'items': [{
+                    'id': f'{canvas_id}/page/image',
+                    'type': 'Annotation',
+                    'motivation': 'painting',
+                    'target': canvas_id,
+                    'body': {
+                        'id': f"{service}/full/{largest['width']},{largest['height']}/0/default.jpg",
+                        'type': 'Image',
+                        'format': 'image/jpeg',
+                        'width': largest['width'],
+                        'height': largest['height'],
+                        'service': [{'id': service, 'type': 'ImageService3', 'profile': 'level0'}],
+                    },
+                }],
+            }],
+        }],
+    }
+    if archive.caption:
+        manifest['requiredStatement'] = {'label': {'en': ['Attribution']}, 'value': {'none': [archive.caption]}}
+    return _json(request, manifest, PRESENTATION_CONTEXT)
@@ -0,0 +1,267 @@
+"""
+Bulk archive import
+Loads a collection from a CSV or JSON manifest plus a directory of media
+files (see the import_archives management command). Files are checked in a
+process pool, copied into media storage, and the rows are inserted with
+bulk_create in batches together with their tags. Because bulk_create skips
+model signals, each batch updates the search index and tag usage itself and
+queues image derivatives and tiles; finish_import() then refreshes
+recommendations and the cached facets and featured pool.
+
+Manifest columns: file (required, relative to the media directory), title,
+description, caption, archive_type (inferred from the file extension when
+blank; required for extensions several types accept, such as .ogg),
+category (slug or name), tags (comma separated), alt_text, original_author,
+date_created (YYYY-MM-DD), circa_date, location and featured_image.
+"""
+import csv
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from types import SimpleNamespace
+import django
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import transaction
+from django.utils.text import slugify
+from taggit.models import TaggedItem
+from core.images import IMAGE_FIELDS
+from core.jobs import enqueue, model_ref
+from core.tags import record_usage
+from .models import Archive, Category
+from .search import archive_index
+
+TEXT_FIELDS = ['title', 'description', 'caption', 'alt_text', 'original_author', 'circa_date', 'location']
+REQUIRED_FIELDS = ['title', 'description', 'caption']
+
+
+class ManifestError(Exception):
+    """The manifest cannot be read at all"""
+
+
+def read_manifest(path):
+    """Return the manifest rows as a list of dicts (CSV with a header row, or a JSON list)"""
+    try:
+        with open(path, newline='', encoding='utf-8-sig') as handle:
+            if path.lower().endswith('.json'):
+                rows = json.load(handle)
+            else:
+                rows = list(csv.DictReader(handle))
+    except (OSError, ValueError, csv.Error) as e:
+        raise ManifestError(f'Could not read {path}: {e}')
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise ManifestError('The manifest must be a list of objects')
+    return [{key.strip(): value for key, value in row.items() if key} for row in rows]
+
+
+def row_key(row):
+    """Identifies a row across runs, for the resume state file"""
+    return os.path.normpath(str(row.get('file') or '').strip())
+
+
+def matching_types(filename):
+    """Archive types whose file field accepts `filename`'s extension"""
+    extension = os.path.splitext(filename)[1].lstrip('.').lower()
+    return [
+        archive_type for archive_type, _label in Archive.ARCHIVE_TYPES
+        if any(
+            extension in (getattr(validator, 'allowed_extensions', None) or ())
+            for validator in Archive._meta.get_field(archive_type).validators
+        )
+    ]
+
+
+def infer_type(filename):
+    """The archive type for `filename`, or '' if its extension fits none or several (.ogg)"""
+    types = matching_types(filename)
+    return types[0] if len(types) == 1 else ''
+
+
+def _check_file(field_name, path, errors):
+    """Run a field's validators against a file on disk"""
+    if not os.path.isfile(path):
+        errors.append(f'{field_name}: {path} does not exist')
+        return 0
+    size = os.path.getsize(path)
+    stub = SimpleNamespace(name=os.path.basename(path), size=size)
+    try:
+        for validator in Archive._meta.get_field(field_name).validators:
+            validator(stub)
+    except ValidationError as e:
+        errors.extend(f'{field_name}: {message}' for message in e.messages)
+    if field_name in ('image', 'featured_image') and not errors:
+        from PIL import Image
+        try:
+            with Image.open(path) as image:
+                image.verify()
+        except Exception as e:
+            errors.append(f'{field_name}: not a readable image ({e})')
+    return size
+
+
+def check_row(job):
+    """
+    Validate one manifest row without touching the database (runs in a worker
+    process). Returns the cleaned row, its total file size and any errors.
+    """
+    index, row, media_dir = job
+    errors = []
+    cleaned = {field: str(row.get(field) or '').strip() for field in TEXT_FIELDS}
+    for field in REQUIRED_FIELDS:
+        if not cleaned[field]:
+            errors.append(f'{field} is required')
+    for field in TEXT_FIELDS:
+        max_length = Archive._meta.get_field(field).max_length
+        if max_length and len(cleaned[field]) > max_length:
+            errors.append(f'{field} is longer than {max_length} characters')
+
+    filename = str(row.get('file') or '').strip()
+    archive_type = str(row.get('archive_type') or '').strip().lower() or infer_type(filename)
+    candidates = matching_types(filename)
+    if not archive_type and len(candidates) > 1:
+        errors.append(f"archive_type is required for {filename!r} (one of {', '.join(candidates)})")
+    elif archive_type not in dict(Archive.ARCHIVE_TYPES):
+        errors.append(f'Unknown archive_type {archive_type!r}')
+
+    cleaned['date_created'] = None
+    if row.get('date_created'):
+        try:
+            cleaned['date_created'] = date.fromisoformat(str(row['date_created']).strip()).isoformat()
+        except ValueError:
+            errors.append(f"date_created {row['date_created']!r} is not YYYY-MM-DD")
+
+    size = 0
+    files = {}
+    if not filename:
+        errors.append('file is required')
+    elif archive_type in dict(Archive.ARCHIVE_TYPES):
+        files[archive_type] = os.path.join(media_dir, filename)
+    featured = str(row.get('featured_image') or '').strip()
+    if featured:
+        files['featured_image'] = os.path.join(media_dir, featured)
+    for field_name, path in files.items():
+        size += _check_file(field_name, path, errors)
+
+    tags = row.get('tags') or []
+    if isinstance(tags, str):
+        tags = tags.split(',')
+    cleaned.update(
+        archive_type=archive_type,
+        category=str(row.get('category') or '').strip(),
+        tags=sorted({str(tag).strip() for tag in tags if str(tag).strip()}),
+        files=files,
+    )
+    return index, cleaned, size, errors
+
+
+def validate_rows(rows, media_dir, workers=None):
+    """
+    Check every row, in a process pool unless `workers` is 1. Yields
+    (index, cleaned, size, errors) in manifest order.
+    """
+    jobs = [(index, row, media_dir) for index, row in enumerate(rows)]
+    if workers == 1:
+        yield from map(check_row, jobs)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+        yield from pool.map(check_row, jobs, chunksize=16)
+
+
+def load_state(path):
+    """Row keys already imported by an earlier run"""
+    try:
+        with open(path) as handle:
+            return set(json.load(handle).get('imported', []))
+    except FileNotFoundError:
+        return set()
+
+
+def save_state(path, imported):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as handle:
+        json.dump({'imported': sorted(imported)}, handle)
+    os.replace(tmp_path, path)
+
+
+def resolve_categories(names):
+    """Map manifest category values (slug or name) to ids, creating missing categories"""
+    by_key = {}
+    for pk, slug, name in Category.objects.values_list('id', 'slug', 'name'):
+        by_key[slug] = pk
+        by_key.setdefault(name.lower(), pk)
+    missing = {}
+    for name in names:
+        if name and name not in by_key and name.lower() not in by_key:
+            missing.setdefault(slugify(name) or name.lower(), name)
+    for slug, name in missing.items():
+        category = Category.objects.filter(slug=slug).first() or Category.objects.create(name=name, slug=slug)
+        by_key[slug] = category.pk
+    return {
+        name: by_key.get(name) or by_key.get(name.lower()) or by_key.get(slugify(name))
+        for name in names if name
+    }
+
+
+def import_batch(batch, user, category_ids, tags, approved=True):
+    """
+    Copy files and insert one batch of cleaned rows. Returns the new archives.
+    Copied files are removed again if the batch fails.
+    """
+    archives = []
+    saved = []
+    try:
+        for cleaned in batch:
+            archive = Archive(
+                **{field: cleaned[field] for field in TEXT_FIELDS},
+                archive_type=cleaned['archive_type'],
+                category_id=category_ids.get(cleaned['category']),
+                date_created=cleaned['date_created'],
+                uploaded_by=user,
+                is_approved=approved,
+            )
+            for field_name, path in cleaned['files'].items():
+                with open(path, 'rb') as handle:
+                    getattr(archive, field_name).save(os.path.basename(path), File(handle), save=False)
+                saved.append(getattr(archive, field_name))
+            archives.append(archive)
+
+        content_type = ContentType.objects.get_for_model(Archive)
+        with transaction.atomic():
+            Archive.objects.bulk_create(archives)
+            TaggedItem.objects.bulk_create([
+                TaggedItem(content_type=content_type, object_id=archive.pk, tag=tags[name])
+                for archive, cleaned in zip(archives, batch)
+                for name in cleaned['tags']
+            ])
+            usage = Counter(tags[name].pk for cleaned in batch for name in cleaned['tags'])
+            for tag_id, count in usage.items():
+                record_usage(content_type.pk, tag_id, count)
+            for archive in archives:
+                archive_index.update(archive)
+    except Exception:
+        for fieldfile in saved:
+            fieldfile.storage.delete(fieldfile.name)
+        raise
+
+    image_fields = IMAGE_FIELDS.get(Archive._meta.label, ())
+    for archive in archives:
+        if any(getattr(archive, name) for name in image_fields):
+            enqueue('core.tasks.generate_image_derivatives', model_ref(archive))
+        if archive.archive_type == 'image' and archive.image:
+            enqueue('core.tasks.build_image_tiles', model_ref(archive))
+    return archives
+
+
+def finish_import(archives):
+    """Refresh what the skipped post_save signals would have: recommendations and caches"""
+    from core.featured import invalidate_pool
+    from users.dashboard import invalidate_summary
+    from .facets import invalidate_facets
+    from . import related
+    related.refresh_group(archives)
+    invalidate_facets()
+    invalidate_pool()
+    invalidate_summary(*{archive.uploaded_by_id for archive in archives})
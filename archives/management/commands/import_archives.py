@@ -0,0 +1,114 @@
+"""
+Management command to bulk-import archives from a CSV/JSON manifest
+"""
+import os
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from archives.importer import (
+    ManifestError, finish_import, import_batch, load_state, read_manifest,
+    resolve_categories, row_key, save_state, validate_rows,
+)
+from core.tags import get_or_create_tags
+
+
+class Command(BaseCommand):
+    help = 'Import archives from a CSV or JSON manifest and a directory of media files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('manifest', help='CSV (with a header row) or JSON list of archive records')
+        parser.add_argument(
+            '--media-dir',
+            help='Directory the manifest file paths are relative to (default: the manifest\'s directory)',
+        )
+        parser.add_argument('--user', required=True, help='Username recorded as the uploader')
+        parser.add_argument('--batch-size', type=int, default=100, help='Archives inserted per transaction')
+        parser.add_argument('--workers', type=int, default=None, help='Validation processes (default: CPU count)')
+        parser.add_argument(
+            '--state-file',
+            help='Where imported rows are recorded for resuming (default: <manifest>.state.json)',
+        )
+        parser.add_argument('--pending', action='store_true', help='Import as unapproved, awaiting review')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; change nothing')
+
+    def handle(self, *args, **options):
+        manifest = options['manifest']
+        media_dir = options['media_dir'] or os.path.dirname(os.path.abspath(manifest))
+        state_file = options['state_file'] or f'{manifest}.state.json'
+        try:
+            user = get_user_model().objects.get(username=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['user']!r} does not exist")
+        try:
+            rows = read_manifest(manifest)
+        except ManifestError as e:
+            raise CommandError(str(e))
+
+        done = load_state(state_file)
+        pending = [row for row in rows if row_key(row) not in done]
+        if len(pending) < len(rows):
+            self.stdout.write(f'Skipping {len(rows) - len(pending)} row(s) imported by an earlier run')
+
+        # Validate every file up front, in parallel
+        started = time.monotonic()
+        valid, invalid, total_bytes, seen = [], 0, 0, set()
+        for index, cleaned, size, errors in validate_rows(pending, media_dir, options['workers']):
+            key = row_key(pending[index])
+            if key in seen:
+                errors.append(f'{key} appears more than once in the manifest')
+            seen.add(key)
+            if errors:
+                invalid += 1
+                self.stderr.write(f"Row {index + 1} ({key or 'no file'}): {'; '.join(errors)}")
+                continue
+            valid.append((key, cleaned))
+            total_bytes += size
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Validated {len(pending)} row(s) in {elapsed:.1f}s '
+            f'({len(pending) / max(elapsed, 0.001):.1f} rows/s): {len(valid)} valid, {invalid} invalid'
+        )
+
+        categories = sorted({cleaned['category'] for _key, cleaned in valid if cleaned['category']})
+        tag_names = sorted({name for _key, cleaned in valid for name in cleaned['tags']})
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Dry run: would import {len(valid)} archive(s) ({total_bytes / 1024 / 1024:.1f} MB) '
+                f'with {len(categories)} category(ies) and {len(tag_names)} tag(s)'
+            ))
+            return
+        if not valid:
+            return
+
+        category_ids = resolve_categories(categories)
+        tags = get_or_create_tags(tag_names)
+        batch_size = max(1, options['batch_size'])
+        started = time.monotonic()
+        imported = []
+        for start in range(0, len(valid), batch_size):
+            chunk = valid[start:start + batch_size]
+            try:
+                archives = import_batch(
+                    [cleaned for _key, cleaned in chunk], user, category_ids, tags,
+                    approved=not options['pending'],
+                )
+            except Exception as e:
+                finish_import(imported)
+                raise CommandError(
+                    f'Batch starting at valid row {start + 1} failed: {e}. '
+                    f'{len(imported)} archive(s) were imported; run the command again to resume.'
+                )
+            imported.extend(archives)
+            done.update(key for key, _cleaned in chunk)
+            save_state(state_file, done)
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'Imported {len(imported)}/{len(valid)} ({len(imported) / max(elapsed, 0.001):.1f} archives/s)'
+            )
+
+        finish_import(imported)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {len(imported)} archive(s), {total_bytes / 1024 / 1024:.1f} MB in {elapsed:.1f}s '
+            f'({total_bytes / 1024 / 1024 / max(elapsed, 0.001):.1f} MB/s)'
+        ))
@@ -0,0 +1,13 @@
+"""
+Management command to recompute the related-archives table
+"""
+from django.core.management.base import BaseCommand
+from archives.related import rebuild_all
+
+
+class Command(BaseCommand):
+    help = 'Recompute precomputed recommendations for every archive'
+
+    def handle(self, *args, **options):
+        count = rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed recommendations for {count} archive(s)'))
@@ -0,0 +1,90 @@
+"""
+Full-text index for archives.
+
+The table layout, indexed columns and text folding are copied here as they
+stood when this migration was written (see archives/search.py and
+core/search.py), so later changes to the live index cannot change what this
+migration builds.
+"""
+import unicodedata
+from django.db import migrations
+
+TABLE = 'archives_archive_fts'
+COLUMNS = {
+    'title': ['title'],
+    'body': ['description', 'caption', 'location', 'original_author'],
+}
+FOLDED_COLUMN = 'folded'
+FOLD_LETTERS = {
+    'ị': 'i', 'ọ': 'o', 'ụ': 'u', 'ṅ': 'n',
+    'Ị': 'i', 'Ọ': 'o', 'Ụ': 'u', 'Ṅ': 'n',
+    'ŋ': 'n', 'Ŋ': 'n',
+}
+
+
+def fold(text):
+    text = ''.join(FOLD_LETTERS.get(ch, ch) for ch in text or '')
+    decomposed = unicodedata.normalize('NFD', text)
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return unicodedata.normalize('NFC', stripped).casefold()
+
+
+def document(instance):
+    values = []
+    for fields in COLUMNS.values():
+        parts = [str((field(instance) if callable(field) else getattr(instance, field)) or '') for field in fields]
+        values.append(' '.join(part for part in parts if part))
+    return values
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in ('sqlite', 'postgresql'):
+        return
+    cols = ', '.join(COLUMNS)
+    placeholders = ', '.join(['%s'] * len(COLUMNS))
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+            f"{cols}, {FOLDED_COLUMN}, tokenize='unicode61 remove_diacritics 2')"
+        )
+        insert = f"INSERT INTO {TABLE} (rowid, {cols}, {FOLDED_COLUMN}) VALUES (%s, {placeholders}, %s)"
+    else:
+        text_cols = ', '.join(f'{name} text NOT NULL' for name in COLUMNS)
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {TABLE} ("
+            f"id bigint PRIMARY KEY REFERENCES archives_archive(id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            f"{text_cols}, {FOLDED_COLUMN} text NOT NULL, document tsvector NOT NULL)"
+        )
+        schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {TABLE}_document_idx ON {TABLE} USING GIN (document)")
+        vector = ' || '.join(
+            f"setweight(to_tsvector('simple', %s), '{'ABCD'[min(i, 3)]}')" for i in range(len(COLUMNS))
+        )
+        insert = f"INSERT INTO {TABLE} (id, {cols}, {FOLDED_COLUMN}, document) VALUES (%s, {placeholders}, %s, {vector})"
+
+    Archive = apps.get_model('archives', 'Archive')
+    with schema_editor.connection.cursor() as cursor:
+        for archive in Archive.objects.order_by('pk').iterator(chunk_size=500):
+            values = document(archive)
+            if vendor == 'sqlite':
+                params = [archive.pk, *values, ' '.join(fold(value) for value in values if value)]
+            else:
+                folded = [fold(value) for value in values]
+                params = [archive.pk, *values, folded[-1], *folded]
+            cursor.execute(insert, params)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archives', '0003_remove_is_featured_field'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
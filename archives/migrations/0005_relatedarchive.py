@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archives', '0004_archive_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('archive', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='archives.archive')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommended_in', to='archives.archive')),
+            ],
+            options={
+                'ordering': ['-score'],
+                'indexes': [models.Index(fields=['archive', '-score'], name='related_archive_score_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='relatedarchive',
+            constraint=models.UniqueConstraint(fields=('archive', 'related'), name='unique_related_archive'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archives', '0006_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archive',
+            index=models.Index(fields=['is_approved', '-created_at'], name='archive_approved_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archive',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['-created_at', '-id'], name='archive_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archive',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['category', '-created_at'], name='archive_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archive',
+            index=models.Index(fields=['uploaded_by', '-created_at'], name='archive_uploader_created_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archives', '0007_archive_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archive',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['updated_at', 'id'], name='archive_updated_idx'),
+        ),
+    ]
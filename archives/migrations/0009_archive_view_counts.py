@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archives', '0008_archive_updated_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archive',
+            name='popular_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='archive',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='archive',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='archive',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['-popular_score', '-id'], name='archive_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archive',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['-trending_score', '-id'], name='archive_trending_idx'),
+        ),
+    ]
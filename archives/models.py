@@ -1,3 +1,6 @@
+import os
+import uuid
+from django.conf import settings
 from django.db import models
 from django.contrib.auth import get_user_model
 from taggit.managers import TaggableManager
@@ -163,12 +166,30 @@ class Archive(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_approved = models.BooleanField(default=True, help_text="Admin approval status")
+
+    # Popularity, updated in batches by core.counters
+    view_count = models.PositiveIntegerField(default=0, editable=False)
+    popular_score = models.FloatField(default=0, editable=False)
+    trending_score = models.FloatField(default=0, editable=False)
     
     tags = TaggableManager(blank=True)
     
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = 'Archives'
+        indexes = [
+            # Public listings, prev/next navigation and sitemaps
+            models.Index(fields=['is_approved', '-created_at'], name='archive_approved_created_idx'),
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(is_approved=True), name='archive_published_idx'),
+            models.Index(fields=['category', '-created_at'], condition=models.Q(is_approved=True), name='archive_category_idx'),
+            # Dashboard and profile pages
+            models.Index(fields=['uploaded_by', '-created_at'], name='archive_uploader_created_idx'),
+            # OAI-PMH harvesting pages by (updated_at, id)
+            models.Index(fields=['updated_at', 'id'], condition=models.Q(is_approved=True), name='archive_updated_idx'),
+            # "Most viewed" and "Trending" sorts
+            models.Index(fields=['-popular_score', '-id'], condition=models.Q(is_approved=True), name='archive_popular_idx'),
+            models.Index(fields=['-trending_score', '-id'], condition=models.Q(is_approved=True), name='archive_trending_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -192,3 +213,56 @@ class Archive(models.Model):
         elif self.featured_image:
             return True
         return False
+
+
+class RelatedArchive(models.Model):
+    """Precomputed recommendation for archive_detail, scored by shared category and tags"""
+    archive = models.ForeignKey(Archive, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(Archive, on_delete=models.CASCADE, related_name='recommended_in')
+    score = models.FloatField()
+    
+    class Meta:
+        ordering = ['-score']
+        constraints = [
+            models.UniqueConstraint(fields=['archive', 'related'], name='unique_related_archive'),
+        ]
+        indexes = [
+            models.Index(fields=['archive', '-score'], name='related_archive_score_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.related} for {self.archive} ({self.score})"
+
+
+class ChunkedUpload(models.Model):
+    """A resumable upload of a large video or audio file, assembled on disk chunk by chunk"""
+    KIND_CHOICES = [
+        ('video', 'Video'),
+        ('audio', 'Audio'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chunked_uploads')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField(help_text="Total size in bytes")
+    offset = models.BigIntegerField(default=0, help_text="Bytes received so far")
+    checksum = models.CharField(max_length=64, blank=True, help_text="Expected SHA-256 of the whole file (hex)")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+    
+    @property
+    def path(self):
+        """Where the partial file is assembled"""
+        return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{self.id}.part')
+    
+    @property
+    def is_complete(self):
+        return self.completed_at is not None
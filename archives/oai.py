@@ -0,0 +1,381 @@
+"""
+OAI-PMH provider
+Lets libraries and aggregators harvest archive metadata as Dublin Core over
+OAI-PMH 2.0 (https://www.openarchives.org/OAI/openarchivesprotocol.html)
+instead of scraping pages. Lists are keyset-paginated by (updated_at, id)
+and written to a streaming response row by row, and resumption tokens are
+signed, self-contained cursors, so a full harvest needs no server-side state
+and constant memory. Categories are exposed as sets.
+"""
+import mimetypes
+import re
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from xml.sax.saxutils import escape, quoteattr
+from django.conf import settings
+from django.core import signing
+from django.db.models import Min, Q
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from .models import Archive, Category
+
+PAGE_SIZE = 100
+TOKEN_SALT = 'archives.oai'
+METADATA_PREFIX = 'oai_dc'
+
+VERB_ARGUMENTS = {
+    'Identify': (set(), set()),
+    'ListMetadataFormats': (set(), {'identifier'}),
+    'ListSets': (set(), set()),
+    'GetRecord': ({'identifier', 'metadataPrefix'}, set()),
+    'ListIdentifiers': ({'metadataPrefix'}, {'from', 'until', 'set'}),
+    'ListRecords': ({'metadataPrefix'}, {'from', 'until', 'set'}),
+}
+
+# DCMI Type Vocabulary for each archive type
+DC_TYPES = {
+    'image': 'StillImage',
+    'video': 'MovingImage',
+    'audio': 'Sound',
+    'document': 'Text',
+}
+
+# Characters that are not allowed anywhere in an XML 1.0 document
+INVALID_XML_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+OAI_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:schemaLocation="http://www.openarchives.org/OAI/2.0/ '
+    'http://www.openarchives.org/OAI/2.0/OAI-PMH.xsd">\n'
+)
+OAI_DC_OPEN = (
+    '<oai_dc:dc xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/" '
+    'xmlns:dc="http://purl.org/dc/elements/1.1/" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:schemaLocation="http://www.openarchives.org/OAI/2.0/oai_dc/ '
+    'http://www.openarchives.org/OAI/2.0/oai_dc.xsd">'
+)
+
+
+class OAIError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def _text(value):
+    return escape(INVALID_XML_RE.sub('', str(value)))
+
+
+def _attr(value):
+    return quoteattr(INVALID_XML_RE.sub('', str(value)))
+
+
+def _datestamp(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _namespace():
+    return getattr(settings, 'OAI_REPOSITORY_IDENTIFIER', 'igboarchives.com')
+
+
+def oai_identifier(pk):
+    return f'oai:{_namespace()}:archive/{pk}'
+
+
+def parse_identifier(identifier):
+    prefix = f'oai:{_namespace()}:archive/'
+    if identifier and identifier.startswith(prefix) and identifier[len(prefix):].isdigit():
+        return int(identifier[len(prefix):])
+    return None
+
+
+def parse_date_argument(value, name, end=False):
+    """
+    Parse a `from`/`until` argument (YYYY-MM-DD or YYYY-MM-DDThh:mm:ssZ) into a
+    UTC datetime. For `until` (`end=True`) the result is the exclusive upper
+    bound, i.e. the end of the given day or second.
+    """
+    if re.fullmatch(r'\d{4}-\d{2}-\d{2}', value):
+        try:
+            day = datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise OAIError('badArgument', f'Invalid {name} date: {value}')
+        moment = datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+        return (moment + timedelta(days=1) if end else moment), 'day'
+    if re.fullmatch(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z', value):
+        moment = parse_datetime(value[:-1] + '+00:00')
+        if moment is None:
+            raise OAIError('badArgument', f'Invalid {name} date: {value}')
+        return (moment + timedelta(seconds=1) if end else moment), 'second'
+    raise OAIError('badArgument', f'Invalid {name} date: {value}')
+
+
+def encode_token(state):
+    return signing.dumps(state, salt=TOKEN_SALT, compress=True)
+
+
+def decode_token(token):
+    try:
+        state = signing.loads(token, salt=TOKEN_SALT)
+        state['after'] = (parse_datetime(state['after'][0]), int(state['after'][1]))
+    except (signing.BadSignature, KeyError, TypeError, ValueError, IndexError):
+        raise OAIError('badResumptionToken', 'The resumptionToken is invalid or has expired')
+    return state
+
+
+def published_archives():
+    return Archive.objects.filter(is_approved=True)
+
+
+def list_queryset(state):
+    """Approved archives for a list request, in (updated_at, id) order after the token's position"""
+    queryset = published_archives()
+    if state.get('set'):
+        queryset = queryset.filter(category__slug=state['set'])
+    if state.get('from'):
+        queryset = queryset.filter(updated_at__gte=parse_datetime(state['from']))
+    if state.get('until'):
+        queryset = queryset.filter(updated_at__lt=parse_datetime(state['until']))
+    if state.get('after'):
+        updated_at, pk = state['after']
+        queryset = queryset.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, pk__gt=pk))
+    return queryset.order_by('updated_at', 'pk')
+
+
+def record_header(pk, updated_at, category_slug):
+    set_spec = f'<setSpec>{_text(category_slug)}</setSpec>' if category_slug else ''
+    return (
+        f'<header><identifier>{oai_identifier(pk)}</identifier>'
+        f'<datestamp>{_datestamp(updated_at)}</datestamp>{set_spec}</header>'
+    )
+
+
+def dublin_core(archive, request):
+    """The oai_dc metadata block for an archive (category and tags must be loaded)"""
+    elements = [('title', archive.title)]
+    if archive.original_author:
+        elements.append(('creator', archive.original_author))
+    if archive.category:
+        elements.append(('subject', archive.category.name))
+    elements += [('subject', tag.name) for tag in archive.tags.all()]
+    elements.append(('description', archive.description))
+    if archive.date_created:
+        elements.append(('date', archive.date_created.isoformat()))
+    if archive.circa_date:
+        elements.append(('date', archive.circa_date))
+    elements.append(('type', DC_TYPES.get(archive.archive_type, archive.archive_type)))
+    primary = archive.get_primary_file()
+    if primary:
+        content_type = mimetypes.guess_type(primary.name)[0]
+        if content_type:
+            elements.append(('format', content_type))
+    elements.append(('identifier', request.build_absolute_uri(reverse('archives:detail', args=[archive.pk]))))
+    if archive.location:
+        elements.append(('coverage', archive.location))
+    if archive.caption:
+        elements.append(('rights', archive.caption))
+    body = ''.join(f'<dc:{name}>{_text(value)}</dc:{name}>' for name, value in elements)
+    return f'<metadata>{OAI_DC_OPEN}{body}</oai_dc:dc></metadata>'
+
+
+def _envelope_open(request, arguments):
+    base_url = request.build_absolute_uri(request.path)
+    attrs = ''.join(f' {name}={_attr(value)}' for name, value in arguments.items())
+    return (
+        f'{OAI_HEADER}<responseDate>{_datestamp(timezone.now())}</responseDate>\n'
+        f'<request{attrs}>{_text(base_url)}</request>\n'
+    )
+
+
+def _response(content):
+    return HttpResponse(content, content_type='text/xml; charset=utf-8')
+
+
+def error_response(request, arguments, error):
+    # badVerb/badArgument responses must not echo the request arguments
+    if error.code in ('badVerb', 'badArgument'):
+        arguments = {}
+    return _response(
+        _envelope_open(request, arguments)
+        + f'<error code="{error.code}">{_text(error.message)}</error>\n</OAI-PMH>\n'
+    )
+
+
+def parse_arguments(params):
+    arguments = {}
+    for name in params:
+        values = params.getlist(name)
+        if len(values) > 1:
+            raise OAIError('badArgument', f'Repeated argument: {name}')
+        arguments[name] = values[0]
+    verb = arguments.get('verb')
+    if verb not in VERB_ARGUMENTS:
+        raise OAIError('badVerb', 'Missing or illegal verb')
+    required, optional = VERB_ARGUMENTS[verb]
+    given = set(arguments) - {'verb'}
+    if verb in ('ListIdentifiers', 'ListRecords', 'ListSets') and 'resumptionToken' in given:
+        if given != {'resumptionToken'}:
+            raise OAIError('badArgument', 'resumptionToken is an exclusive argument')
+        return verb, arguments
+    if not required <= given:
+        raise OAIError('badArgument', f"Missing argument(s): {', '.join(sorted(required - given))}")
+    if given - required - optional:
+        raise OAIError('badArgument', f"Illegal argument(s): {', '.join(sorted(given - required - optional))}")
+    return verb, arguments
+
+
+def identify(request, arguments):
+    earliest = published_archives().aggregate(earliest=Min('updated_at'))['earliest']
+    body = (
+        '<Identify>'
+        f"<repositoryName>{_text(getattr(settings, 'META_SITE_NAME', 'Igbo Archives'))}</repositoryName>"
+        f'<baseURL>{_text(request.build_absolute_uri(request.path))}</baseURL>'
+        '<protocolVersion>2.0</protocolVersion>'
+        f'<adminEmail>{_text(settings.ADMIN_EMAIL)}</adminEmail>'
+        f'<earliestDatestamp>{_datestamp(earliest or timezone.now())}</earliestDatestamp>'
+        '<deletedRecord>no</deletedRecord>'
+        '<granularity>YYYY-MM-DDThh:mm:ssZ</granularity>'
+        '</Identify>'
+    )
+    return _response(_envelope_open(request, arguments) + body + '\n</OAI-PMH>\n')
+
+
+def list_metadata_formats(request, arguments):
+    if 'identifier' in arguments:
+        pk = parse_identifier(arguments['identifier'])
+        if pk is None or not published_archives().filter(pk=pk).exists():
+            raise OAIError('idDoesNotExist', 'No record with that identifier')
+    body = (
+        '<ListMetadataFormats><metadataFormat>'
+        f'<metadataPrefix>{METADATA_PREFIX}</metadataPrefix>'
+        '<schema>http://www.openarchives.org/OAI/2.0/oai_dc.xsd</schema>'
+        '<metadataNamespace>http://www.openarchives.org/OAI/2.0/oai_dc/</metadataNamespace>'
+        '</metadataFormat></ListMetadataFormats>'
+    )
+    return _response(_envelope_open(request, arguments) + body + '\n</OAI-PMH>\n')
+
+
+def list_sets(request, arguments):
+    if 'resumptionToken' in arguments:
+        raise OAIError('badResumptionToken', 'ListSets is returned in a single response')
+    sets = ''.join(
+        f'<set><setSpec>{_text(slug)}</setSpec><setName>{_text(name)}</setName></set>'
+        for slug, name in Category.objects.order_by('name').values_list('slug', 'name')
+    )
+    return _response(_envelope_open(request, arguments) + f'<ListSets>{sets}</ListSets>\n</OAI-PMH>\n')
+
+
+def get_record(request, arguments):
+    if arguments['metadataPrefix'] != METADATA_PREFIX:
+        raise OAIError('cannotDisseminateFormat', f'Only {METADATA_PREFIX} is supported')
+    pk = parse_identifier(arguments['identifier'])
+    archive = (
+        published_archives().select_related('category').prefetch_related('tags').filter(pk=pk).first()
+        if pk is not None else None
+    )
+    if archive is None:
+        raise OAIError('idDoesNotExist', 'No record with that identifier')
+    record = (
+        '<record>'
+        + record_header(archive.pk, archive.updated_at, archive.category.slug if archive.category else '')
+        + dublin_core(archive, request)
+        + '</record>'
+    )
+    return _response(_envelope_open(request, arguments) + f'<GetRecord>{record}</GetRecord>\n</OAI-PMH>\n')
+
+
+def list_state(arguments):
+    """The harvest state (filters plus position) for a list request"""
+    if 'resumptionToken' in arguments:
+        return decode_token(arguments['resumptionToken'])
+    if arguments['metadataPrefix'] != METADATA_PREFIX:
+        raise OAIError('cannotDisseminateFormat', f'Only {METADATA_PREFIX} is supported')
+    state = {'set': arguments.get('set', ''), 'after': None}
+    granularities = set()
+    for name, end in (('from', False), ('until', True)):
+        if arguments.get(name):
+            moment, granularity = parse_date_argument(arguments[name], name, end=end)
+            state[name] = moment.isoformat()
+            granularities.add(granularity)
+    if len(granularities) > 1:
+        raise OAIError('badArgument', 'from and until must have the same granularity')
+    if state.get('from') and state.get('until') and state['from'] >= state['until']:
+        raise OAIError('badArgument', 'from must not be later than until')
+    if state['set'] and not Category.objects.filter(slug=state['set']).exists():
+        raise OAIError('noRecordsMatch', 'No such set')
+    return state
+
+
+def list_records(request, verb, arguments):
+    """ListIdentifiers / ListRecords: stream one page and a resumption token for the next"""
+    state = list_state(arguments)
+    page_size = getattr(settings, 'OAI_PAGE_SIZE', PAGE_SIZE)
+    queryset = list_queryset(state)
+    if verb == 'ListRecords':
+        queryset = queryset.select_related('category').prefetch_related('tags')
+    else:
+        queryset = queryset.values_list('pk', 'updated_at', 'category__slug')
+    rows = queryset[:page_size + 1].iterator(chunk_size=page_size + 1)
+
+    first = next(rows, None)
+    if first is None:
+        raise OAIError('noRecordsMatch', 'No records match the request')
+
+    def stream():
+        yield _envelope_open(request, arguments) + f'<{verb}>'
+        last = None
+        count = 0
+        row = first
+        while row is not None:
+            if count == page_size:
+                # There is at least one more row: hand out a token positioned after `last`
+                next_state = dict(state, after=[last[1].isoformat(), last[0]])
+                yield f'<resumptionToken>{_text(encode_token(next_state))}</resumptionToken>'
+                break
+            if verb == 'ListRecords':
+                category = row.category.slug if row.category else ''
+                last = (row.pk, row.updated_at)
+                yield (
+                    '<record>' + record_header(row.pk, row.updated_at, category)
+                    + dublin_core(row, request) + '</record>\n'
+                )
+            else:
+                last = row[:2]
+                yield record_header(*row) + '\n'
+            count += 1
+            row = next(rows, None)
+        else:
+            if 'resumptionToken' in arguments:
+                # The last page of a resumed list carries an empty token
+                yield '<resumptionToken/>'
+        yield f'</{verb}>\n</OAI-PMH>\n'
+
+    return StreamingHttpResponse(stream(), content_type='text/xml; charset=utf-8')
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+def oai_pmh(request):
+    """OAI-PMH 2.0 endpoint (baseURL)"""
+    params = request.POST if request.method == 'POST' else request.GET
+    arguments = {name: params.get(name) for name in params}
+    try:
+        verb, arguments = parse_arguments(params)
+        if verb == 'Identify':
+            return identify(request, arguments)
+        if verb == 'ListMetadataFormats':
+            return list_metadata_formats(request, arguments)
+        if verb == 'ListSets':
+            return list_sets(request, arguments)
+        if verb == 'GetRecord':
+            return get_record(request, arguments)
+        return list_records(request, verb, arguments)
+    except OAIError as error:
+        return error_response(request, arguments, error)
@@ -0,0 +1,139 @@
+"""
+Related archives
+Maintains the RelatedArchive table that archive_detail reads its
+recommendations from. Scores are symmetric (shared tags plus a bonus for a
+shared category), so when one archive changes only the archives whose lists
+could gain, lose or reorder it need recomputing.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, Min, Q, Value, When
+from django.db.models.functions import Cast
+from taggit.models import TaggedItem
+from .models import Archive, RelatedArchive
+
+RELATED_LIMIT = 9
+CATEGORY_WEIGHT = 2.0
+TAG_WEIGHT = 1.0
+
+
+def score_candidates(archive):
+    """
+    Return approved archives sharing a category or tag with `archive`,
+    annotated with `score` and ordered best first.
+    """
+    tag_ids = list(archive.tags.values_list('id', flat=True))
+    if not archive.category_id and not tag_ids:
+        return Archive.objects.none().annotate(score=Value(0.0, output_field=FloatField()))
+
+    condition = Q()
+    if archive.category_id:
+        condition |= Q(category_id=archive.category_id)
+    if tag_ids:
+        tagged = TaggedItem.objects.filter(
+            content_type=ContentType.objects.get_for_model(Archive),
+            tag_id__in=tag_ids,
+        ).values('object_id')
+        condition |= Q(pk__in=tagged)
+
+    candidates = Archive.objects.filter(condition, is_approved=True).exclude(pk=archive.pk)
+
+    if tag_ids:
+        shared_tags = Count('tags', filter=Q(tags__in=tag_ids), distinct=True)
+    else:
+        shared_tags = Value(0, output_field=IntegerField())
+    same_category = Case(
+        When(category_id=archive.category_id, then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    ) if archive.category_id else Value(0, output_field=IntegerField())
+
+    return candidates.annotate(
+        shared_tags=shared_tags,
+        same_category=same_category,
+    ).annotate(
+        score=Cast(F('shared_tags'), FloatField()) * TAG_WEIGHT
+        + Cast(F('same_category'), FloatField()) * CATEGORY_WEIGHT
+    ).order_by('-score', '-created_at')
+
+
+def refresh_archive(archive):
+    """Recompute the stored recommendations of a single archive"""
+    rows = []
+    if archive.is_approved:
+        rows = [
+            RelatedArchive(archive_id=archive.pk, related_id=pk, score=score)
+            for pk, score in score_candidates(archive).values_list('pk', 'score')[:RELATED_LIMIT]
+        ]
+    with transaction.atomic():
+        RelatedArchive.objects.filter(archive_id=archive.pk).delete()
+        RelatedArchive.objects.bulk_create(rows)
+
+
+def refresh_related(archive):
+    """
+    Recompute `archive`'s own recommendations and those of every archive whose
+    list it could enter or leave.
+    """
+    refresh_archive(archive)
+
+    affected = set(
+        RelatedArchive.objects.filter(related_id=archive.pk).values_list('archive_id', flat=True)
+    )
+    if archive.is_approved:
+        scores = dict(score_candidates(archive).values_list('pk', 'score'))
+        if scores:
+            # Each candidate's current list size and weakest score
+            thresholds = {
+                row['archive_id']: row
+                for row in RelatedArchive.objects.filter(archive_id__in=list(scores))
+                .values('archive_id')
+                .annotate(entries=Count('id'), weakest=Min('score'))
+            }
+            for pk, score in scores.items():
+                current = thresholds.get(pk)
+                if current is None or current['entries'] < RELATED_LIMIT or score > current['weakest']:
+                    affected.add(pk)
+
+    affected.discard(archive.pk)
+    for other in Archive.objects.filter(pk__in=affected):
+        refresh_archive(other)
+
+
+def refill_lists(archive_ids):
+    """Recompute the given archives' lists, e.g. after one of their entries was deleted"""
+    for other in Archive.objects.filter(pk__in=archive_ids):
+        refresh_archive(other)
+
+
+def refresh_group(archives):
+    """
+    Recompute the lists of `archives` and of every archive sharing a category
+    or tag with them, each once. After a bulk import this replaces one
+    refresh_related() per new archive, which would rescore the same
+    categories over and over. Returns the number of lists recomputed.
+    """
+    ids = [archive.pk for archive in archives]
+    if not ids:
+        return 0
+    category_ids = {archive.category_id for archive in archives if archive.category_id}
+    content_type = ContentType.objects.get_for_model(Archive)
+    tag_ids = TaggedItem.objects.filter(content_type=content_type, object_id__in=ids).values('tag_id')
+    tagged = TaggedItem.objects.filter(content_type=content_type, tag_id__in=tag_ids).values('object_id')
+    affected = Archive.objects.filter(
+        Q(pk__in=ids) | Q(category_id__in=category_ids) | Q(pk__in=tagged, is_approved=True)
+    )
+    count = 0
+    for archive in affected.order_by('pk').iterator(chunk_size=200):
+        refresh_archive(archive)
+        count += 1
+    return count
+
+
+def rebuild_all():
+    """Recompute recommendations for every archive"""
+    count = 0
+    for archive in Archive.objects.order_by('pk').iterator(chunk_size=200):
+        refresh_archive(archive)
+        count += 1
+    return count
@@ -0,0 +1,12 @@
+from core.search import SearchIndex
+from .models import Archive
+
+# Title ranks above the descriptive metadata; snippets come from the body.
+archive_index = SearchIndex(
+    Archive,
+    table='archives_archive_fts',
+    columns={
+        'title': ['title'],
+        'body': ['description', 'caption', 'location', 'original_author'],
+    },
+)
@@ -0,0 +1,130 @@
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save, m2m_changed
+from django.dispatch import receiver
+from taggit.models import TaggedItem
+from .models import Archive, Category, RelatedArchive
+from .search import archive_index
+from . import related
+from .facets import invalidate_facets
+from core.featured import invalidate_pool
+from core.images import needs_derivatives, delete_for_instance
+from core.tiles import delete_pyramid, pyramid_info
+from core.jobs import enqueue, model_ref
+from core.similarity import has_changed
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Archive fields the tag/category recommendations depend on (tags aside)
+RELATED_FIELDS = ['category_id', 'is_approved']
+RELATED_SOURCE_FIELDS = {*RELATED_FIELDS, 'category'}
+# Archive fields that decide whether a photo needs a tile pyramid
+TILE_FIELDS = ['image', 'archive_type']
+
+
+@receiver(post_save, sender=Archive)
+def update_archive_search_index(sender, instance, **kwargs):
+    """Keep the full-text index in step with the archive row."""
+    archive_index.update(instance)
+
+
+@receiver(post_delete, sender=Archive)
+def remove_archive_from_search_index(sender, instance, **kwargs):
+    """Drop a deleted archive from the full-text index."""
+    archive_index.delete(instance.pk)
+
+
+def queue_related_refresh(archive):
+    enqueue('core.tasks.refresh_related_archives', model_ref(archive), unique=True)
+
+
+@receiver(pre_save, sender=Archive)
+def note_related_changes(sender, instance, update_fields=None, **kwargs):
+    """Note whether the save changes the category or approval the recommendations use."""
+    if update_fields is not None and not RELATED_SOURCE_FIELDS & set(update_fields):
+        instance._related_changed = False
+    else:
+        instance._related_changed = has_changed(instance, RELATED_FIELDS)
+
+
+@receiver(post_save, sender=Archive)
+def update_related_archives(sender, instance, created=False, **kwargs):
+    """Queue a rescore of the recommendations touched by a changed category or approval."""
+    if created and not instance.is_approved:
+        # Unapproved archives neither have nor appear in recommendations
+        return
+    if getattr(instance, '_related_changed', True):
+        queue_related_refresh(instance)
+
+
+@receiver(m2m_changed, sender=TaggedItem)
+def update_related_archives_on_tags(sender, instance, action, **kwargs):
+    """Queue a rescore of the recommendations when an approved archive's tags change."""
+    if isinstance(instance, Archive) and instance.is_approved and action in ('post_add', 'post_remove', 'post_clear'):
+        queue_related_refresh(instance)
+
+
+@receiver(pre_delete, sender=Archive)
+def remember_related_lists(sender, instance, **kwargs):
+    """Note which recommendation lists include an archive about to be deleted."""
+    instance._listed_in = list(
+        RelatedArchive.objects.filter(related=instance).values_list('archive_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Archive)
+def refill_related_lists(sender, instance, **kwargs):
+    """Refill the recommendation lists that lost a deleted archive."""
+    related.refill_lists(getattr(instance, '_listed_in', []))
+
+
+@receiver(post_save, sender=Archive)
+@receiver(post_delete, sender=Archive)
+def refresh_featured_pool(sender, instance, **kwargs):
+    """Let the home page carousel pick up approval changes and deletions."""
+    invalidate_pool()
+
+
+@receiver(post_save, sender=Archive)
+@receiver(post_delete, sender=Archive)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_archive_facets(sender, instance, **kwargs):
+    """Drop cached filter counts after archives or categories change."""
+    invalidate_facets()
+
+
+@receiver(post_save, sender=Archive)
+def generate_archive_image_derivatives(sender, instance, **kwargs):
+    """Queue resized copies of new or replaced images."""
+    if needs_derivatives(instance):
+        enqueue('core.tasks.generate_image_derivatives', model_ref(instance), unique=True)
+
+
+@receiver(post_delete, sender=Archive)
+def delete_archive_image_derivatives(sender, instance, **kwargs):
+    """Remove the resized copies of a deleted archive's images."""
+    delete_for_instance(instance)
+
+
+@receiver(pre_save, sender=Archive)
+def note_image_changes(sender, instance, update_fields=None, **kwargs):
+    """Note whether the save sets a new photo, which may need tiling."""
+    if update_fields is not None and not set(TILE_FIELDS) & set(update_fields):
+        instance._image_changed = False
+    else:
+        instance._image_changed = has_changed(instance, TILE_FIELDS)
+
+
+@receiver(post_save, sender=Archive)
+def build_archive_image_tiles(sender, instance, **kwargs):
+    """Queue the deep-zoom tile pyramid for new or replaced archive photos."""
+    if not getattr(instance, '_image_changed', True):
+        return
+    if instance.archive_type == 'image' and instance.image and pyramid_info(instance.image) is None:
+        enqueue('core.tasks.build_image_tiles', model_ref(instance), unique=True)
+
+
+@receiver(post_delete, sender=Archive)
+def delete_archive_image_tiles(sender, instance, **kwargs):
+    """Remove the tile pyramid of a deleted archive's photo."""
+    delete_pyramid(instance.image)
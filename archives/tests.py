@@ -1,3 +1,660 @@
-from django.test import TestCase
+import base64
+import csv
+import hashlib
+import html
+import os
+import re
+import shutil
+import tempfile
+from xml.etree import ElementTree
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from unittest import skipUnless
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from archives.facets import archive_facets
+from archives.importer import check_row, infer_type
+from archives.models import Archive, Category, ChunkedUpload, RelatedArchive
+from archives.oai import oai_identifier
+from archives.related import rebuild_all, refresh_group
+from archives.search import archive_index
+from archives.uploads import purge_expired_uploads
+from core import jobs
+from core.images import DERIVATIVE_PREFIX, available_widths, derivative_name, thumbnail_url
+from core.models import Job, TagUsage
+from core.tiles import pyramid_info, tile_name
 
-# Create your tests here.
+REFRESH_TASK = 'core.tasks.refresh_related_archives'
+
+
+class RelatedArchiveTests(TestCase):
+    """archive_detail reads its recommendations from RelatedArchive, kept current by the worker"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('curator', 'curator@example.com', 'password')
+        cls.category = Category.objects.create(name='Masks', slug='masks')
+
+    def make(self, title, **kwargs):
+        # No media files, so saving queues nothing but the recommendation refresh
+        return Archive.objects.create(title=title, description='d', archive_type='video', uploaded_by=self.user, **kwargs)
+
+    def related(self, archive):
+        return list(RelatedArchive.objects.filter(archive=archive).values_list('related__title', 'score'))
+
+    def run_jobs(self):
+        jobs.work(burst=True, poll_interval=0)
+
+    def test_scores(self):
+        first = self.make('first', category=self.category)
+        second = self.make('second', category=self.category)
+        tagged = self.make('tagged')
+        first.tags.add('mask', 'onitsha')
+        tagged.tags.add('mask', 'onitsha')
+        self.run_jobs()
+        self.assertEqual(self.related(first), [('tagged', 2.0), ('second', 2.0)])
+        self.assertEqual(self.related(second), [('first', 2.0)])
+
+        tagged.is_approved = False
+        tagged.save()
+        self.run_jobs()
+        self.assertEqual(self.related(first), [('second', 2.0)])
+        self.assertEqual(self.related(tagged), [])
+
+        second.delete()
+        self.assertEqual(self.related(first), [])
+        response = self.client.get(f'/archives/{first.pk}/')
+        self.assertEqual(list(response.context['recommended']), [])
+
+    def test_refresh_is_queued_once(self):
+        archive = self.make('archive', category=self.category)
+        self.assertEqual(Job.objects.filter(task=REFRESH_TASK).count(), 1)
+        archive.tags.add('mask')
+        archive.tags.add('onitsha')
+        archive.category = None
+        archive.save()
+        self.assertEqual(Job.objects.filter(task=REFRESH_TASK).count(), 1)
+
+    def test_unrelated_saves_are_not_queued(self):
+        archive = self.make('archive', category=self.category)
+        pending = self.make('pending', is_approved=False)
+        pending.tags.add('mask')
+        Job.objects.all().delete()
+        archive.title = 'renamed'
+        archive.save()
+        archive.save(update_fields=['description'])
+        self.assertFalse(Job.objects.filter(task=REFRESH_TASK).exists())
+
+    @override_settings(JOB_QUEUE_EAGER=True)
+    def test_matches_rebuild(self):
+        other = Category.objects.create(name='Cloth', slug='cloth')
+        archives = [self.make(f'a{i}', category=[self.category, other, None][i % 3]) for i in range(10)]
+        archives[2].tags.add('mask')
+        archives[5].tags.add('mask', 'cloth')
+        archives[4].is_approved = False
+        archives[4].save()
+        archives[7].category = other
+        archives[7].save()
+        live = sorted(RelatedArchive.objects.values_list('archive_id', 'related_id', 'score'))
+        rebuild_all()
+        self.assertEqual(live, sorted(RelatedArchive.objects.values_list('archive_id', 'related_id', 'score')))
+
+
+def jpeg(width, height):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), (200, 10, 10)).save(buffer, 'JPEG')
+    return ContentFile(buffer.getvalue())
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ImageTileTests(TestCase):
+    """Archive photos are served as IIIF Image API tiles cut by the worker"""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings_override = override_settings(MEDIA_ROOT=media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+        self.media = media
+        user = get_user_model().objects.create_user('photographer', 'photo@example.com', 'password')
+        self.archive = Archive(title='Photo', description='d', archive_type='image', uploaded_by=user)
+        self.archive.image.save('photo.jpg', jpeg(1300, 700), save=False)
+        self.archive.save()
+
+    def tile_jobs(self):
+        return Job.objects.filter(task='core.tasks.build_image_tiles')
+
+    def build(self):
+        jobs.work(burst=True, poll_interval=0)
+
+    def test_tiling_is_queued_once(self):
+        self.assertEqual(self.tile_jobs().count(), 1)
+        self.archive.title = 'Renamed'
+        self.archive.save()
+        self.archive.save()
+        self.assertEqual(self.tile_jobs().count(), 1)
+
+        self.tile_jobs().delete()
+        self.archive.image.save('other.jpg', jpeg(300, 200))
+        self.assertEqual(self.tile_jobs().count(), 1)
+
+    def test_image_api(self):
+        base = f'/archives/{self.archive.pk}/iiif'
+        self.assertEqual(self.client.get(f'{base}/info.json').status_code, 404)
+        self.build()
+        self.assertEqual(pyramid_info(self.archive.image)['scale_factors'], [1, 2, 4])
+
+        response = self.client.get(f'{base}/info.json')
+        info = response.json()
+        self.assertEqual((info['width'], info['height']), (1300, 700))
+        self.assertEqual(info['sizes'], [{'width': 325, 'height': 175}])
+        self.assertEqual(response['Access-Control-Allow-Origin'], '*')
+        self.assertEqual(self.client.get(base).status_code, 302)
+
+        # An edge tile at full scale, a scaled region and a full-image size
+        for path, size in [
+            ('1024,512,276,188/276,188/0/default.jpg', (276, 188)),
+            ('0,0,1024,700/512,/0/default.jpg', (512, 350)),
+            ('full/325,175/0/default.jpg', (325, 175)),
+        ]:
+            response = self.client.get(f'{base}/{path}')
+            self.assertEqual(response.status_code, 200, path)
+            self.assertEqual(Image.open(BytesIO(b''.join(response.streaming_content))).size, size)
+        self.assertEqual(self.client.get(f'{base}/full/max/0/default.jpg').status_code, 400)
+        self.assertEqual(self.client.get(f'{base}/full/325,175/90/default.jpg').status_code, 400)
+
+        manifest = self.client.get(f'/archives/{self.archive.pk}/manifest.json').json()
+        self.assertEqual(manifest['items'][0]['width'], 1300)
+        self.assertContains(self.client.get(f'/archives/{self.archive.pk}/'), 'data-deep-zoom')
+
+    def test_delete_removes_tiles(self):
+        self.build()
+        path = os.path.join(self.media, tile_name(self.archive.image.name, 1, 0, 0))
+        self.assertTrue(os.path.exists(path))
+        self.archive.delete()
+        self.assertFalse(os.path.exists(path))
+
+
+@skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'Needs a full-text backend')
+class ArchiveSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user('searcher', 'searcher@example.com', 'password')
+        cls.market = Archive.objects.create(
+            title='Ọnịcha market scene', description='Traders at the market in Onitsha',
+            archive_type='video', uploaded_by=user,
+        )
+        cls.mask = Archive.objects.create(
+            title='Ŋwa mask', description='A mask from Onicha Ado, Straße', location='Awka',
+            archive_type='video', uploaded_by=user,
+        )
+
+    def search(self, query):
+        return list(archive_index.search(Archive.objects.all(), query))
+
+    def test_folded_matching(self):
+        for query in ['onicha', 'Ọnịcha', 'ONICHA']:
+            self.assertEqual(self.search(query), [self.market, self.mask], query)
+        for query in ['nwa', 'Ŋwa', 'strasse', 'awk']:
+            self.assertEqual(self.search(query), [self.mask], query)
+        self.assertEqual(self.search('"); drop'), [])
+        self.assertEqual(self.search('  '), [])
+
+    def test_rank_and_snippet_from_one_join(self):
+        queryset = archive_index.search(Archive.objects.filter(is_approved=True), 'market')
+        sql = str(queryset.query)
+        # The index table is joined, not queried again for every row
+        self.assertNotIn('(SELECT', sql)
+        self.assertIn(archive_index.table, sql[sql.index(' FROM '):sql.index(' WHERE ')])
+        with self.assertNumQueries(1):
+            results = list(queryset)
+        self.assertEqual(results, [self.market])
+        self.assertIn('\x02market\x03', results[0].search_snippet)
+        self.assertEqual(queryset.count(), 1)
+
+    def test_index_follows_rows(self):
+        self.market.title = 'Changed'
+        self.market.save()
+        self.assertEqual(self.search('scene'), [])
+        self.assertEqual(self.search('traders'), [self.market])
+        self.assertEqual(self.search('mask'), [self.mask])
+        self.mask.delete()
+        self.assertEqual(self.search('mask'), [])
+
+
+class ArchiveListTests(TestCase):
+    """Date-ordered grids scroll by cursor; other sorts keep numbered pages"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user('browser', 'browser@example.com', 'password')
+        for i in range(30):
+            Archive.objects.create(title=f'a{i}', description='d', archive_type='video', uploaded_by=user)
+
+    def cards(self, response):
+        return response.content.decode().count('class="card h-100"')
+
+    def test_infinite_scroll(self):
+        response = self.client.get('/archives/', HTTP_HX_REQUEST='true')
+        self.assertEqual(self.cards(response), 12)
+        url = html.unescape(re.search(r'hx-get="([^"]+)"', response.content.decode()).group(1))
+        self.assertIn('cursor=', url)
+
+        # Later pages are one query and only the grid partial
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_HX_REQUEST='true')
+        self.assertEqual(self.cards(response), 12)
+        self.assertTemplateNotUsed(response, 'archives/list.html')
+        self.assertEqual(self.client.get('/archives/?cursor=garbage').status_code, 200)
+
+    def test_other_sorts_keep_numbered_pages(self):
+        response = self.client.get('/archives/?sort=title&page=2', HTTP_HX_REQUEST='true')
+        self.assertEqual(self.cards(response), 12)
+        self.assertContains(response, 'page-link')
+        self.assertNotContains(response, 'infinite-scroll-trigger')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ImageDerivativeTests(TestCase):
+    """Grids serve resized WebP and JPEG copies, written by the worker, instead of the upload"""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings_override = override_settings(MEDIA_ROOT=media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+        self.derivatives = os.path.join(media, DERIVATIVE_PREFIX, 'archives')
+        buffer = BytesIO()
+        Image.new('RGBA', (1200, 800), (255, 0, 0, 128)).save(buffer, 'PNG')
+        user = get_user_model().objects.create_user('photographer', 'photo@example.com', 'password')
+        self.archive = Archive(title='Photo', description='d', archive_type='image', uploaded_by=user)
+        self.archive.image.save('photo.png', ContentFile(buffer.getvalue()), save=False)
+        self.archive.save()
+
+    def build(self):
+        jobs.work(burst=True, poll_interval=0)
+
+    def media_path(self, width, ext):
+        return self.archive.image.storage.path(derivative_name(self.archive.image.name, width, ext))
+
+    def test_derivatives(self):
+        self.assertNotContains(self.client.get('/archives/'), 'type="image/webp"')
+        self.build()
+        self.assertEqual(available_widths(self.archive.image), [320, 640, 1024])
+        self.assertEqual(len(os.listdir(self.derivatives)), 6)
+        # Transparent uploads are flattened for JPEG
+        with Image.open(self.media_path(640, 'jpg')) as image:
+            self.assertEqual((image.mode, image.size), ('RGB', (640, 427)))
+
+        response = self.client.get('/archives/')
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, '640w')
+        self.assertEqual(thumbnail_url(self.archive.image, 500), self.archive.image.storage.url(
+            derivative_name(self.archive.image.name, 640, 'webp')
+        ))
+
+    def test_generated_once_and_deleted_with_the_archive(self):
+        self.build()
+        self.archive.title = 'Renamed'
+        self.archive.save()
+        self.assertFalse(Job.objects.filter(task='core.tasks.generate_image_derivatives').exists())
+        self.archive.delete()
+        self.assertEqual(os.listdir(self.derivatives), [])
+
+
+def b64(value):
+    return base64.b64encode(value.encode()).decode()
+
+
+class ChunkedUploadTests(TestCase):
+    """Large files arrive as tus PATCH chunks; a failed chunk costs only itself"""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings_override = override_settings(
+            MEDIA_ROOT=media, CHUNKED_UPLOAD_DIR=os.path.join(media, 'parts'), CHUNKED_UPLOAD_MAX_CHUNK=1024,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = get_user_model().objects.create_user('uploader', 'uploader@example.com', 'password')
+        self.client.force_login(self.user)
+        self.data = os.urandom(2500)
+
+    def start(self, filename='clip.mp4', size=None, checksum=None):
+        metadata = f'filename {b64(filename)},kind {b64("video")}'
+        if checksum is not None:
+            metadata += f',checksum {b64(checksum)}'
+        return self.client.post(
+            '/api/uploads/', HTTP_UPLOAD_LENGTH=str(len(self.data) if size is None else size),
+            HTTP_UPLOAD_METADATA=metadata,
+        )
+
+    def send(self, url, offset, length, **headers):
+        return self.client.generic(
+            'PATCH', url, self.data[offset:offset + length],
+            content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset), **headers,
+        )
+
+    def test_resumed_upload_becomes_an_archive(self):
+        response = self.start(checksum=hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(response.status_code, 201)
+        url = response['Location']
+        self.assertEqual(self.send(url, 0, 1024)['Upload-Offset'], '1024')
+
+        # A corrupt chunk and a chunk at the wrong offset are refused and not kept
+        wrong = 'sha256 ' + base64.b64encode(b'x' * 32).decode()
+        self.assertEqual(self.send(url, 1024, 1024, HTTP_UPLOAD_CHECKSUM=wrong).status_code, 460)
+        self.assertEqual(self.send(url, 0, 10).status_code, 409)
+        self.assertEqual(self.client.head(url)['Upload-Offset'], '1024')
+
+        right = 'sha256 ' + base64.b64encode(hashlib.sha256(self.data[1024:2048]).digest()).decode()
+        self.assertEqual(self.send(url, 1024, 1024, HTTP_UPLOAD_CHECKSUM=right).status_code, 204)
+        self.assertEqual(self.send(url, 2048, 1024).status_code, 204)
+        upload = ChunkedUpload.objects.get()
+        self.assertTrue(upload.is_complete)
+
+        response = self.client.post('/archives/create/', {
+            'title': 'Clip', 'description': 'd', 'archive_type': 'video', 'caption': 'c', 'upload_id': str(upload.pk),
+        })
+        self.assertEqual(response.status_code, 302)
+        with Archive.objects.get().video.open('rb') as handle:
+            self.assertEqual(handle.read(), self.data)
+        self.assertFalse(ChunkedUpload.objects.exists())
+        self.assertFalse(os.path.exists(upload.path))
+
+    def test_assembled_file_is_checked(self):
+        url = self.start(checksum='0' * 64)['Location']
+        self.send(url, 0, 1024)
+        self.send(url, 1024, 1024)
+        self.assertEqual(self.send(url, 2048, 1024).status_code, 460)
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+    def test_rejected(self):
+        self.assertEqual(self.start(size=60 * 1024 * 1024).status_code, 400)
+        self.assertEqual(self.start(filename='clip.exe').status_code, 400)
+        url = self.start()['Location']
+        self.assertEqual(self.send(url, 0, 2000).status_code, 413)
+        # Sessions belong to the user who started them
+        self.client.force_login(get_user_model().objects.create_user('other', 'other@example.com', 'password'))
+        self.assertEqual(self.client.head(url).status_code, 404)
+
+    def test_expired_sessions_are_purged(self):
+        self.start()
+        upload = ChunkedUpload.objects.get()
+        ChunkedUpload.objects.update(updated_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(purge_expired_uploads(), 1)
+        self.assertFalse(os.path.exists(upload.path))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ArchiveFacetTests(TestCase):
+    """Each filter's counts apply every other active filter, from one cached grouped query"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('curator', 'curator@example.com', 'password')
+        masks = Category.objects.create(name='Masks', slug='masks')
+        Category.objects.create(name='Empty', slug='empty')
+        self.make(archive_type='image', category=masks, date_created=date(1912, 1, 1))
+        self.make(archive_type='video', category=masks, date_created=date(1925, 1, 1))
+        self.make(archive_type='image')
+
+    def make(self, **kwargs):
+        return Archive.objects.create(title='Onitsha', description='d', uploaded_by=self.user, **kwargs)
+
+    def counts(self, facets, name):
+        return {option['value']: option['count'] for option in facets[name]}
+
+    def test_counts(self):
+        facets = archive_facets()
+        self.assertEqual(self.counts(facets, 'category'), {'empty': 0, 'masks': 2})
+        self.assertEqual(self.counts(facets, 'type')['image'], 2)
+        self.assertEqual([(option['value'], option['count']) for option in facets['decade']], [('1910', 1), ('1920', 1)])
+        with self.assertNumQueries(0):
+            archive_facets()
+
+        facets = archive_facets(archive_type='image')
+        self.assertEqual(self.counts(facets, 'category')['masks'], 1)
+        # A facet ignores its own filter
+        self.assertEqual(self.counts(facets, 'type')['video'], 1)
+        facets = archive_facets(search='onitsha', decade=1920)
+        self.assertEqual(self.counts(facets, 'type'), {'image': 0, 'video': 1, 'document': 0, 'audio': 0})
+
+    def test_invalidated_by_saves(self):
+        archive_facets()
+        self.make(archive_type='audio')
+        self.assertEqual(self.counts(archive_facets(), 'type')['audio'], 1)
+
+    def test_list_filters(self):
+        response = self.client.get('/archives/?decade=1910')
+        self.assertEqual(len(list(response.context['archives'])), 1)
+        self.assertContains(response, 'Empty (0)')
+        response = self.client.get('/archives/?type=video', HTTP_HX_REQUEST='true')
+        self.assertTemplateUsed(response, 'archives/partials/archive_results.html')
+        self.assertContains(response, 'hx-swap-oob')
+
+
+class ArchiveImportTests(TestCase):
+    """import_archives inserts manifest rows in batches and does what the skipped save signals would"""
+
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source)
+        self.addCleanup(shutil.rmtree, self.media)
+        get_user_model().objects.create_user('curator', 'curator@example.com', 'password')
+        Category.objects.create(name='Masks', slug='masks')
+        for i in range(3):
+            # Noise keeps the JPEG above the image field's minimum size
+            Image.effect_noise((1200, 1200), 80).convert('RGB').save(os.path.join(self.source, f'p{i}.jpg'), quality=100)
+        with open(os.path.join(self.source, 'small.jpg'), 'wb') as handle:
+            handle.write(b'x')
+
+        rows = [
+            {
+                'file': f'p{i}.jpg', 'title': f'Photo {i}', 'description': 'd', 'caption': 'c',
+                'category': 'Masks' if i else 'New Cat', 'tags': 'igbo, mask', 'date_created': f'1910-01-0{i + 1}',
+            }
+            for i in range(3)
+        ]
+        rows.append({'file': 'small.jpg', 'title': 'Small', 'description': 'd', 'caption': 'c'})
+        self.manifest = os.path.join(self.source, 'manifest.csv')
+        with open(self.manifest, 'w', newline='') as handle:
+            writer = csv.DictWriter(handle, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def run_import(self, *args):
+        out, err = StringIO(), StringIO()
+        with override_settings(MEDIA_ROOT=self.media):
+            call_command(
+                'import_archives', self.manifest, '--user', 'curator', '--workers', '2', '--batch-size', '2', *args,
+                stdout=out, stderr=err,
+            )
+        return out.getvalue(), err.getvalue()
+
+    def test_import(self):
+        out, err = self.run_import('--dry-run')
+        self.assertIn('would import 3', out)
+        self.assertIn('Minimum file size', err)
+        self.assertFalse(Archive.objects.exists())
+
+        self.run_import()
+        self.assertEqual(Archive.objects.count(), 3)
+        archive = Archive.objects.get(title='Photo 0')
+        self.assertEqual((archive.category.name, archive.archive_type), ('New Cat', 'image'))
+        self.assertTrue(os.path.exists(os.path.join(self.media, archive.image.name)))
+        self.assertEqual(sorted(archive.tags.names()), ['igbo', 'mask'])
+        self.assertEqual(TagUsage.objects.get(tag__name='igbo').count, 3)
+        self.assertEqual(archive_index.search(Archive.objects.all(), 'photo').count(), 3)
+        self.assertEqual(Job.objects.filter(task='core.tasks.generate_image_derivatives').count(), 3)
+        self.assertTrue(RelatedArchive.objects.filter(archive=archive).exists())
+
+        # Rows imported before are skipped on a second run
+        out, err = self.run_import()
+        self.assertIn('Skipping 3', out)
+        self.assertEqual(Archive.objects.count(), 3)
+
+    def test_ambiguous_extensions_need_a_type(self):
+        self.assertEqual(infer_type('a.OGG'), '')
+        self.assertEqual(infer_type('a.mp3'), 'audio')
+        self.assertEqual(infer_type('a.jpg'), 'image')
+        row = {'file': 'x.ogg', 'title': 't', 'description': 'd', 'caption': 'c'}
+        errors = check_row((0, row, '/nonexistent'))[3]
+        self.assertIn("archive_type is required for 'x.ogg' (one of video, audio)", errors)
+        cleaned = check_row((0, dict(row, archive_type='audio'), '/nonexistent'))[1]
+        self.assertEqual(cleaned['archive_type'], 'audio')
+
+    def test_group_refresh_matches_rebuild(self):
+        user = get_user_model().objects.get()
+        masks, cloth = Category.objects.get(), Category.objects.create(name='Cloth', slug='cloth')
+        existing = [
+            Archive.objects.create(title=f'o{i}', archive_type='video', uploaded_by=user, category=[masks, cloth, None][i % 3])
+            for i in range(9)
+        ]
+        existing[2].tags.add('mask')
+        imported = Archive.objects.bulk_create([
+            Archive(title=f'n{i}', archive_type='video', uploaded_by=user, category=masks if i % 2 else None)
+            for i in range(5)
+        ])
+        imported[0].tags.add('mask')
+        rebuild_all()
+        expected = sorted(RelatedArchive.objects.values_list('archive_id', 'related_id', 'score'))
+        RelatedArchive.objects.filter(archive__in=imported).delete()
+        refresh_group(imported)
+        self.assertEqual(sorted(RelatedArchive.objects.values_list('archive_id', 'related_id', 'score')), expected)
+
+
+OAI = {'o': 'http://www.openarchives.org/OAI/2.0/', 'dc': 'http://purl.org/dc/elements/1.1/'}
+
+
+@override_settings(OAI_PAGE_SIZE=3)
+class OaiPmhTests(TestCase):
+    """Harvesters page through approved archives with signed resumption tokens"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('curator', 'curator@example.com', 'password')
+        masks = Category.objects.create(name='Masks', slug='masks')
+        for i in range(7):
+            archive = Archive.objects.create(
+                title=f'Mask {i} \x01 & <b>', description='d', archive_type='video', uploaded_by=cls.user,
+                category=masks if i % 2 else None, original_author='Northcote Thomas', location='Awka',
+            )
+            archive.tags.add('igbo')
+        Archive.objects.create(title='Hidden', description='d', archive_type='video', uploaded_by=cls.user, is_approved=False)
+
+    def get(self, **params):
+        response = self.client.get('/oai/', params)
+        self.assertEqual(response['Content-Type'], 'text/xml; charset=utf-8')
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return ElementTree.fromstring(content)
+
+    def error(self, **params):
+        return self.get(**params).find('o:error', OAI).get('code')
+
+    def harvest(self, verb='ListRecords'):
+        identifiers, pages = [], 0
+        params = {'verb': verb, 'metadataPrefix': 'oai_dc'}
+        while True:
+            root = self.get(**params)
+            pages += 1
+            identifiers += [header.text for header in root.findall('.//o:header/o:identifier', OAI)]
+            token = root.find('.//o:resumptionToken', OAI)
+            if token is None or not token.text:
+                return identifiers, pages
+            if pages == 1:
+                # Rows added mid-harvest sort after the token's position
+                Archive.objects.create(title='New', description='d', archive_type='video', uploaded_by=self.user)
+            params = {'verb': verb, 'resumptionToken': token.text}
+
+    def test_harvest(self):
+        identifiers, pages = self.harvest()
+        self.assertEqual((len(identifiers), len(set(identifiers)), pages), (8, 8, 3))
+
+        record = self.get(verb='GetRecord', metadataPrefix='oai_dc', identifier=identifiers[0])
+        self.assertEqual(record.find('.//dc:creator', OAI).text, 'Northcote Thomas')
+        self.assertEqual(record.find('.//dc:title', OAI).text, 'Mask 0  & <b>')
+        self.assertIn('igbo', [subject.text for subject in record.findall('.//dc:subject', OAI)])
+
+        listed = self.get(verb='ListIdentifiers', metadataPrefix='oai_dc', set='masks')
+        self.assertEqual(len(listed.findall('.//o:header', OAI)), 3)
+        self.assertEqual(len(self.get(verb='ListSets').findall('.//o:set', OAI)), 1)
+        self.assertEqual(self.get(verb='Identify').find('.//o:deletedRecord', OAI).text, 'no')
+        self.assertEqual(self.client.post('/oai/', {'verb': 'Identify'}).status_code, 200)
+
+    def test_errors(self):
+        hidden = Archive.objects.get(title='Hidden')
+        self.assertEqual(self.error(verb='Bogus'), 'badVerb')
+        self.assertEqual(self.error(verb='ListRecords', metadataPrefix='x'), 'cannotDisseminateFormat')
+        self.assertEqual(self.error(verb='ListRecords', resumptionToken='junk'), 'badResumptionToken')
+        self.assertEqual(self.error(verb='ListRecords', metadataPrefix='oai_dc', **{'from': '2999-01-01'}), 'noRecordsMatch')
+        self.assertEqual(
+            self.error(verb='ListRecords', metadataPrefix='oai_dc', until='2999-01-01T00:00:00Z', **{'from': '2000-01-01'}),
+            'badArgument',
+        )
+        self.assertEqual(
+            self.error(verb='GetRecord', metadataPrefix='oai_dc', identifier=oai_identifier(hidden.pk)), 'idDoesNotExist'
+        )
+
+
+class ArchiveApiTests(TestCase):
+    """/api/v1/archives/ pages by cursor, returns only the requested fields and answers If-None-Match"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user('curator', 'curator@example.com', 'password', full_name='Ada')
+        masks = Category.objects.create(name='Masks', slug='masks')
+        cls.archives = []
+        for i in range(5):
+            archive = Archive.objects.create(
+                title=f't{i}', description='long', archive_type='audio', audio='archives/audio/a.mp3',
+                uploaded_by=user, category=masks,
+            )
+            archive.tags.add('igbo', f'x{i}')
+            cls.archives.append(archive)
+        cls.hidden = Archive.objects.create(title='Hidden', description='d', archive_type='video', uploaded_by=user, is_approved=False)
+
+    def test_list(self):
+        with self.assertNumQueries(2):
+            data = self.client.get('/api/v1/archives/?limit=2').json()
+        first = data['results'][0]
+        self.assertEqual(len(data['results']), 2)
+        self.assertNotIn('description', first)
+        self.assertEqual(first['category'], {'slug': 'masks', 'name': 'Masks'})
+        self.assertEqual(sorted(first['tags']), ['igbo', 'x4'])
+
+        seen = [item['id'] for item in data['results']]
+        while data['next']:
+            data = self.client.get(data['next']).json()
+            seen += [item['id'] for item in data['results']]
+        self.assertEqual(seen, [archive.pk for archive in reversed(self.archives)])
+        self.assertEqual(len(self.client.get('/api/v1/archives/?tag=x1').json()['results']), 1)
+
+    def test_sparse_fields_and_etag(self):
+        url = '/api/v1/archives/?fields=id,title,uploaded_by'
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.json()['results'][0], {
+            'id': self.archives[-1].pk, 'title': 't4', 'uploaded_by': {'username': 'curator', 'name': 'Ada'},
+        })
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get('/api/v1/archives/?fields=nope').status_code, 400)
+
+    def test_detail(self):
+        data = self.client.get(f'/api/v1/archives/{self.archives[0].pk}/?fields=id,description,media').json()
+        self.assertEqual(data['description'], 'long')
+        self.assertEqual(data['media']['url'], 'http://testserver/media/archives/audio/a.mp3')
+        self.assertEqual(self.client.get(f'/api/v1/archives/{self.hidden.pk}/').status_code, 404)
@@ -0,0 +1,162 @@
+"""
+Resumable chunked uploads
+Large video and audio files are sent in small PATCH requests (see
+api/upload_views.py) and appended to a partial file on disk, so a dropped
+connection only costs the current chunk and no worker is tied up for the
+whole transfer. Once every byte has arrived and the checksum matches, the
+file is attached to an Archive's video or audio field.
+"""
+import hashlib
+import logging
+import os
+from datetime import timedelta
+from types import SimpleNamespace
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.utils import timezone
+from .models import Archive, ChunkedUpload
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """An upload request that cannot be applied; carries the HTTP status to return"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def validate_upload(kind, filename, size):
+    """Run the Archive field's own validators (extension, size) against the announced file"""
+    if kind not in dict(ChunkedUpload.KIND_CHOICES):
+        raise UploadError(f'Unsupported upload type: {kind}')
+    stub = SimpleNamespace(name=filename, size=size)
+    try:
+        for validator in Archive._meta.get_field(kind).validators:
+            validator(stub)
+    except ValidationError as e:
+        raise UploadError(' '.join(e.messages))
+
+
+def create_upload(user, kind, filename, size, checksum=''):
+    """Start a new upload session and create its empty partial file"""
+    filename = os.path.basename(filename or '')
+    if not filename:
+        raise UploadError('A filename is required')
+    validate_upload(kind, filename, size)
+    purge_expired_uploads()
+
+    upload = ChunkedUpload.objects.create(
+        user=user,
+        kind=kind,
+        filename=filename,
+        size=size,
+        checksum=(checksum or '').lower(),
+    )
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    open(upload.path, 'wb').close()
+    return upload
+
+
+def append_chunk(upload, offset, stream, length, chunk_checksum=None):
+    """
+    Write `length` bytes from `stream` at `offset`. `chunk_checksum` is the
+    expected SHA-256 digest of this chunk, if the client sent one. Returns the
+    updated upload.
+    """
+    if upload.is_complete:
+        raise UploadError('Upload is already complete', status=409)
+    if offset != upload.offset:
+        raise UploadError('Upload-Offset does not match the current offset', status=409)
+    if length > settings.CHUNKED_UPLOAD_MAX_CHUNK:
+        raise UploadError('Chunk is too large', status=413)
+    if offset + length > upload.size:
+        raise UploadError('Chunk extends past Upload-Length', status=413)
+
+    digest = hashlib.sha256()
+    written = 0
+    with open(upload.path, 'r+b') as handle:
+        handle.seek(offset)
+        while written < length:
+            block = stream.read(min(READ_SIZE, length - written))
+            if not block:
+                break
+            handle.write(block)
+            digest.update(block)
+            written += len(block)
+        if written != length or (chunk_checksum is not None and digest.digest() != chunk_checksum):
+            # Discard the partial or corrupt chunk so the client can resend it
+            handle.truncate(offset)
+            if written != length:
+                raise UploadError('Chunk was interrupted', status=400)
+            raise UploadError('Checksum mismatch', status=460)
+
+    # Conditional update: a concurrent PATCH for the same offset loses
+    updated = ChunkedUpload.objects.filter(pk=upload.pk, offset=offset).update(
+        offset=offset + written, updated_at=timezone.now()
+    )
+    if not updated:
+        raise UploadError('Upload-Offset does not match the current offset', status=409)
+    upload.offset = offset + written
+
+    if upload.offset == upload.size:
+        finish_upload(upload)
+    return upload
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(READ_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def finish_upload(upload):
+    """Verify the assembled file against the announced checksum and mark it complete"""
+    if upload.checksum and file_checksum(upload.path) != upload.checksum:
+        discard_upload(upload)
+        raise UploadError('Checksum mismatch for the assembled file', status=460)
+    upload.completed_at = timezone.now()
+    upload.save(update_fields=['completed_at', 'updated_at'])
+
+
+def get_completed_upload(upload_id, user, kind):
+    """The user's completed upload of `kind` with this id, or None"""
+    if not upload_id:
+        return None
+    try:
+        return ChunkedUpload.objects.get(pk=upload_id, user=user, kind=kind, completed_at__isnull=False)
+    except (ChunkedUpload.DoesNotExist, ValidationError, ValueError):
+        return None
+
+
+def attach_upload(archive, upload):
+    """
+    Copy a completed upload into media storage as the archive's video/audio
+    file. The caller saves the archive and then discards the upload.
+    """
+    with open(upload.path, 'rb') as handle:
+        getattr(archive, upload.kind).save(upload.filename, File(handle), save=False)
+
+
+def discard_upload(upload):
+    """Delete an upload session and its partial file"""
+    try:
+        os.remove(upload.path)
+    except FileNotFoundError:
+        pass
+    upload.delete()
+
+
+def purge_expired_uploads():
+    """Remove sessions that were not completed or attached within the expiry window"""
+    cutoff = timezone.now() - timedelta(hours=settings.CHUNKED_UPLOAD_EXPIRY_HOURS)
+    expired = list(ChunkedUpload.objects.filter(updated_at__lt=cutoff))
+    for upload in expired:
+        discard_upload(upload)
+    return len(expired)
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import views, iiif
 
 app_name = 'archives'
 
@@ -8,4 +8,8 @@ urlpatterns = [
     path('create/', views.archive_create, name='create'),
     path('<int:pk>/', views.archive_detail, name='detail'),
     path('<int:pk>/edit/', views.archive_edit, name='edit'),
+    path('<int:pk>/manifest.json', iiif.iiif_manifest, name='iiif_manifest'),
+    path('<int:pk>/iiif', iiif.iiif_base, name='iiif_base'),
+    path('<int:pk>/iiif/info.json', iiif.iiif_info, name='iiif_info'),
+    path('<int:pk>/iiif/<str:region>/<str:size>/<str:rotation>/<str:quality>.<str:format>', iiif.iiif_image, name='iiif_image'),
 ]
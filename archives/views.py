@@ -2,7 +2,15 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from .models import Archive, Category
+from .search import archive_index
+from .related import RELATED_LIMIT
+from .uploads import attach_upload, discard_upload, get_completed_upload
+from .facets import archive_facets, filter_by_decade, parse_decade
 from django.core.paginator import Paginator
+from core.counters import VIEW_SORTS, record_view
+from core.pagination import keyset_paginate
+from core.tags import sync_tags
+from core.tiles import pyramid_info
 
 def archive_list(request):
     archives = Archive.objects.filter(is_approved=True)
@@ -11,35 +19,55 @@ def archive_list(request):
     if category:
         archives = archives.filter(category__slug=category)
     
-    search = request.GET.get('search')
-    if search:
-        archives = archives.filter(title__icontains=search)
-    
     archive_type = request.GET.get('type')
     if archive_type:
         archives = archives.filter(archive_type=archive_type)
     
-    sort = request.GET.get('sort', '-created_at')
-    archives = archives.order_by(sort)
+    decade = parse_decade(request.GET.get('decade'))
+    if decade is not None:
+        archives = filter_by_decade(archives, decade)
     
-    paginator = Paginator(archives, 12)
-    page = request.GET.get('page')
-    archives = paginator.get_page(page)
+    # Ranked, diacritic-insensitive search; best matches first unless a sort is chosen
+    search = request.GET.get('search')
+    sort = request.GET.get('sort') or ('relevance' if search else '-created_at')
+    if search:
+        archives = archive_index.search(archives, search)
+    if sort in VIEW_SORTS:
+        archives = archives.order_by(*VIEW_SORTS[sort])
+    elif sort != 'relevance':
+        archives = archives.order_by(sort)
+    elif not search:
+        archives = archives.order_by('-created_at')
+    
+    # Date-ordered grids scroll by cursor; other sorts keep numbered pages
+    if sort in ('-created_at', 'created_at'):
+        archives = keyset_paginate(
+            archives, request.GET.get('cursor'), 12,
+            descending=sort == '-created_at', querydict=request.GET
+        )
+    else:
+        paginator = Paginator(archives, 12)
+        page = request.GET.get('page')
+        archives = paginator.get_page(page)
     
-    categories = Category.objects.all()
+    # Later pages only append cards to the grid
+    if request.htmx and (request.GET.get('cursor') or request.GET.get('page')):
+        return render(request, 'archives/partials/archive_grid.html', {'archives': archives})
     
+    # Filter option counts (one grouped query, cached per filter combination)
     context = {
         'archives': archives,
-        'categories': categories,
+        'facets': archive_facets(category, archive_type, decade, search),
     }
     
     if request.htmx:
-        return render(request, 'archives/partials/archive_grid.html', context)
+        return render(request, 'archives/partials/archive_results.html', context)
     
     return render(request, 'archives/list.html', context)
 
 def archive_detail(request, pk):
     archive = get_object_or_404(Archive, pk=pk, is_approved=True)
+    record_view(request, archive)
     
     # Get previous and next archives
     previous_archive = Archive.objects.filter(
@@ -52,32 +80,28 @@ def archive_detail(request, pk):
         created_at__gt=archive.created_at
     ).order_by('created_at').first()
     
-    # Get recommended archives (9 total: same category, same tags, or featured)
-    recommended = Archive.objects.filter(is_approved=True).exclude(pk=archive.pk)
-    
-    if archive.category:
-        recommended = recommended.filter(category=archive.category)
-    
-    # If we need more, add by tags
-    if recommended.count() < 9:
-        tag_names = archive.tags.values_list('name', flat=True)
-        if tag_names:
-            recommended = Archive.objects.filter(
-                is_approved=True,
-                tags__name__in=tag_names
-            ).exclude(pk=archive.pk).distinct()
-    
-    # If still need more, add random archives
-    if recommended.count() < 9:
-        recommended = Archive.objects.filter(is_approved=True).exclude(pk=archive.pk).order_by('?')
-    
-    recommended = recommended[:9]
+    # Get recommended archives (9 total) from the precomputed related-archives
+    # table, topped up with the newest archives when it has fewer entries
+    recommended = list(
+        Archive.objects.filter(recommended_in__archive=archive)
+        .select_related('uploaded_by')
+        .order_by('-recommended_in__score')[:RELATED_LIMIT]
+    )
+    if len(recommended) < RELATED_LIMIT:
+        recommended += list(
+            Archive.objects.filter(is_approved=True)
+            .exclude(pk__in=[archive.pk] + [item.pk for item in recommended])
+            .select_related('uploaded_by')
+            .order_by('-created_at')[:RELATED_LIMIT - len(recommended)]
+        )
     
     context = {
         'archive': archive,
         'previous_archive': previous_archive,
         'next_archive': next_archive,
         'recommended': recommended,
+        # Offer the deep-zoom viewer once the tile pyramid has been built
+        'deep_zoom': archive.archive_type == 'image' and pyramid_info(archive.image) is not None,
     }
     
     return render(request, 'archives/detail.html', context)
@@ -118,17 +142,24 @@ def archive_create(request):
             is_approved=False  # Requires admin approval before appearing on frontend
         )
         
+        # Large video/audio files may arrive earlier through a resumable upload
+        upload = None
+        if not request.FILES.get(archive_type):
+            upload = get_completed_upload(request.POST.get('upload_id'), request.user, archive_type)
+        
         # Handle file uploads based on type
         if archive_type == 'image' and request.FILES.get('image'):
             archive.image = request.FILES['image']
-        elif archive_type == 'video' and request.FILES.get('video'):
-            archive.video = request.FILES['video']
+        elif archive_type == 'video' and (request.FILES.get('video') or upload):
+            if request.FILES.get('video'):
+                archive.video = request.FILES['video']
             if request.FILES.get('featured_image'):
                 archive.featured_image = request.FILES['featured_image']
         elif archive_type == 'document' and request.FILES.get('document'):
             archive.document = request.FILES['document']
-        elif archive_type == 'audio' and request.FILES.get('audio'):
-            archive.audio = request.FILES['audio']
+        elif archive_type == 'audio' and (request.FILES.get('audio') or upload):
+            if request.FILES.get('audio'):
+                archive.audio = request.FILES['audio']
             if request.FILES.get('featured_image'):
                 archive.featured_image = request.FILES['featured_image']
         else:
@@ -136,13 +167,13 @@ def archive_create(request):
             return redirect('archives:create')
         
         try:
+            if upload:
+                attach_upload(archive, upload)
             archive.save()
+            if upload:
+                discard_upload(upload)
             
-            # Add tags
-            tags = request.POST.get('tags', '').split(',')
-            for tag in tags:
-                if tag.strip():
-                    archive.tags.add(tag.strip())
+            sync_tags(archive, request.POST.get('tags', ''))
             
             messages.success(request, 'Archive uploaded successfully!')
             return redirect('archives:detail', pk=archive.pk)
@@ -181,12 +212,7 @@ def archive_edit(request, pk):
         if request.FILES.get('featured_image'):
             archive.featured_image = request.FILES['featured_image']
         
-        # Clear existing tags and add new ones
-        archive.tags.clear()
-        tags = request.POST.get('tags', '').split(',')
-        for tag in tags:
-            if tag.strip():
-                archive.tags.add(tag.strip())
+        sync_tags(archive, request.POST.get('tags', ''))
         
         archive.save()
         messages.success(request, 'Archive updated successfully!')
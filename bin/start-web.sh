@@ -0,0 +1,20 @@
+#!/bin/sh
+# Start gunicorn with the background worker beside it. The worker shares the
+# instance's SQLite database, so it runs here under a restart loop rather than
+# as a separate service; both are stopped together.
+set -u
+
+supervise_worker() {
+    while true; do
+        python manage.py runworker --concurrency 2
+        echo "runworker exited with status $?, restarting in 5s" >&2
+        sleep 5
+    done
+}
+
+supervise_worker &
+gunicorn --bind 0.0.0.0:"$PORT" --reuse-port igbo_archives.wsgi:application &
+GUNICORN_PID=$!
+
+trap 'trap - INT TERM EXIT; kill 0' INT TERM EXIT
+wait "$GUNICORN_PID"
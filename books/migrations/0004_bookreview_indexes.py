@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0003_bookreview_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bookreview',
+            index=models.Index(fields=['is_published', 'is_approved', '-created_at'], name='review_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookreview',
+            index=models.Index(condition=models.Q(('is_approved', True), ('is_published', True)), fields=['-created_at', '-id'], name='review_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookreview',
+            index=models.Index(condition=models.Q(('is_approved', False), ('pending_approval', True)), fields=['-created_at'], name='review_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookreview',
+            index=models.Index(fields=['reviewer', '-created_at'], name='review_reviewer_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookreview',
+            index=models.Index(condition=models.Q(('is_published', False)), fields=['reviewer', '-updated_at'], name='review_reviewer_drafts_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_bookreview_content_html'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedReview',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommended_in', to='books.bookreview')),
+                ('review', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='books.bookreview')),
+            ],
+            options={
+                'ordering': ['-score'],
+                'indexes': [models.Index(fields=['review', '-score'], name='related_review_score_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='relatedreview',
+            constraint=models.UniqueConstraint(fields=('review', 'related'), name='unique_related_review'),
+        ),
+    ]
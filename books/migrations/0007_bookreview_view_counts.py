@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0006_relatedreview'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookreview',
+            name='popular_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='bookreview',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='bookreview',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='bookreview',
+            index=models.Index(condition=models.Q(('is_approved', True), ('is_published', True)), fields=['-popular_score', '-id'], name='review_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookreview',
+            index=models.Index(condition=models.Q(('is_approved', True), ('is_published', True)), fields=['-trending_score', '-id'], name='review_trending_idx'),
+        ),
+    ]
@@ -38,6 +38,10 @@ class BookReview(models.Model):
     
     # Legacy CKEditor content (for backward compatibility)
     legacy_content = models.TextField(blank=True, help_text="Legacy HTML content")
+
+    # Sanitised HTML rendered from the fields above on save (core.editorjs)
+    content_html = models.TextField(blank=True, editable=False)
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
     
     rating = models.IntegerField(choices=RATING_CHOICES)
     
@@ -82,11 +86,52 @@ class BookReview(models.Model):
     is_approved = models.BooleanField(default=False)
     pending_approval = models.BooleanField(default=False, help_text="Review is pending admin approval")
     submitted_at = models.DateTimeField(null=True, blank=True, help_text="When review was submitted for approval")
+
+    # Popularity, updated in batches by core.counters
+    view_count = models.PositiveIntegerField(default=0, editable=False)
+    popular_score = models.FloatField(default=0, editable=False)
+    trending_score = models.FloatField(default=0, editable=False)
     
     tags = TaggableManager()
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Public listings, prev/next navigation and sitemaps
+            models.Index(fields=['is_published', 'is_approved', '-created_at'], name='review_status_created_idx'),
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=models.Q(is_published=True, is_approved=True),
+                name='review_published_idx',
+            ),
+            # Moderation queue
+            models.Index(
+                fields=['-created_at'],
+                condition=models.Q(pending_approval=True, is_approved=False),
+                name='review_pending_idx',
+            ),
+            # Dashboard and profile pages
+            models.Index(fields=['reviewer', '-created_at'], name='review_reviewer_created_idx'),
+            models.Index(fields=['reviewer', '-updated_at'], condition=models.Q(is_published=False), name='review_reviewer_drafts_idx'),
+            # "Most viewed" and "Trending" sorts
+            models.Index(
+                fields=['-popular_score', '-id'],
+                condition=models.Q(is_published=True, is_approved=True),
+                name='review_popular_idx',
+            ),
+            models.Index(
+                fields=['-trending_score', '-id'],
+                condition=models.Q(is_published=True, is_approved=True),
+                name='review_trending_idx',
+            ),
+        ]
+    
+    def save(self, *args, **kwargs):
+        """Persist the re-rendered HTML alongside a targeted save of the body"""
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'content_json', 'legacy_content'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'content_html', 'content_hash'}
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.book_title} - Review by {self.reviewer.full_name if hasattr(self.reviewer, 'full_name') else self.reviewer.username}"
@@ -95,3 +140,22 @@ class BookReview(models.Model):
     def content(self):
         """Return content_json if available, otherwise legacy_content"""
         return self.content_json if self.content_json else self.legacy_content
+
+
+class RelatedReview(models.Model):
+    """Precomputed recommendation for book_detail, scored by text similarity (core.similarity)"""
+    review = models.ForeignKey(BookReview, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(BookReview, on_delete=models.CASCADE, related_name='recommended_in')
+    score = models.FloatField()
+    
+    class Meta:
+        ordering = ['-score']
+        constraints = [
+            models.UniqueConstraint(fields=['review', 'related'], name='unique_related_review'),
+        ]
+        indexes = [
+            models.Index(fields=['review', '-score'], name='related_review_score_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.related} for {self.review} ({self.score})"
@@ -0,0 +1,17 @@
+"""
+Related book reviews
+The TF-IDF neighbour index behind book_detail's recommendations (see
+core/similarity.py), comparing book and review titles, book authors and
+rendered review text.
+"""
+from core.similarity import SimilarityIndex
+from .models import BookReview, RelatedReview
+
+review_similarity = SimilarityIndex(
+    queryset=lambda: BookReview.objects.filter(is_published=True, is_approved=True).only(
+        'book_title', 'author', 'review_title', 'content_html'
+    ),
+    fields=['book_title', 'author', 'review_title', 'content_html'],
+    link_model=RelatedReview,
+    source_field='review',
+)
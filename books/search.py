@@ -0,0 +1,17 @@
+from core.editorjs import plain_text
+from core.search import SearchIndex
+from .models import BookReview
+
+
+def content_text(review):
+    return plain_text(review.content_json) or review.legacy_content
+
+
+review_index = SearchIndex(
+    BookReview,
+    table='books_bookreview_fts',
+    columns={
+        'title': ['book_title', 'review_title', 'author'],
+        'body': [content_text],
+    },
+)
@@ -0,0 +1,88 @@
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+from .models import BookReview, RelatedReview
+from .related import review_similarity
+from .search import review_index
+from core.images import needs_derivatives, delete_for_instance
+from core.jobs import enqueue, model_ref
+from core.editorjs import refresh_content_html
+from core.similarity import has_changed
+import logging
+
+logger = logging.getLogger(__name__)
+
+# What the similarity index reads; content_hash stands in for the rendered body
+SIMILARITY_FIELDS = ['book_title', 'author', 'review_title', 'content_hash', 'is_published', 'is_approved']
+SIMILARITY_SOURCE_FIELDS = {*SIMILARITY_FIELDS, 'content_json', 'legacy_content'}
+
+
+@receiver(pre_save, sender=BookReview)
+def render_review_content_html(sender, instance, update_fields=None, **kwargs):
+    """Re-render the stored HTML when the review body has changed."""
+    if update_fields is not None and not {'content_json', 'legacy_content'} & set(update_fields):
+        return
+    refresh_content_html(instance)
+
+
+@receiver(post_save, sender=BookReview)
+def update_review_search_index(sender, instance, **kwargs):
+    """Keep the full-text index in step with the review row."""
+    review_index.update(instance)
+
+
+@receiver(post_delete, sender=BookReview)
+def remove_review_from_search_index(sender, instance, **kwargs):
+    """Drop a deleted review from the full-text index."""
+    review_index.delete(instance.pk)
+
+
+@receiver(post_save, sender=BookReview)
+def generate_review_image_derivatives(sender, instance, **kwargs):
+    """Queue resized copies of new or replaced images."""
+    if needs_derivatives(instance):
+        enqueue('core.tasks.generate_image_derivatives', model_ref(instance))
+
+
+@receiver(post_delete, sender=BookReview)
+def delete_review_image_derivatives(sender, instance, **kwargs):
+    """Remove the resized copies of a deleted review's images."""
+    delete_for_instance(instance)
+
+
+@receiver(pre_save, sender=BookReview)
+def note_similarity_changes(sender, instance, update_fields=None, **kwargs):
+    """Note whether the save changes the text or visibility the recommendations use."""
+    if update_fields is not None and not SIMILARITY_SOURCE_FIELDS & set(update_fields):
+        instance._similarity_changed = False
+    else:
+        instance._similarity_changed = has_changed(instance, SIMILARITY_FIELDS)
+
+
+@receiver(post_save, sender=BookReview)
+def update_similar_reviews(sender, instance, **kwargs):
+    """Queue a rescore of the text-similarity recommendations the review appears in."""
+    if not getattr(instance, '_similarity_changed', True):
+        return
+    indexed = (
+        review_similarity.terms().filter(object_id=instance.pk).exists()
+        or RelatedReview.objects.filter(Q(review=instance) | Q(related=instance)).exists()
+    )
+    if (instance.is_published and instance.is_approved) or indexed:
+        enqueue('core.tasks.refresh_similar', 'books.related.review_similarity', instance.pk, unique=True)
+
+
+@receiver(pre_delete, sender=BookReview)
+def remember_similar_lists(sender, instance, **kwargs):
+    """Note which recommendation lists include a review about to be deleted."""
+    instance._listed_in = list(
+        RelatedReview.objects.filter(related=instance).values_list('review_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=BookReview)
+def refill_similar_lists(sender, instance, **kwargs):
+    """Drop a deleted review from the similarity index and refill the lists that lost it."""
+    listed_in = getattr(instance, '_listed_in', [])
+    if listed_in or (instance.is_published and instance.is_approved):
+        enqueue('core.tasks.refill_similar', 'books.related.review_similarity', listed_in, [instance.pk])
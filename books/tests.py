@@ -1,3 +1,64 @@
+from io import StringIO
+from unittest import skipUnless
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from books.models import BookReview
+from books.search import review_index
 
-# Create your tests here.
+
+class BookApiTests(TestCase):
+    """/api/v1/books/ lists published reviews and validates its filters"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user('reader', 'reader@example.com', 'password')
+        for rating, slug in [(4, 'good'), (2, 'poor')]:
+            BookReview.objects.create(
+                book_title='Things Fall Apart', author='Chinua Achebe', review_title=slug, slug=slug, rating=rating,
+                reviewer=user, content_json={'blocks': []}, is_published=True, is_approved=True,
+            )
+        BookReview.objects.create(
+            book_title='Draft', author='x', review_title='draft', slug='draft', rating=5, reviewer=user,
+            content_json={'blocks': []},
+        )
+
+    def test_list(self):
+        results = self.client.get('/api/v1/books/').json()['results']
+        self.assertEqual([item['slug'] for item in results], ['poor', 'good'])
+        results = self.client.get('/api/v1/books/?rating=4').json()['results']
+        self.assertEqual([(item['slug'], item['reviewer']['username']) for item in results], [('good', 'reader')])
+        self.assertEqual(self.client.get('/api/v1/books/?rating=x').status_code, 400)
+
+    def test_detail(self):
+        data = self.client.get('/api/v1/books/good/?fields=slug,rating,content').json()
+        self.assertEqual(data, {'slug': 'good', 'rating': 4, 'content': {'blocks': []}})
+        self.assertEqual(self.client.get('/api/v1/books/draft/').status_code, 404)
+
+
+@skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'Needs a full-text backend')
+class BookSearchTests(TestCase):
+    """Review search covers the book's title and author and the review body, without diacritics"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user('reader', 'reader@example.com', 'password')
+        cls.review = BookReview.objects.create(
+            book_title='Things Fall Apart', author='Chinụa Achebe', review_title='Okonkwo', slug='okonkwo', rating=5,
+            reviewer=user, is_published=True, is_approved=True,
+            content_json='{"blocks": [{"type": "paragraph", "data": {"text": "Umuofia ọkụ"}}]}',
+        )
+
+    def search(self, query):
+        return list(review_index.search(BookReview.objects.all(), query))
+
+    def test_search(self):
+        for query in ['chinua', 'Ọkụ', 'okonkwo', 'things apart']:
+            self.assertEqual(self.search(query), [self.review], query)
+        response = self.client.get('/books/', {'search': 'umuofia'}, HTTP_HX_REQUEST='true')
+        self.assertContains(response, '<mark>Umuofia</mark>')
+
+    def test_rebuild(self):
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('okonkwo'), [self.review])
@@ -3,19 +3,18 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
 from .models import BookReview
+from .search import review_index
 from django.core.paginator import Paginator
+from core.counters import VIEW_SORTS, record_view
+from core.pagination import keyset_paginate
+from core.similarity import SIMILAR_LIMIT
+from core.tags import sync_tags, top_tags
 from django.utils.text import slugify
 import json
 
 def book_list(request):
-    from taggit.models import Tag
-    
     reviews = BookReview.objects.filter(is_published=True, is_approved=True)
     
-    search = request.GET.get('search')
-    if search:
-        reviews = reviews.filter(book_title__icontains=search) | reviews.filter(review_title__icontains=search)
-    
     tag = request.GET.get('tag')
     if tag:
         reviews = reviews.filter(tags__name=tag)
@@ -24,27 +23,41 @@ def book_list(request):
     if rating:
         reviews = reviews.filter(rating__gte=int(rating))
     
-    sort = request.GET.get('sort', '-created_at')
-    reviews = reviews.order_by(sort)
-    
-    paginator = Paginator(reviews, 12)
-    page = request.GET.get('page')
-    reviews = paginator.get_page(page)
-    
-    tags = Tag.objects.filter(bookreview__isnull=False).distinct()
+    # Ranked, diacritic-insensitive search; best matches first unless a sort is chosen
+    search = request.GET.get('search')
+    sort = request.GET.get('sort') or ('relevance' if search else '-created_at')
+    if search:
+        reviews = review_index.search(reviews, search)
+    if sort in VIEW_SORTS:
+        reviews = reviews.order_by(*VIEW_SORTS[sort])
+    elif sort != 'relevance':
+        reviews = reviews.order_by(sort)
+    elif not search:
+        reviews = reviews.order_by('-created_at')
+    
+    # Date-ordered grids scroll by cursor; other sorts keep numbered pages
+    if sort in ('-created_at', 'created_at'):
+        reviews = keyset_paginate(
+            reviews, request.GET.get('cursor'), 12,
+            descending=sort == '-created_at', querydict=request.GET
+        )
+    else:
+        paginator = Paginator(reviews, 12)
+        page = request.GET.get('page')
+        reviews = paginator.get_page(page)
     
-    context = {
-        'reviews': reviews,
-        'tags': tags
-    }
+    context = {'reviews': reviews}
     
+    # The grid partial has no tag filter, so skip the tag query for HTMX swaps
     if request.htmx:
         return render(request, 'books/partials/book_grid.html', context)
     
+    context['tags'] = top_tags(BookReview)
     return render(request, 'books/list.html', context)
 
 def book_detail(request, slug):
     review = get_object_or_404(BookReview, slug=slug, is_published=True, is_approved=True)
+    record_view(request, review)
     
     # Get previous and next reviews
     previous_review = BookReview.objects.filter(
@@ -59,32 +72,17 @@ def book_detail(request, slug):
         created_at__gt=review.created_at
     ).order_by('created_at').first()
     
-    # Get recommended reviews (9 total: same tags, same rating, or recent)
-    recommended = BookReview.objects.filter(
-        is_published=True,
-        is_approved=True
-    ).exclude(slug=review.slug)
-    
-    tag_names = review.tags.values_list('name', flat=True)
-    if tag_names:
-        recommended = recommended.filter(tags__name__in=tag_names).distinct()
-    
-    # If we need more, add by rating
-    if recommended.count() < 9:
-        recommended = BookReview.objects.filter(
-            is_published=True,
-            is_approved=True,
-            rating=review.rating
-        ).exclude(slug=review.slug)
-    
-    # If still need more, add recent
-    if recommended.count() < 9:
-        recommended = BookReview.objects.filter(
-            is_published=True,
-            is_approved=True
-        ).exclude(slug=review.slug).order_by('-created_at')
-    
-    recommended = recommended[:9]
+    # Get recommended reviews (9 total) from the precomputed text-similarity
+    # table, topped up with the newest reviews when it has fewer entries
+    published = BookReview.objects.filter(is_published=True, is_approved=True).select_related('reviewer')
+    recommended = list(
+        published.filter(recommended_in__review=review).order_by('-recommended_in__score')[:SIMILAR_LIMIT]
+    )
+    if len(recommended) < SIMILAR_LIMIT:
+        recommended += list(
+            published.exclude(pk__in=[review.pk] + [item.pk for item in recommended])
+            .order_by('-created_at')[:SIMILAR_LIMIT - len(recommended)]
+        )
     
     context = {
         'review': review,
@@ -153,10 +151,7 @@ def book_create(request):
         if request.FILES.get('alternate_cover'):
             review.alternate_cover = request.FILES['alternate_cover']
         
-        tags = request.POST.get('tags', '').split(',')
-        for tag in tags:
-            if tag.strip():
-                review.tags.add(tag.strip())
+        sync_tags(review, request.POST.get('tags', ''))
         
         review.save()
         return redirect('users:dashboard')
@@ -198,11 +193,7 @@ def book_edit(request, slug):
         if request.FILES.get('alternate_cover'):
             review.alternate_cover = request.FILES['alternate_cover']
         
-        review.tags.clear()
-        tags = request.POST.get('tags', '').split(',')
-        for tag in tags:
-            if tag.strip():
-                review.tags.add(tag.strip())
+        sync_tags(review, request.POST.get('tags', ''))
         
         review.save()
         return redirect('users:dashboard')
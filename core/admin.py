@@ -1,3 +1,17 @@
 from django.contrib import admin
+from .models import Job, TagUsage
 
-# Register your models here.
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['task', 'status', 'attempts', 'run_at', 'locked_by', 'created_at']
+    list_filter = ['status', 'task']
+    search_fields = ['task', 'last_error']
+    readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(TagUsage)
+class TagUsageAdmin(admin.ModelAdmin):
+    list_display = ['tag', 'content_type', 'count', 'last_used_at']
+    list_filter = ['content_type']
+    search_fields = ['tag__name']
+    readonly_fields = ['last_used_at']
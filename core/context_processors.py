@@ -1,4 +1,5 @@
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
 
 def pwa_settings(request):
     """Expose PWA and push notification settings to templates."""
@@ -14,3 +15,11 @@ def monetization_settings(request):
         'ENABLE_DONATIONS': getattr(settings, 'ENABLE_DONATIONS', False),
         'STRIPE_PUBLIC_KEY': getattr(settings, 'STRIPE_PUBLIC_KEY', ''),
     }
+
+def message_counts(request):
+    """Unread private messages for the navbar, queried only if a template uses it."""
+    user = getattr(request, 'user', None)
+    if not user or not user.is_authenticated:
+        return {}
+    from users.messaging import unread_message_count
+    return {'unread_messages': SimpleLazyObject(lambda: unread_message_count(user))}
@@ -0,0 +1,147 @@
+"""
+Buffered view counters
+Detail pages call record_view(), which only bumps a counter in the worker
+process's memory. At most once every VIEW_FLUSH_INTERVAL seconds (and at
+exit) a process hands its accumulated counts to the job queue, and the
+flush_view_counts task applies them with one UPDATE per model and count, so
+a page view never writes to the database itself. Counts still buffered
+when a process is killed outright (SIGKILL, out-of-memory) are lost; a
+normal shutdown flushes them.
+
+Besides the lifetime view_count, each counted model keeps two exponentially
+decayed scores behind the "Most viewed" and "Trending" sorts: popular_score
+halves every VIEW_POPULAR_HALF_LIFE hours and trending_score every
+VIEW_TRENDING_HALF_LIFE hours. The worker runs the decay_view_scores task
+every VIEW_DECAY_INTERVAL seconds (see jobs.schedule_periodic), decaying by
+the time actually elapsed since the previous run.
+"""
+import atexit
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from .jobs import enqueue
+
+logger = logging.getLogger(__name__)
+
+COUNTED_MODELS = ['archives.archive', 'insights.insightpost', 'books.bookreview']
+BOT_RE = re.compile(r'bot|crawl|spider|slurp|preview|facebookexternalhit|headless', re.IGNORECASE)
+MIN_SCORE = 0.01
+LAST_DECAY_KEY = 'counters:last-decay'
+DECAY_LOCK_KEY = 'counters:decay-lock'
+
+# `sort` values for list views, ordered by the partial indexes on each model
+VIEW_SORTS = {
+    'popular': ('-popular_score', '-id'),
+    'trending': ('-trending_score', '-id'),
+}
+
+_lock = threading.Lock()
+_pending = Counter()
+_last_flush = time.monotonic()
+
+
+def flush_interval():
+    return getattr(settings, 'VIEW_FLUSH_INTERVAL', 60)
+
+
+def record_view(request, obj):
+    """Count a view of `obj`; bots and HEAD requests are ignored"""
+    global _last_flush
+    if request.method != 'GET' or BOT_RE.search(request.headers.get('User-Agent', '')):
+        return
+    now = time.monotonic()
+    with _lock:
+        _pending[(obj._meta.label_lower, obj.pk)] += 1
+        if now - _last_flush < flush_interval():
+            return
+        _last_flush = now
+    flush()
+
+
+def flush():
+    """Queue the counts buffered in this process; returns the number of views queued"""
+    global _pending
+    with _lock:
+        pending, _pending = _pending, Counter()
+    if not pending:
+        return 0
+    counts = defaultdict(dict)
+    for (label, pk), views in pending.items():
+        counts[label][str(pk)] = views
+    try:
+        enqueue('core.tasks.flush_view_counts', dict(counts))
+    except Exception as e:
+        logger.error(f"Could not queue {sum(pending.values())} view count(s): {str(e)}")
+        with _lock:
+            _pending.update(pending)
+        return 0
+    return sum(pending.values())
+
+
+atexit.register(flush)
+
+
+def apply_view_counts(counts):
+    """
+    Add buffered views ({model label: {pk: views}}) to the counters, grouping
+    rows with the same number of views into a single UPDATE. All of it
+    commits together, so a retried job never counts a view twice.
+    """
+    with transaction.atomic():
+        for label, views_by_pk in counts.items():
+            model = apps.get_model(label)
+            groups = defaultdict(list)
+            for pk, views in views_by_pk.items():
+                groups[int(views)].append(int(pk))
+            for views, pks in groups.items():
+                model.objects.filter(pk__in=pks).update(
+                    view_count=F('view_count') + views,
+                    popular_score=F('popular_score') + views,
+                    trending_score=F('trending_score') + views,
+                )
+
+
+def decay_scores(hours=1):
+    """Decay every model's popular and trending scores by `hours` of elapsed time"""
+    factors = {
+        'popular_score': 0.5 ** (hours / getattr(settings, 'VIEW_POPULAR_HALF_LIFE', 24 * 7)),
+        'trending_score': 0.5 ** (hours / getattr(settings, 'VIEW_TRENDING_HALF_LIFE', 24)),
+    }
+    updated = 0
+    for label in COUNTED_MODELS:
+        model = apps.get_model(label)
+        for field, factor in factors.items():
+            updated += model.objects.filter(**{f'{field}__gte': MIN_SCORE}).update(**{field: F(field) * factor})
+            # Let long-forgotten rows drop out of the decay updates altogether
+            model.objects.filter(**{f'{field}__gt': 0, f'{field}__lt': MIN_SCORE}).update(**{field: 0})
+    return updated
+
+
+def decay_interval():
+    return getattr(settings, 'VIEW_DECAY_INTERVAL', 60 * 60)
+
+
+def decay_elapsed():
+    """
+    Decay the scores by the time since the previous call, or by one interval
+    when that is unknown; returns the number of scores decayed. Overlapping
+    calls are skipped, so a duplicate job never decays twice.
+    """
+    if not cache.add(DECAY_LOCK_KEY, 1, 10 * 60):
+        return 0
+    try:
+        now = time.time()
+        last = cache.get(LAST_DECAY_KEY)
+        seconds = now - last if last else decay_interval()
+        updated = decay_scores(max(seconds, 0) / 3600)
+        cache.set(LAST_DECAY_KEY, now, None)
+        return updated
+    finally:
+        cache.delete(DECAY_LOCK_KEY)
@@ -0,0 +1,335 @@
+"""
+Editor.js content helpers
+Reading text out of post bodies, and rendering them server-side to sanitised
+HTML. Bodies are Editor.js block data or, from the Quill editor and older
+posts, HTML strings; both end up as allowlisted markup that detail pages can
+output directly.
+"""
+import hashlib
+import json
+import re
+from html import escape, unescape
+from html.parser import HTMLParser
+
+TAG_RE = re.compile(r'<[^>]+>')
+
+
+def load_blocks(content_json):
+    """Return the list of blocks from Editor.js data (a dict or a JSON string)"""
+    data = content_json
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except ValueError:
+            return []
+    if not isinstance(data, dict):
+        return []
+    blocks = data.get('blocks')
+    return blocks if isinstance(blocks, list) else []
+
+
+def _item_text(item):
+    # List items are strings in older Editor.js versions and
+    # {"content": ..., "items": [...]} objects in nested lists.
+    if isinstance(item, dict):
+        parts = [item.get('content') or item.get('text') or '']
+        parts.extend(_item_text(child) for child in item.get('items') or [])
+        return ' '.join(parts)
+    return str(item or '')
+
+
+def plain_text(content_json):
+    """Extract readable text from Editor.js blocks (for search and similarity)"""
+    parts = []
+    for block in load_blocks(content_json):
+        data = block.get('data') or {}
+        for key in ('text', 'caption', 'title', 'message', 'code'):
+            if isinstance(data.get(key), str):
+                parts.append(data[key])
+        for item in data.get('items') or []:
+            parts.append(_item_text(item))
+        for row in data.get('content') or []:
+            if isinstance(row, list):
+                parts.extend(str(cell) for cell in row)
+    text = ' '.join(part for part in parts if part)
+    return ' '.join(unescape(TAG_RE.sub(' ', text)).split())
+
+
+# Bump when the rendered markup changes; stored HTML is regenerated on the next
+# save, or for every post by the `render_content_html` command
+RENDERER_VERSION = 2
+
+INLINE_TAGS = {'a', 'b', 'strong', 'i', 'em', 'u', 's', 'mark', 'code', 'sub', 'sup', 'br', 'span'}
+BLOCK_TAGS = INLINE_TAGS | {
+    'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li', 'blockquote', 'pre', 'hr', 'div',
+    'table', 'thead', 'tbody', 'tr', 'th', 'td', 'figure', 'figcaption', 'img', 'iframe',
+}
+VOID_TAGS = {'br', 'hr', 'img'}
+# Dropped together with everything inside them
+DROP_CONTENT_TAGS = {'script', 'style', 'template', 'noscript', 'object', 'embed', 'svg', 'math', 'textarea', 'select'}
+ALLOWED_ATTRS = {
+    'a': {'href', 'title', 'target'},
+    'img': {'src', 'alt', 'title', 'width', 'height'},
+    'iframe': {'src', 'width', 'height', 'title', 'allowfullscreen'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan'},
+    'ol': {'start'},
+}
+CLASS_RE = re.compile(r'^ql-[a-z0-9-]+$')
+# Inline styles are limited to the text colours the editor toolbar sets
+STYLE_RE = re.compile(
+    r'^\s*(color|background-color)\s*:\s*(#[0-9a-f]{3,8}|rgba?\([\d\s.,%]+\)|[a-z]+)\s*$', re.IGNORECASE
+)
+SCHEME_RE = re.compile(r'^([a-z][a-z0-9+.-]*):')
+SAFE_SCHEMES = {'http', 'https', 'mailto', 'tel'}
+DATA_IMAGE_RE = re.compile(r'^data:image/(png|jpeg|gif|webp);base64,[a-z0-9+/=\s]+$', re.IGNORECASE)
+# Video hosts whose players may be embedded
+EMBED_HOSTS = ('https://www.youtube.com/embed/', 'https://www.youtube-nocookie.com/embed/', 'https://player.vimeo.com/video/')
+
+
+def safe_url(url, allow_data_image=False):
+    """`url` if it is relative or uses a safe scheme, else ''"""
+    url = ''.join(ch for ch in str(url or '') if ch >= ' ').strip()
+    match = SCHEME_RE.match(url.lower())
+    if not match:
+        return url
+    if match.group(1) in SAFE_SCHEMES:
+        return url
+    if allow_data_image and DATA_IMAGE_RE.match(url):
+        return url
+    return ''
+
+
+def safe_embed_url(url):
+    url = safe_url(url)
+    return url if url.startswith(EMBED_HOSTS) else ''
+
+
+class _Sanitizer(HTMLParser):
+    """Rebuilds HTML keeping only allowlisted tags and attributes"""
+
+    def __init__(self, allowed_tags):
+        super().__init__(convert_charrefs=True)
+        self.allowed_tags = allowed_tags
+        self.output = []
+        self.open_tags = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            if tag not in VOID_TAGS:
+                self.skip_depth += 1
+            return
+        if self.skip_depth or tag not in self.allowed_tags:
+            return
+        clean = []
+        for name, value in attrs:
+            value = value or ''
+            if name == 'class':
+                classes = [token for token in value.split() if CLASS_RE.match(token)]
+                if classes:
+                    clean.append(('class', ' '.join(classes)))
+            elif name == 'style':
+                rules = [rule.strip() for rule in value.split(';') if STYLE_RE.match(rule)]
+                if rules:
+                    clean.append(('style', '; '.join(rules)))
+            elif name in ALLOWED_ATTRS.get(tag, ()):
+                if name in ('href', 'src'):
+                    if tag == 'iframe':
+                        value = safe_embed_url(value)
+                    else:
+                        value = safe_url(value, allow_data_image=tag == 'img')
+                    if not value:
+                        continue
+                if name == 'target' and value != '_blank':
+                    continue
+                clean.append((name, value))
+        if tag == 'iframe' and not any(name == 'src' for name, _value in clean):
+            return
+        if tag == 'img' and not any(name == 'src' for name, _value in clean):
+            return
+        if tag == 'a' and ('target', '_blank') in clean:
+            clean.append(('rel', 'noopener noreferrer'))
+        if tag in ('img', 'iframe'):
+            clean.append(('loading', 'lazy'))
+        attrs_html = ''.join(f' {name}="{escape(value, quote=True)}"' for name, value in clean)
+        self.output.append(f'<{tag}{attrs_html}>')
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.open_tags and self.open_tags[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+            return
+        if tag not in self.open_tags:
+            return
+        # An enclosing allowed tag ends any dropped element left unclosed
+        # inside it (e.g. a <select> without </select>), as browsers do
+        self.skip_depth = 0
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.output.append(f'</{open_tag}>')
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.output.append(escape(data, quote=False))
+
+    def result(self):
+        self.close()
+        return ''.join(self.output) + ''.join(f'</{tag}>' for tag in reversed(self.open_tags))
+
+
+def sanitize_html(html, inline=False):
+    """Keep only safe tags, attributes and URLs; `inline` allows just text-level markup"""
+    sanitizer = _Sanitizer(INLINE_TAGS if inline else BLOCK_TAGS)
+    sanitizer.feed(str(html or ''))
+    return sanitizer.result()
+
+
+def _inline(value):
+    return sanitize_html(value, inline=True)
+
+
+def _render_list_items(items, tag):
+    parts = []
+    for item in items or []:
+        if isinstance(item, dict):
+            text = item.get('content') or item.get('text') or ''
+            children = item.get('items') or []
+            nested = f'<{tag}>{_render_list_items(children, tag)}</{tag}>' if children else ''
+            parts.append(f'<li>{_inline(text)}{nested}</li>')
+        else:
+            parts.append(f'<li>{_inline(item)}</li>')
+    return ''.join(parts)
+
+
+def _render_checklist(items):
+    parts = []
+    for item in items or []:
+        if not isinstance(item, dict):
+            item = {'text': item}
+        checked = item.get('checked') or (item.get('meta') or {}).get('checked')
+        text = item.get('text') or item.get('content') or ''
+        parts.append(
+            f'<li class="checklist-item{" checked" if checked else ""}">'
+            f'<input type="checkbox" disabled{" checked" if checked else ""}> {_inline(text)}</li>'
+        )
+    return f'<ul class="checklist">{"".join(parts)}</ul>'
+
+
+def _render_figure(inner, caption):
+    caption_html = f'<figcaption>{_inline(caption)}</figcaption>' if caption else ''
+    return f'<figure>{inner}{caption_html}</figure>'
+
+
+def _render_block(block):
+    kind = block.get('type')
+    data = block.get('data') or {}
+    if not isinstance(data, dict):
+        return ''
+    if kind == 'paragraph':
+        return f"<p>{_inline(data.get('text'))}</p>"
+    if kind == 'header':
+        try:
+            level = min(max(int(data.get('level') or 2), 1), 6)
+        except (TypeError, ValueError):
+            level = 2
+        return f"<h{level}>{_inline(data.get('text'))}</h{level}>"
+    if kind == 'list':
+        if data.get('style') == 'checklist':
+            return _render_checklist(data.get('items'))
+        tag = 'ol' if data.get('style') == 'ordered' else 'ul'
+        return f"<{tag}>{_render_list_items(data.get('items'), tag)}</{tag}>"
+    if kind == 'checklist':
+        return _render_checklist(data.get('items'))
+    if kind == 'quote':
+        caption = f"<footer>{_inline(data.get('caption'))}</footer>" if data.get('caption') else ''
+        return f"<blockquote><p>{_inline(data.get('text'))}</p>{caption}</blockquote>"
+    if kind == 'table':
+        rows = [row for row in data.get('content') or [] if isinstance(row, list)]
+        head = ''
+        if rows and data.get('withHeadings'):
+            head = '<thead><tr>' + ''.join(f'<th>{_inline(cell)}</th>' for cell in rows[0]) + '</tr></thead>'
+            rows = rows[1:]
+        body = ''.join('<tr>' + ''.join(f'<td>{_inline(cell)}</td>' for cell in row) + '</tr>' for row in rows)
+        return f'<table class="table">{head}<tbody>{body}</tbody></table>'
+    if kind in ('image', 'simpleImage'):
+        file_data = data.get('file') if isinstance(data.get('file'), dict) else {}
+        src = safe_url(file_data.get('url') or data.get('url'))
+        if not src:
+            return ''
+        alt = escape(' '.join(unescape(TAG_RE.sub(' ', str(data.get('caption') or ''))).split()), quote=True)
+        return _render_figure(
+            f'<img src="{escape(src, quote=True)}" alt="{alt}" loading="lazy" class="img-fluid">',
+            data.get('caption'),
+        )
+    if kind == 'embed':
+        src = safe_embed_url(data.get('embed'))
+        if not src:
+            source = safe_url(data.get('source'))
+            return f'<p><a href="{escape(source, quote=True)}" rel="noopener noreferrer">{escape(source)}</a></p>' if source else ''
+        return _render_figure(
+            f'<div class="ratio ratio-16x9"><iframe src="{escape(src, quote=True)}" loading="lazy" '
+            f'allowfullscreen></iframe></div>',
+            data.get('caption'),
+        )
+    if kind == 'code':
+        return f"<pre><code>{escape(str(data.get('code') or ''), quote=False)}</code></pre>"
+    if kind == 'warning':
+        return (
+            f'<div class="alert alert-warning"><strong>{_inline(data.get("title"))}</strong> '
+            f'{_inline(data.get("message"))}</div>'
+        )
+    if kind == 'delimiter':
+        return '<hr>'
+    if kind == 'raw':
+        return sanitize_html(data.get('html'))
+    return ''
+
+
+def render_blocks(blocks):
+    """Sanitised HTML for a list of Editor.js blocks; unknown block types are skipped"""
+    return '\n'.join(html for html in (_render_block(block) for block in blocks if isinstance(block, dict)) if html)
+
+
+def render_content(content):
+    """
+    Sanitised HTML for a post body: Editor.js data (a dict or JSON string with
+    "blocks") is rendered block by block, anything else is treated as HTML.
+    """
+    if isinstance(content, dict):
+        return render_blocks(load_blocks(content))
+    if isinstance(content, str):
+        stripped = content.lstrip()
+        if stripped.startswith('{'):
+            blocks = load_blocks(stripped)
+            if blocks:
+                return render_blocks(blocks)
+        return sanitize_html(content)
+    return ''
+
+
+def content_hash(*parts):
+    """Fingerprint of the source content (and renderer version) behind stored HTML"""
+    payload = json.dumps([RENDERER_VERSION, *parts], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def refresh_content_html(instance):
+    """
+    Re-render `instance.content_html` from content_json/legacy_content if the
+    source changed since it was last rendered. Returns True if it was updated.
+    """
+    digest = content_hash(instance.content_json, instance.legacy_content)
+    if digest == instance.content_hash:
+        return False
+    instance.content_html = render_content(instance.content)
+    instance.content_hash = digest
+    return True
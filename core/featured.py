@@ -0,0 +1,39 @@
+"""
+Featured archive pool
+Picks the home page carousel without ORDER BY RANDOM(). The IDs of approved
+archives are cached and refreshed periodically (or when an archive changes),
+so each request only samples a few IDs in memory and fetches those rows by
+primary key.
+"""
+import random
+from django.conf import settings
+from django.core.cache import cache
+from archives.models import Archive
+
+FEATURED_POOL_KEY = 'featured_archive_pool'
+FEATURED_COUNT = 10
+
+
+def get_pool():
+    """Return the cached list of approved archive IDs, rebuilding it if expired"""
+    pool = cache.get(FEATURED_POOL_KEY)
+    if pool is None:
+        pool = list(Archive.objects.filter(is_approved=True).values_list('pk', flat=True))
+        cache.set(FEATURED_POOL_KEY, pool, getattr(settings, 'FEATURED_POOL_TIMEOUT', 600))
+    return pool
+
+
+def invalidate_pool():
+    """Drop the cached pool so the next request sees added or removed archives"""
+    cache.delete(FEATURED_POOL_KEY)
+
+
+def featured_archives(count=FEATURED_COUNT):
+    """Return up to `count` randomly chosen approved archives"""
+    pool = get_pool()
+    ids = random.sample(pool, min(count, len(pool)))
+    if not ids:
+        return []
+    # Re-check approval in case the pool is stale, and keep the sampled order
+    archives = Archive.objects.filter(pk__in=ids, is_approved=True).in_bulk()
+    return [archives[pk] for pk in ids if pk in archives]
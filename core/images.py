@@ -0,0 +1,197 @@
+"""
+Responsive image derivatives
+Uploads are up to 5MB, so grids, carousels and the media browser should not
+serve the originals. For every uploaded image we write resized copies at a
+few widths in WebP and JPEG next to the original under `derivatives/`, with
+names derived from the original's path so templates can build srcsets
+without a lookup table.
+"""
+import hashlib
+import logging
+import os
+from io import BytesIO
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_WIDTHS = getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', (320, 640, 1024, 1600))
+DERIVATIVE_FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+DERIVATIVE_QUALITY = 80
+DERIVATIVE_PREFIX = 'derivatives'
+WIDTHS_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Image fields that get derivatives, by model label
+IMAGE_FIELDS = {
+    'archives.Archive': ('image', 'featured_image'),
+    'insights.InsightPost': ('featured_image',),
+    'books.BookReview': ('cover_image', 'cover_image_back', 'alternate_cover'),
+}
+
+
+def derivative_name(name, width, ext):
+    """Storage name of the `width`px derivative of `name` in format `ext`"""
+    stem = os.path.splitext(name)[0]
+    return f'{DERIVATIVE_PREFIX}/{stem}-{width}w.{ext}'
+
+
+def _widths_cache_key(name):
+    return 'image-derivatives:' + hashlib.md5(name.encode()).hexdigest()
+
+
+def target_widths(original_width):
+    """Widths to generate for an image `original_width` pixels wide"""
+    widths = [width for width in DERIVATIVE_WIDTHS if width < original_width]
+    # Images narrower than the smallest width still get one re-encoded copy,
+    # kept at their own size under the smallest width's name
+    return widths or [DERIVATIVE_WIDTHS[0]]
+
+
+def generate_derivatives(fieldfile, force=False):
+    """
+    Write resized WebP and JPEG copies of an image field's file.
+    Returns the list of widths written (or already present), [] on failure.
+    """
+    if not fieldfile:
+        return []
+    storage = fieldfile.storage
+    name = fieldfile.name
+
+    if not force:
+        widths = available_widths(fieldfile)
+        if widths:
+            return widths
+
+    try:
+        with storage.open(name, 'rb') as handle:
+            image = Image.open(handle)
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except Exception as e:
+        logger.error(f"Could not open image {name} for derivatives: {str(e)}")
+        return []
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+    widths = target_widths(image.width)
+    for width in widths:
+        if width < image.width:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+        else:
+            resized = image
+        for ext, format_name in DERIVATIVE_FORMATS.items():
+            output = resized
+            if format_name == 'JPEG' and output.mode == 'RGBA':
+                # JPEG has no alpha channel; flatten onto white
+                background = Image.new('RGB', output.size, (255, 255, 255))
+                background.paste(output, mask=output.getchannel('A'))
+                output = background
+            buffer = BytesIO()
+            output.save(buffer, format_name, quality=DERIVATIVE_QUALITY, optimize=True)
+            target = derivative_name(name, width, ext)
+            if storage.exists(target):
+                storage.delete(target)
+            storage.save(target, ContentFile(buffer.getvalue()))
+
+    cache.set(_widths_cache_key(name), widths, WIDTHS_CACHE_TIMEOUT)
+    return widths
+
+
+def available_widths(fieldfile):
+    """Widths for which derivatives of `fieldfile` exist (cached)"""
+    if not fieldfile:
+        return []
+    key = _widths_cache_key(fieldfile.name)
+    widths = cache.get(key)
+    if widths is None:
+        storage = fieldfile.storage
+        widths = [
+            width for width in DERIVATIVE_WIDTHS
+            if storage.exists(derivative_name(fieldfile.name, width, 'webp'))
+        ]
+        # Re-check missing derivatives sooner; another process may be writing them
+        cache.set(key, widths, WIDTHS_CACHE_TIMEOUT if widths else 300)
+    return widths
+
+
+def delete_derivatives(fieldfile):
+    """Remove the derivatives of `fieldfile`"""
+    if not fieldfile:
+        return
+    storage = fieldfile.storage
+    for width in available_widths(fieldfile):
+        for ext in DERIVATIVE_FORMATS:
+            target = derivative_name(fieldfile.name, width, ext)
+            if storage.exists(target):
+                storage.delete(target)
+    cache.delete(_widths_cache_key(fieldfile.name))
+
+
+def srcset(fieldfile, ext='webp'):
+    """A srcset attribute value for `fieldfile`, or '' if it has no derivatives"""
+    storage = fieldfile.storage if fieldfile else None
+    return ', '.join(
+        f'{storage.url(derivative_name(fieldfile.name, width, ext))} {width}w'
+        for width in available_widths(fieldfile)
+    )
+
+
+def thumbnail_url(fieldfile, width=320):
+    """URL of the smallest derivative at least `width` wide, falling back to the original"""
+    if not fieldfile:
+        return ''
+    widths = available_widths(fieldfile)
+    if not widths:
+        return fieldfile.url
+    chosen = next((w for w in widths if w >= width), widths[-1])
+    return fieldfile.storage.url(derivative_name(fieldfile.name, chosen, 'webp'))
+
+
+def picture(fieldfile, alt='', sizes='100vw', **attrs):
+    """
+    Render a <picture> element with WebP and JPEG srcsets for `fieldfile`.
+    Falls back to a plain <img> of the original when there are no derivatives.
+    """
+    if not fieldfile:
+        return ''
+    extra = flatatt(attrs)
+    widths = available_widths(fieldfile)
+    if not widths:
+        return format_html('<img src="{}" alt="{}" loading="lazy"{}>', fieldfile.url, alt, extra)
+    fallback = next((w for w in widths if w >= 1024), widths[-1])
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" loading="lazy"{}></picture>',
+        srcset(fieldfile, 'webp'), sizes,
+        fieldfile.storage.url(derivative_name(fieldfile.name, fallback, 'jpg')),
+        srcset(fieldfile, 'jpg'), sizes, alt, extra,
+    )
+
+
+def needs_derivatives(instance):
+    """True if any registered image field of `instance` has no derivatives yet"""
+    return any(
+        not available_widths(getattr(instance, field_name, None))
+        for field_name in IMAGE_FIELDS.get(instance._meta.label, ())
+        if getattr(instance, field_name, None)
+    )
+
+
+def generate_for_instance(instance, force=False):
+    """Generate derivatives for every registered image field of a model instance"""
+    for field_name in IMAGE_FIELDS.get(instance._meta.label, ()):
+        fieldfile = getattr(instance, field_name, None)
+        if fieldfile:
+            generate_derivatives(fieldfile, force=force)
+
+
+def delete_for_instance(instance):
+    """Remove derivatives for every registered image field of a model instance"""
+    for field_name in IMAGE_FIELDS.get(instance._meta.label, ()):
+        delete_derivatives(getattr(instance, field_name, None))
@@ -0,0 +1,239 @@
+"""
+Database-backed job queue
+Slow side effects (email, notification fan-out, IndexNow pings, image
+derivatives) are stored as Job rows and run by `manage.py runworker`, so
+requests return without waiting on SMTP or HTTP calls and no external broker
+is needed.
+
+Workers claim jobs with a conditional UPDATE, so several workers (or threads)
+never run the same job at once. A claimed job is hidden from other workers
+until its visibility timeout passes; the worker extends that lease while the
+job runs, so only a job whose worker died becomes claimable again. Failed
+jobs are retried with exponential backoff, and a job is marked failed once
+it has used up max_attempts, whether it raised or its worker was lost.
+
+Tasks listed in JOB_PERIODIC_TASKS are queued again by idle workers whenever
+none is pending, so they repeat without cron.
+
+Delivery is at least once: a worker killed after a task's side effects but
+before the job row is deleted leaves the job to be run again, so tasks must
+be safe to repeat.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+VISIBILITY_TIMEOUT = getattr(settings, 'JOB_VISIBILITY_TIMEOUT', 300)
+RETRY_BASE_DELAY = getattr(settings, 'JOB_RETRY_BASE_DELAY', 30)
+RETRY_MAX_DELAY = getattr(settings, 'JOB_RETRY_MAX_DELAY', 60 * 60)
+# Dotted task path -> seconds between runs
+PERIODIC_TASKS = getattr(settings, 'JOB_PERIODIC_TASKS', {
+    'core.tasks.decay_view_scores': getattr(settings, 'VIEW_DECAY_INTERVAL', 60 * 60),
+})
+
+
+def _task_path(task):
+    if isinstance(task, str):
+        return task
+    return f'{task.__module__}.{task.__qualname__}'
+
+
+def enqueue(task, *args, delay=0, max_attempts=5, unique=False, **kwargs):
+    """
+    Queue `task` (a function or its dotted path) to run with JSON-serialisable
+    `args` and `kwargs`. With JOB_QUEUE_EAGER set the task runs immediately
+    instead, which is convenient in development without a worker.
+
+    With `unique`, nothing is queued (and the waiting job is returned) when
+    the same call is already queued and not yet started, so repeated saves
+    cost one run. Running jobs do not count, as they may have read stale rows.
+    """
+    path = _task_path(task)
+    if getattr(settings, 'JOB_QUEUE_EAGER', False):
+        try:
+            import_string(path)(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Eager job {path} failed: {str(e)}")
+        return None
+    if unique:
+        waiting = Job.objects.filter(task=path, status='queued', args=list(args), kwargs=kwargs).first()
+        if waiting is not None:
+            return waiting
+    return Job.objects.create(
+        task=path,
+        args=list(args),
+        kwargs=kwargs,
+        max_attempts=max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def model_ref(obj):
+    """A JSON-serialisable reference to a model instance, for job arguments"""
+    if obj is None:
+        return None
+    return [obj._meta.label, obj.pk]
+
+
+def resolve_ref(ref):
+    """The instance for a model_ref, or None if it no longer exists"""
+    if not ref:
+        return None
+    from django.apps import apps
+    label, pk = ref
+    return apps.get_model(label)._default_manager.filter(pk=pk).first()
+
+
+def _abandoned(now):
+    return Q(status='running', locked_until__lt=now)
+
+
+def _claimable(now):
+    return Q(status='queued', run_at__lte=now) | (_abandoned(now) & Q(attempts__lt=F('max_attempts')))
+
+
+def fail_abandoned(now=None):
+    """Mark failed the jobs whose worker was lost on their last attempt; returns how many"""
+    now = now or timezone.now()
+    return Job.objects.filter(_abandoned(now), attempts__gte=F('max_attempts')).update(
+        status='failed',
+        locked_until=None,
+        last_error='Worker lost while running the final attempt (crashed or killed)',
+    )
+
+
+def claim(worker_id, visibility_timeout=VISIBILITY_TIMEOUT):
+    """Claim the next due job for `worker_id`, or return None if there is none"""
+    fail_abandoned()
+    while True:
+        now = timezone.now()
+        candidate = Job.objects.filter(_claimable(now)).order_by('run_at').values_list('pk', flat=True).first()
+        if candidate is None:
+            return None
+        # Only one worker's UPDATE can match while the job is still claimable
+        claimed = Job.objects.filter(_claimable(now), pk=candidate).update(
+            status='running',
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=visibility_timeout),
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=candidate)
+
+
+def schedule_periodic(tasks=None):
+    """Queue each periodic task that has no queued or running job; returns how many were queued"""
+    if getattr(settings, 'JOB_QUEUE_EAGER', False):
+        return 0
+    tasks = PERIODIC_TASKS if tasks is None else tasks
+    pending = set(
+        Job.objects.filter(task__in=list(tasks), status__in=['queued', 'running'])
+        .values_list('task', flat=True)
+    )
+    scheduled = 0
+    for task, interval in tasks.items():
+        if task not in pending:
+            enqueue(task, delay=interval)
+            scheduled += 1
+    return scheduled
+
+
+def retry_delay(attempts):
+    """Backoff before retry number `attempts`, with jitter"""
+    delay = min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _heartbeat(owned, visibility_timeout, done):
+    """Extend a running job's lease every third of `visibility_timeout` until `done` is set"""
+    try:
+        while not done.wait(visibility_timeout / 3):
+            try:
+                owned.update(locked_until=timezone.now() + timedelta(seconds=visibility_timeout))
+            except Exception as e:
+                # A missed beat is harmless as long as a later one lands in time
+                logger.warning(f"Could not extend lease: {str(e)}")
+    finally:
+        connection.close()
+
+
+def run_job(job, visibility_timeout=VISIBILITY_TIMEOUT):
+    """Run a claimed job, then delete it, reschedule it or mark it failed"""
+    owned = Job.objects.filter(pk=job.pk, locked_by=job.locked_by, status='running')
+    done = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(owned, visibility_timeout, done), daemon=True)
+    heartbeat.start()
+    try:
+        import_string(job.task)(*job.args, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            logger.error(f"Job {job.pk} ({job.task}) failed permanently: {error}")
+            owned.update(status='failed', locked_until=None, last_error=error)
+        else:
+            delay = retry_delay(job.attempts)
+            logger.warning(f"Job {job.pk} ({job.task}) failed, retrying in {delay:.0f}s")
+            owned.update(
+                status='queued',
+                locked_until=None,
+                run_at=timezone.now() + timedelta(seconds=delay),
+                last_error=error,
+            )
+        return False
+    finally:
+        done.set()
+        heartbeat.join()
+    owned.delete()
+    return True
+
+
+def _refresh_connection():
+    # Drop stale or broken connections between jobs, as Django does between requests
+    if not connection.in_atomic_block:
+        close_old_connections()
+
+
+def default_worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def work(stop_event=None, burst=False, poll_interval=2, visibility_timeout=VISIBILITY_TIMEOUT):
+    """
+    Claim and run jobs until `stop_event` is set. With `burst`, return as soon
+    as the queue is empty. Returns the number of jobs processed.
+    """
+    stop_event = stop_event or threading.Event()
+    worker_id = default_worker_id()
+    processed = 0
+    while not stop_event.is_set():
+        try:
+            _refresh_connection()
+            job = claim(worker_id, visibility_timeout)
+            if job is None:
+                schedule_periodic()
+                if burst:
+                    break
+                stop_event.wait(poll_interval)
+                continue
+            run_job(job, visibility_timeout)
+            processed += 1
+        except Exception as e:
+            # e.g. "database is locked" while claiming or recording a result;
+            # the job becomes claimable again once its visibility timeout passes
+            logger.error(f"Worker {worker_id} error: {str(e)}")
+            _refresh_connection()
+            stop_event.wait(poll_interval)
+    _refresh_connection()
+    return processed
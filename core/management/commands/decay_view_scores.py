@@ -0,0 +1,20 @@
+"""
+Management command to decay the popular/trending view scores now (the
+worker also does this every VIEW_DECAY_INTERVAL seconds)
+"""
+from django.core.management.base import BaseCommand
+from core.counters import decay_elapsed, decay_scores
+
+
+class Command(BaseCommand):
+    help = 'Decay popular and trending view scores by the time since the previous decay'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, help='Decay by this many hours instead of the time elapsed')
+
+    def handle(self, *args, **options):
+        if options['hours'] is None:
+            updated = decay_elapsed()
+        else:
+            updated = decay_scores(options['hours'])
+        self.stdout.write(self.style.SUCCESS(f'Decayed {updated} score(s)'))
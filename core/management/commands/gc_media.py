@@ -0,0 +1,48 @@
+"""
+Management command to delete media files no longer referenced by any row
+"""
+import os
+from collections import Counter
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from archives.uploads import purge_expired_uploads
+from core.media_gc import find_orphans, remove_empty_dirs
+
+
+class Command(BaseCommand):
+    help = 'Delete (or with --dry-run, report) unreferenced files under MEDIA_ROOT'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=float, default=24,
+            help='Leave files modified more recently than this alone (default: 24)',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Report reclaimable files; delete nothing')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        files, sizes = Counter(), Counter()
+        for name, size in find_orphans(options['grace_hours']):
+            area = name.split('/')[0]
+            files[area] += 1
+            sizes[area] += size
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{name} ({size / 1024:.0f} KB)')
+            if not dry_run:
+                try:
+                    os.remove(os.path.join(settings.MEDIA_ROOT, name))
+                except FileNotFoundError:
+                    pass
+
+        for area in sorted(files):
+            self.stdout.write(f'  {area}/: {files[area]} file(s), {sizes[area] / 1024 / 1024:.1f} MB')
+        total = f'{sum(files.values())} file(s), {sum(sizes.values()) / 1024 / 1024:.1f} MB'
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f'Dry run: {total} reclaimable'))
+            return
+
+        removed_dirs = remove_empty_dirs()
+        expired = purge_expired_uploads()
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {total}; removed {removed_dirs} empty folder(s) and {expired} expired upload(s)'
+        ))
@@ -0,0 +1,28 @@
+"""
+Management command to backfill resized image derivatives
+"""
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from core.images import IMAGE_FIELDS, generate_derivatives
+
+
+class Command(BaseCommand):
+    help = 'Generate responsive WebP/JPEG derivatives for archive, insight and book review images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate derivatives even if they already exist',
+        )
+
+    def handle(self, *args, **options):
+        for label, field_names in IMAGE_FIELDS.items():
+            model = apps.get_model(label)
+            generated = 0
+            for instance in model.objects.only(*field_names).iterator(chunk_size=200):
+                for field_name in field_names:
+                    fieldfile = getattr(instance, field_name)
+                    if fieldfile and generate_derivatives(fieldfile, force=options['force']):
+                        generated += 1
+            self.stdout.write(self.style.SUCCESS(f'Processed {generated} image(s) for {label}'))
@@ -0,0 +1,25 @@
+"""
+Management command to backfill deep-zoom tile pyramids for archive photos
+"""
+from django.core.management.base import BaseCommand
+from archives.models import Archive
+from core.tiles import build_pyramid
+
+
+class Command(BaseCommand):
+    help = 'Build IIIF deep-zoom tile pyramids for image archives'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild pyramids even if they already exist',
+        )
+
+    def handle(self, *args, **options):
+        built = 0
+        archives = Archive.objects.filter(archive_type='image').exclude(image='').only('image')
+        for archive in archives.iterator(chunk_size=200):
+            if archive.image and build_pyramid(archive.image, force=options['force']):
+                built += 1
+        self.stdout.write(self.style.SUCCESS(f'Processed tile pyramids for {built} image(s)'))
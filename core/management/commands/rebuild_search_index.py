@@ -0,0 +1,17 @@
+"""
+Management command to rebuild the full-text search indexes
+"""
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search indexes for archives, insights and book reviews'
+
+    def handle(self, *args, **options):
+        from archives.search import archive_index
+        from insights.search import insight_index
+        from books.search import review_index
+
+        for label, index in [('archive', archive_index), ('insight', insight_index), ('book review', review_index)]:
+            count = index.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Indexed {count} {label}(s)'))
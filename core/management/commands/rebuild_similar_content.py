@@ -0,0 +1,15 @@
+"""
+Management command to recompute the text-similarity recommendations
+"""
+from django.core.management.base import BaseCommand
+from books.related import review_similarity
+from insights.related import insight_similarity
+
+
+class Command(BaseCommand):
+    help = 'Recompute TF-IDF recommendations for every published insight and book review'
+
+    def handle(self, *args, **options):
+        for label, index in (('insight', insight_similarity), ('book review', review_similarity)):
+            count = index.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Refreshed recommendations for {count} {label}(s)'))
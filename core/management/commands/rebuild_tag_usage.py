@@ -0,0 +1,13 @@
+"""
+Management command to recount tag usage from the taggit through table
+"""
+from django.core.management.base import BaseCommand
+from core.tags import rebuild_tag_usage
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-content-type tag usage counts'
+
+    def handle(self, *args, **options):
+        count = rebuild_tag_usage()
+        self.stdout.write(self.style.SUCCESS(f'Recorded usage for {count} tag(s)'))
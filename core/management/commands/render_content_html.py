@@ -0,0 +1,41 @@
+"""
+Management command to render stored post HTML
+"""
+from django.core.management.base import BaseCommand
+from core.editorjs import refresh_content_html
+
+
+class Command(BaseCommand):
+    help = (
+        'Render content_html for insights and book reviews whose body, or the renderer '
+        '(RENDERER_VERSION), changed since they were last rendered'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Rows to read and update at a time (default: 200)',
+        )
+
+    def handle(self, *args, **options):
+        from books.models import BookReview
+        from insights.models import InsightPost
+
+        batch_size = max(1, options['batch_size'])
+        for label, model in (('insight', InsightPost), ('book review', BookReview)):
+            rows = model.objects.only('content_json', 'legacy_content', 'content_hash').order_by('pk')
+            stale = []
+            rendered = 0
+            for row in rows.iterator(chunk_size=batch_size):
+                if refresh_content_html(row):
+                    stale.append(row)
+                if len(stale) >= batch_size:
+                    model.objects.bulk_update(stale, ['content_html', 'content_hash'])
+                    rendered += len(stale)
+                    stale = []
+            if stale:
+                model.objects.bulk_update(stale, ['content_html', 'content_hash'])
+                rendered += len(stale)
+            self.stdout.write(self.style.SUCCESS(f'Rendered {rendered} {label}(s)'))
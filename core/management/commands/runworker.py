@@ -0,0 +1,71 @@
+"""
+Management command to run background jobs from the database queue
+"""
+import signal
+import threading
+from django.core.management.base import BaseCommand
+from core.jobs import VISIBILITY_TIMEOUT, work
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (emails, notifications, IndexNow pings, image derivatives)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=2,
+            help='Number of jobs to run at the same time (default: 2)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2,
+            help='Seconds to wait when the queue is empty (default: 2)',
+        )
+        parser.add_argument(
+            '--visibility-timeout',
+            type=int,
+            default=VISIBILITY_TIMEOUT,
+            help='Lease on a claimed job; renewed while it runs, so a job is retried this long after its worker dies',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once the queue is empty instead of waiting for new jobs',
+        )
+
+    def handle(self, *args, **options):
+        stop_event = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write('Stopping after current jobs...')
+            stop_event.set()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        results = []
+
+        def run():
+            results.append(work(
+                stop_event=stop_event,
+                burst=options['burst'],
+                poll_interval=options['poll_interval'],
+                visibility_timeout=options['visibility_timeout'],
+            ))
+
+        concurrency = max(1, options['concurrency'])
+        self.stdout.write(f'Worker started with {concurrency} thread(s)')
+        if concurrency == 1:
+            run()
+        else:
+            threads = [threading.Thread(target=run, daemon=True) for _ in range(concurrency)]
+            for thread in threads:
+                thread.start()
+            # Join with a timeout so signals are still handled in the main thread
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {sum(results)} job(s)'))
@@ -0,0 +1,243 @@
+"""
+Media file serving
+Serves user uploads with byte-range support so audio and video can be
+seeked without re-downloading the whole file, plus ETag/Last-Modified
+validation and long-lived cache headers. When the front-end server can send
+files itself (nginx X-Accel-Redirect or Apache/lighttpd X-Sendfile), the
+view only checks the path and hands the transfer off.
+
+Files of rows that are not public yet (pending or rejected archives, draft
+posts), with their derivatives and tiles, are only served to the row's owner
+and to staff. Under directories that only those models write to, files no
+row references (replaced or abandoned uploads) are not served at all.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_http_methods
+from .media_gc import DERIVATIVE_RE, TILE_RE
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_BLOCK_SIZE = 64 * 1024
+ACCESS_CACHE_TIMEOUT = 5 * 60
+
+# Model label -> (file fields, filter for public rows, owner field,
+# directories whose files all belong to this model)
+PROTECTED_MEDIA = {
+    'archives.Archive': (
+        ('image', 'video', 'document', 'audio', 'featured_image'),
+        {'is_approved': True}, 'uploaded_by_id', ('archives/',),
+    ),
+    'insights.InsightPost': (
+        ('featured_image',),
+        {'is_published': True, 'is_approved': True}, 'author_id', (),
+    ),
+    'books.BookReview': (
+        ('cover_image', 'cover_image_back', 'alternate_cover'),
+        {'is_published': True, 'is_approved': True}, 'reviewer_id', ('book_covers/',),
+    ),
+}
+
+
+def source_stem(name):
+    """The upload a media name belongs to, without its extension"""
+    match = DERIVATIVE_RE.match(name) or TILE_RE.match(name)
+    return match.group(1) if match else os.path.splitext(name)[0]
+
+
+def _access_cache_key(stem):
+    return 'media-access:' + hashlib.md5(stem.encode()).hexdigest()
+
+
+def _lookup_access(stem):
+    owners = set()
+    referenced = False
+    for label, (fields, public, owner_field, _dirs) in PROTECTED_MEDIA.items():
+        condition = Q()
+        for field in fields:
+            condition |= Q(**{f'{field}__startswith': f'{stem}.'})
+        rows = apps.get_model(label)._default_manager.filter(condition)
+        for row in rows.values(owner_field, *fields, *public):
+            if not any(row[field] and os.path.splitext(row[field])[0] == stem for field in fields):
+                continue
+            if all(row[key] == value for key, value in public.items()):
+                return None
+            referenced = True
+            owners.add(row[owner_field])
+    if not referenced and any(
+        stem.startswith(directory)
+        for _fields, _public, _owner, dirs in PROTECTED_MEDIA.values() for directory in dirs
+    ):
+        return []
+    return sorted(owners) if referenced else None
+
+
+def media_access(name):
+    """
+    Who may fetch the media file `name`: None if anyone may, otherwise the ids
+    of the users (staff aside) who may. Cached briefly; saving or deleting a
+    protected row drops the entries for its files.
+    """
+    stem = source_stem(name)
+    key = _access_cache_key(stem)
+    access = cache.get(key, 'missing')
+    if access == 'missing':
+        access = _lookup_access(stem)
+        cache.set(key, access, ACCESS_CACHE_TIMEOUT)
+    return access
+
+
+def invalidate_access(instance):
+    """Forget the cached access of a protected row's files"""
+    fields = PROTECTED_MEDIA[instance._meta.label][0]
+    names = [getattr(instance, field).name for field in fields if getattr(instance, field)]
+    cache.delete_many([_access_cache_key(os.path.splitext(name)[0]) for name in names])
+
+
+def _etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+    modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return modified_since is not None and int(mtime) <= modified_since
+
+
+def parse_range(header, size):
+    """
+    Return (start, end) for a single-range `bytes=` header, None if the header
+    should be ignored (absent, malformed or multi-range), or False if the range
+    cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _read_range(path, start, end):
+    with open(path, 'rb') as handle:
+        handle.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            block = handle.read(min(STREAM_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+@require_http_methods(["GET", "HEAD"])
+def serve_media(request, path):
+    """Serve a file from MEDIA_ROOT to the users allowed to see it"""
+    access = media_access(path.lstrip('/'))
+    if access is not None:
+        user = request.user
+        if not (user.is_authenticated and (user.is_staff or user.pk in access)):
+            raise Http404('File not found')
+    return send_media_file(request, path, public=access is None)
+
+
+def send_media_file(request, path, public=True):
+    """
+    Send a file from MEDIA_ROOT, honouring Range and conditional requests.
+    Callers must have checked that the requester may see it; `public` files
+    may be kept by shared caches.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except Exception:
+        raise Http404('Invalid path')
+    if not os.path.isfile(full_path):
+        raise Http404('File not found')
+
+    stat = os.stat(full_path)
+    etag = _etag(stat)
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': (
+            f"public, max-age={getattr(settings, 'MEDIA_CACHE_MAX_AGE', 60 * 60 * 24 * 30)}"
+            if public else 'private, no-cache'
+        ),
+    }
+
+    if _not_modified(request, etag, stat.st_mtime):
+        response = HttpResponseNotModified()
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    # Let nginx/Apache stream the file (they handle Range themselves)
+    accel_prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '')
+    sendfile_header = getattr(settings, 'MEDIA_SENDFILE_HEADER', '')
+    if accel_prefix or sendfile_header:
+        response = HttpResponse(content_type=content_type)
+        if accel_prefix:
+            response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + path.lstrip('/')
+        else:
+            response[sendfile_header] = full_path
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    size = stat.st_size
+    byte_range = parse_range(request.headers.get('Range'), size)
+    if_range = request.headers.get('If-Range')
+    if byte_range is not None and if_range and if_range.strip() not in (etag, headers['Last-Modified']):
+        # The client's copy is stale; send the whole file instead of a range
+        byte_range = None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    status = 200 if byte_range is None else 206
+    if request.method == 'HEAD':
+        # Headers only; the lengths below describe what GET would send
+        response = HttpResponse(status=status, content_type=content_type)
+    elif byte_range is None:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    else:
+        response = StreamingHttpResponse(
+            _read_range(full_path, *byte_range),
+            status=206,
+            content_type=content_type,
+        )
+    if byte_range is None:
+        response['Content-Length'] = size
+    else:
+        start, end = byte_range
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    for name, value in headers.items():
+        response[name] = value
+    return response
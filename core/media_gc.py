@@ -0,0 +1,148 @@
+"""
+Orphaned media collection
+Replacing a file on an edit form, deleting drafts or abandoning an import
+leaves files in MEDIA_ROOT that no row points to any more. find_orphans()
+walks the upload directories one entry at a time and yields every file that
+is neither named by a FileField/ImageField nor linked from a post body or an
+edit suggestion, and is older than a grace period (so uploads whose row is not yet committed are
+left alone). Image derivatives and tile pyramids count as referenced while
+their original is.
+
+Only the referenced names are held in memory, read in chunks; the directory
+tree itself is never listed in full.
+"""
+import os
+import re
+import time
+from urllib.parse import unquote
+from django.apps import apps
+from django.conf import settings
+from django.db.models import FileField
+from .images import DERIVATIVE_PREFIX
+from .tiles import TILES_PREFIX
+
+CHUNK_SIZE = 2000
+DERIVATIVE_RE = re.compile(rf'^{DERIVATIVE_PREFIX}/(.+)-\d+w\.[a-z]+$')
+TILE_RE = re.compile(rf'^{TILES_PREFIX}/(.+)/(?:info\.json|\d+/\d+_\d+\.jpg)$')
+
+
+def file_fields():
+    """(model, [field names]) for every concrete model with file fields"""
+    for model in apps.get_models():
+        names = [
+            field.name for field in model._meta.concrete_fields
+            if isinstance(field, FileField)
+        ]
+        if names:
+            yield model, names
+
+
+def upload_dirs():
+    """Top-level media directories the site writes to"""
+    dirs = {DERIVATIVE_PREFIX, TILES_PREFIX}
+    for model, names in file_fields():
+        for name in names:
+            upload_to = model._meta.get_field(name).upload_to
+            if isinstance(upload_to, str) and upload_to.strip('/'):
+                dirs.add(upload_to.strip('/').split('/')[0])
+    return sorted(dirs)
+
+
+def embedded_names(text):
+    """
+    Media names linked from a post body: rendered HTML, Editor.js JSON (whose
+    URLs may be written with escaped slashes) or legacy HTML. Percent-encoded
+    links are also returned decoded. Matching is deliberately loose, since a
+    false match only keeps a file.
+    """
+    text = (text or '').replace('\\/', '/')
+    prefix = re.escape(settings.MEDIA_URL)
+    names = re.findall(rf'(?:https?://[^/"\'\s]+)?{prefix}([^"\'\s?#<>\\]+)', text)
+    return names + [unquote(name) for name in names if '%' in name]
+
+
+# Text columns that can link to uploaded media. The source columns are read
+# rather than content_html, which is empty until render_content_html has run.
+EMBEDDING_FIELDS = {
+    'insights.InsightPost': ('content_json', 'legacy_content'),
+    'books.BookReview': ('content_json', 'legacy_content'),
+    'insights.EditSuggestion': ('suggestion_text',),
+}
+
+
+def referenced_names(chunk_size=CHUNK_SIZE):
+    """Every media name stored in a file field or linked from a post body or suggestion"""
+    names = set()
+    for model, fields in file_fields():
+        for row in model._default_manager.values_list(*fields).iterator(chunk_size=chunk_size):
+            names.update(name for name in row if name)
+    for label, fields in EMBEDDING_FIELDS.items():
+        rows = apps.get_model(label)._default_manager.values_list(*fields)
+        for row in rows.iterator(chunk_size=chunk_size):
+            for text in row:
+                names.update(embedded_names(text))
+    return names
+
+
+def walk_files(path):
+    """Yield os.DirEntry objects for every file under `path`, depth first"""
+    try:
+        entries = os.scandir(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from walk_files(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
+
+def is_referenced(name, names, stems):
+    if name in names:
+        return True
+    match = DERIVATIVE_RE.match(name) or TILE_RE.match(name)
+    return bool(match) and match.group(1) in stems
+
+
+def find_orphans(grace_hours=24, root=None):
+    """Yield (name, size) for unreferenced files older than `grace_hours`"""
+    root = str(root or settings.MEDIA_ROOT)
+    names = referenced_names()
+    stems = {os.path.splitext(name)[0] for name in names}
+    cutoff = time.time() - grace_hours * 3600
+    for directory in upload_dirs():
+        for entry in walk_files(os.path.join(root, directory)):
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime > cutoff:
+                continue
+            name = os.path.relpath(entry.path, root).replace(os.sep, '/')
+            if not is_referenced(name, names, stems):
+                yield name, stat.st_size
+
+
+def remove_empty_dirs(root=None):
+    """Delete directories left empty under the upload directories; returns how many"""
+    root = str(root or settings.MEDIA_ROOT)
+    removed = 0
+    for directory in upload_dirs():
+        top = os.path.join(root, directory)
+        for path, _dirs, _files in os.walk(top, topdown=False):
+            if path != top and not os.listdir(path):
+                os.rmdir(path)
+                removed += 1
+    return removed
+
+
+def still_referenced(names):
+    """The subset of `names` that some file field still points to"""
+    names = set(names)
+    found = set()
+    for model, fields in file_fields():
+        for field in fields:
+            if names - found:
+                found.update(
+                    model._default_manager.filter(**{f'{field}__in': names - found})
+                    .values_list(field, flat=True)
+                )
+    return found
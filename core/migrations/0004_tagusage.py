@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def count_existing_tags(apps, schema_editor):
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    TagUsage = apps.get_model('core', 'TagUsage')
+    rows = TaggedItem.objects.order_by().values('content_type_id', 'tag_id').annotate(total=models.Count('id'))
+    TagUsage.objects.bulk_create(
+        [TagUsage(content_type_id=row['content_type_id'], tag_id=row['tag_id'], count=row['total']) for row in rows],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+        ('core', '0003_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage', to='taggit.tag')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['content_type', '-count'], name='tagusage_popular_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='tagusage',
+            constraint=models.UniqueConstraint(fields=('content_type', 'tag'), name='tagusage_content_type_tag_uniq'),
+        ),
+        migrations.RunPython(count_existing_tags, migrations.RunPython.noop),
+    ]
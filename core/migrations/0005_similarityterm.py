@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_tagusage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarityTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.CharField(help_text="Label of the index's link model", max_length=100)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('term', models.CharField(max_length=100)),
+                ('weight', models.FloatField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['index', 'term'], name='similarityterm_term_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='similarityterm',
+            constraint=models.UniqueConstraint(fields=('index', 'object_id', 'term'), name='similarityterm_item_term_uniq'),
+        ),
+    ]
@@ -1 +1,71 @@
 from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """A background task waiting for (or being run by) `manage.py runworker`"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    ]
+    
+    task = models.CharField(max_length=200, help_text="Dotted path to the task function")
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now, help_text="Not picked up before this time")
+    locked_until = models.DateTimeField(null=True, blank=True, help_text="Visibility timeout of a running job")
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['run_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.task} ({self.status})"
+
+
+class TagUsage(models.Model):
+    """How many objects of one content type carry a tag; kept current by core.signals"""
+    content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.CASCADE)
+    tag = models.ForeignKey('taggit.Tag', on_delete=models.CASCADE, related_name='usage')
+    count = models.PositiveIntegerField(default=0)
+    last_used_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'tag'], name='tagusage_content_type_tag_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['content_type', '-count'], name='tagusage_popular_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.tag} x{self.count} ({self.content_type})"
+
+
+class SimilarityTerm(models.Model):
+    """One term of an item's TF-IDF vector: the inverted index core.similarity scores neighbours from"""
+    index = models.CharField(max_length=100, help_text="Label of the index's link model")
+    object_id = models.PositiveBigIntegerField()
+    term = models.CharField(max_length=100)
+    weight = models.FloatField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['index', 'object_id', 'term'], name='similarityterm_item_term_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['index', 'term'], name='similarityterm_term_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.index} #{self.object_id}: {self.term}"
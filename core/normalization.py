@@ -0,0 +1,28 @@
+"""
+Igbo orthography folding for search
+Maps text to a diacritic-free, case-folded form so that "Ọnịcha", "ONICHA"
+and "Onịchà" all match "onicha".
+"""
+import unicodedata
+
+# Letters whose NFD form keeps a mark we still want to drop, plus characters
+# that do not decompose at all but are commonly typed as a plain letter.
+IGBO_LETTERS = {
+    'ị': 'i', 'ọ': 'o', 'ụ': 'u', 'ṅ': 'n',
+    'Ị': 'i', 'Ọ': 'o', 'Ụ': 'u', 'Ṅ': 'n',
+    'ŋ': 'n', 'Ŋ': 'n',
+}
+
+
+def fold(text):
+    """
+    Fold Igbo text for matching: decompose (NFD), strip tone marks and other
+    combining characters (grave, acute, macron, dot below, dot above), map the
+    dotted letters and lower-case the result.
+    """
+    if not text:
+        return ''
+    text = ''.join(IGBO_LETTERS.get(ch, ch) for ch in text)
+    decomposed = unicodedata.normalize('NFD', text)
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return unicodedata.normalize('NFC', stripped).casefold()
@@ -1,7 +1,19 @@
-from notifications.signals import notify
-from django.core.mail import send_mail
 from django.conf import settings
 from django.template.loader import render_to_string
+from .jobs import enqueue, model_ref
+
+
+def queue_notification(sender, recipient, verb, description='', action_object=None, target=None):
+    """Create an in-app notification from the background worker"""
+    enqueue(
+        'core.tasks.send_notification',
+        model_ref(sender),
+        model_ref(recipient),
+        verb,
+        description,
+        action_object=model_ref(action_object),
+        target=model_ref(target),
+    )
 
 
 def send_post_approved_notification(post, post_type='insight'):
@@ -9,7 +21,7 @@ def send_post_approved_notification(post, post_type='insight'):
     author = post.author if hasattr(post, 'author') else post.reviewer
     
     # In-app notification
-    notify.send(
+    queue_notification(
         sender=post,
         recipient=author,
         verb='approved your post',
@@ -28,7 +40,7 @@ def send_post_rejected_notification(post, reason, post_type='insight'):
     author = post.author if hasattr(post, 'author') else post.reviewer
     
     # In-app notification
-    notify.send(
+    queue_notification(
         sender=post,
         recipient=author,
         verb='rejected your post',
@@ -51,7 +63,7 @@ def send_new_comment_notification(comment, post):
         return
     
     # In-app notification
-    notify.send(
+    queue_notification(
         sender=comment.user if comment.user else comment,
         recipient=post_author,
         verb='commented on your post',
@@ -70,7 +82,7 @@ def send_comment_reply_notification(comment, parent_comment):
         return
     
     # In-app notification
-    notify.send(
+    queue_notification(
         sender=comment.user if comment.user else comment,
         recipient=parent_comment.user,
         verb='replied to your comment',
@@ -82,7 +94,7 @@ def send_comment_reply_notification(comment, parent_comment):
 def send_message_notification(message, recipient):
     """Send notification when someone sends you a message"""
     # In-app notification
-    notify.send(
+    queue_notification(
         sender=message.sender,
         recipient=recipient,
         verb='sent you a message',
@@ -106,7 +118,7 @@ def send_edit_suggestion_notification(suggestion):
         return
     
     # In-app notification
-    notify.send(
+    queue_notification(
         sender=suggester,
         recipient=post_author,
         verb='suggested an edit to your post',
@@ -123,7 +135,7 @@ def send_edit_suggestion_notification(suggestion):
 def send_edit_suggestion_approved_notification(suggestion):
     """Send notification when your edit suggestion is approved"""
     # In-app notification
-    notify.send(
+    queue_notification(
         sender=suggestion.post.author,
         recipient=suggestion.suggested_by,
         verb='approved your edit suggestion',
@@ -135,7 +147,7 @@ def send_edit_suggestion_approved_notification(suggestion):
 def send_edit_suggestion_rejected_notification(suggestion, reason=''):
     """Send notification when your edit suggestion is rejected"""
     # In-app notification
-    notify.send(
+    queue_notification(
         sender=suggestion.post.author,
         recipient=suggestion.suggested_by,
         verb='declined your edit suggestion',
@@ -145,19 +157,13 @@ def send_edit_suggestion_rejected_notification(suggestion, reason=''):
 
 
 def send_email_notification(to_email, subject, message):
-    """Helper function to send email notifications"""
+    """Helper function to queue email notifications"""
     if not settings.EMAIL_BACKEND or 'console' in settings.EMAIL_BACKEND:
         # Email not configured, skip
         return
     
-    try:
-        send_mail(
-            subject=f'Igbo Archives - {subject}',
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[to_email],
-            fail_silently=True,
-        )
-    except Exception:
-        # Fail silently to not disrupt user experience
-        pass
+    if not to_email:
+        return
+    
+    # Sent by the background worker, which retries SMTP failures
+    enqueue('core.tasks.send_email', to_email, f'Igbo Archives - {subject}', message)
@@ -0,0 +1,104 @@
+"""
+Keyset (cursor) pagination
+Pages through a queryset by (created_at, id), or another timestamp column,
+instead of OFFSET, so fetching page 50 costs the same as page 1 and no
+COUNT(*) query is needed. Cursors are opaque URL-safe tokens encoding the
+last row of the previous page.
+"""
+import base64
+import json
+from django.db.models import Q
+from django.http import QueryDict
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(value, pk):
+    payload = json.dumps([value.isoformat(), pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return (created_at, pk) for a cursor token, or None if it is invalid"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (ValueError, TypeError):
+        return None
+    if created_at is None:
+        return None
+    return created_at, pk
+
+
+class KeysetPage:
+    """
+    One page of keyset-paginated results.
+
+    Iterates like a Paginator page; `has_other_pages` is always False so the
+    numbered pagination in the grid partials stays hidden, and `next_cursor`
+    tells the template whether to render the infinite-scroll trigger.
+    """
+
+    def __init__(self, object_list, cursor, next_cursor, querydict=None):
+        self.object_list = object_list
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self._querydict = querydict
+
+    has_other_pages = False
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def next_querystring(self):
+        """The current query string with the cursor advanced to the next page"""
+        if not self.next_cursor:
+            return ''
+        query = self._querydict.copy() if self._querydict is not None else QueryDict(mutable=True)
+        query.pop('page', None)
+        query['cursor'] = self.next_cursor
+        return query.urlencode()
+
+
+def keyset_paginate(queryset, cursor=None, per_page=12, descending=True, querydict=None, field='created_at'):
+    """
+    Return a KeysetPage of `queryset` ordered by (`field`, id), where `field`
+    is a datetime column (created_at unless given).
+
+    `cursor` is the token from a previous page's `next_cursor`; an invalid or
+    missing cursor starts from the first page.
+    """
+    if descending:
+        queryset = queryset.order_by(f'-{field}', '-pk')
+    else:
+        queryset = queryset.order_by(field, 'pk')
+
+    position = decode_cursor(cursor)
+    if position:
+        value, pk = position
+        if descending:
+            queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+        else:
+            queryset = queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk}))
+
+    rows = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+
+    return KeysetPage(rows, cursor if position else None, next_cursor, querydict)
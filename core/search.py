@@ -0,0 +1,237 @@
+"""
+Full-text search indexes
+Ranked search over model text using the database's own full-text engine:
+SQLite FTS5 (ranked by bm25) or a PostgreSQL tsvector table with a GIN index
+(ranked by ts_rank). Other backends fall back to icontains matching.
+
+Both the indexed terms and the query are folded with core.normalization so
+that Igbo dotted vowels and tone marks match their plain spellings. PostgreSQL
+indexes pre-folded text. FTS5 keeps the original text in its columns, for
+bm25 and snippets, and adds a FOLDED_COLUMN holding fold() of all of them:
+unicode61's remove_diacritics handles tone marks and dotted vowels but not
+letters such as ŋ or ß, which only match through the folded copy. On
+PostgreSQL the FOLDED_COLUMN holds fold() of the snippet column, so that
+ts_headline can find the folded query terms in it.
+
+A search joins the index table once; rank and snippet are computed from
+that join rather than by a subquery per row.
+"""
+import re
+from django.db import connection
+from django.db.models import Q, Value, FloatField, CharField
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from .normalization import fold
+
+# Sentinels wrapped around matched terms by snippet()/ts_headline(). They are
+# swapped for <mark> tags only after the snippet text has been HTML-escaped.
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+SNIPPET_WORDS = 24
+
+# SQLite: fold() of every column, so matches never depend on unicode61's folding.
+# PostgreSQL: fold() of the snippet column, for ts_headline.
+FOLDED_COLUMN = 'folded'
+FOLDED_WEIGHT = 1.0
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize_query(query):
+    """Split user input into folded search terms (operators are not exposed)"""
+    return TOKEN_RE.findall(fold(query))[:16]
+
+
+def render_snippet(snippet):
+    """Escape a snippet and turn highlight sentinels into <mark> tags"""
+    if not snippet:
+        return ''
+    html = escape(snippet)
+    html = html.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+    return mark_safe(html)
+
+
+class SearchIndex:
+    """
+    A full-text index over one model.
+
+    `columns` maps an index column name to the model fields (or callables
+    taking the instance) concatenated into it, in priority order: the first
+    column ranks highest. The last column is used for snippets.
+    """
+
+    def __init__(self, model, table, columns, weights=None):
+        self.model = model
+        self.table = table
+        self.columns = columns
+        self.column_names = list(columns)
+        self.weights = weights or [10.0] + [1.0] * (len(columns) - 1)
+
+    # ------------------------------------------------------------------
+    # Schema
+    # ------------------------------------------------------------------
+
+    def create_table(self, schema_editor):
+        """Create the index table for the current backend (used by migrations)"""
+        vendor = schema_editor.connection.vendor
+        cols = ', '.join(self.column_names)
+        source = self.model._meta.db_table
+        if vendor == 'sqlite':
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                f"{cols}, {FOLDED_COLUMN}, tokenize='unicode61 remove_diacritics 2')"
+            )
+        elif vendor == 'postgresql':
+            text_cols = ', '.join(f'{name} text NOT NULL' for name in self.column_names)
+            schema_editor.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                f"id bigint PRIMARY KEY REFERENCES {source}(id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+                f"{text_cols}, {FOLDED_COLUMN} text NOT NULL, document tsvector NOT NULL)"
+            )
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_document_idx ON {self.table} USING GIN (document)"
+            )
+
+    def drop_table(self, schema_editor):
+        if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+            schema_editor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    @property
+    def enabled(self):
+        return connection.vendor in ('sqlite', 'postgresql')
+
+    # ------------------------------------------------------------------
+    # Keeping the index in sync
+    # ------------------------------------------------------------------
+
+    def document(self, instance):
+        """Return the column values to index for an instance"""
+        values = []
+        for fields in self.columns.values():
+            parts = [
+                str((field(instance) if callable(field) else getattr(instance, field, '')) or '')
+                for field in fields
+            ]
+            values.append(' '.join(part for part in parts if part))
+        return values
+
+    def update(self, instance):
+        """Insert or replace the index row for an instance"""
+        if not self.enabled:
+            return
+        values = self.document(instance)
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cols = ', '.join(self.column_names)
+                placeholders = ', '.join(['%s'] * len(values))
+                folded = ' '.join(fold(value) for value in values if value)
+                cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [instance.pk])
+                cursor.execute(
+                    f"INSERT INTO {self.table} (rowid, {cols}, {FOLDED_COLUMN}) VALUES (%s, {placeholders}, %s)",
+                    [instance.pk, *values, folded]
+                )
+            else:
+                cols = ', '.join(self.column_names)
+                placeholders = ', '.join(['%s'] * len(values))
+                updates = ', '.join(f'{name} = EXCLUDED.{name}' for name in [*self.column_names, FOLDED_COLUMN])
+                folded = [fold(value) for value in values]
+                cursor.execute(
+                    f"INSERT INTO {self.table} (id, {cols}, {FOLDED_COLUMN}, document) "
+                    f"VALUES (%s, {placeholders}, %s, {self._tsvector_sql()}) "
+                    f"ON CONFLICT (id) DO UPDATE SET {updates}, document = EXCLUDED.document",
+                    [instance.pk, *values, folded[-1], *folded]
+                )
+
+    def delete(self, pk):
+        """Remove the index row for a deleted instance"""
+        if not self.enabled:
+            return
+        key = 'rowid' if connection.vendor == 'sqlite' else 'id'
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE {key} = %s", [pk])
+
+    def rebuild(self, queryset=None, batch_size=500):
+        """Reindex every row of the model (or of the given queryset)"""
+        if not self.enabled:
+            return 0
+        if queryset is None:
+            queryset = self.model._default_manager.all()
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {self.table}")
+        count = 0
+        for instance in queryset.order_by('pk').iterator(chunk_size=batch_size):
+            self.update(instance)
+            count += 1
+        return count
+
+    def _tsvector_sql(self):
+        labels = 'ABCD'
+        parts = [
+            f"setweight(to_tsvector('simple', %s), '{labels[min(i, 3)]}')"
+            for i in range(len(self.column_names))
+        ]
+        return ' || '.join(parts)
+
+    # ------------------------------------------------------------------
+    # Querying
+    # ------------------------------------------------------------------
+
+    def search(self, queryset, query):
+        """
+        Filter a queryset to rows matching `query`.
+
+        Adds `search_rank` (lower is better) and `search_snippet` annotations
+        and orders by rank, so the result composes with further filters and
+        with Paginator like any other queryset.
+        """
+        terms = tokenize_query(query)
+        if not terms:
+            return queryset.none()
+
+        source = self.model._meta.db_table
+        table = self.table
+        vendor = connection.vendor
+
+        if vendor == 'sqlite':
+            match = ' '.join('"%s"' % term for term in terms[:-1])
+            match = f'{match} "{terms[-1]}"*'.strip()
+            weights = ', '.join(str(w) for w in [*self.weights, FOLDED_WEIGHT])
+            snippet_col = len(self.column_names) - 1
+            select = {
+                'search_rank': f"bm25({table}, {weights})",
+                'search_snippet': f"snippet({table}, {snippet_col}, %s, %s, '…', {SNIPPET_WORDS})",
+            }
+            select_params = [HIGHLIGHT_START, HIGHLIGHT_END]
+            where = [f"{table} MATCH %s", f"{table}.rowid = {source}.id"]
+            params = [match]
+        elif vendor == 'postgresql':
+            tsquery = ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+            select = {
+                'search_rank': f"-ts_rank({table}.document, to_tsquery('simple', %s))",
+                'search_snippet': f"ts_headline('simple', {table}.{FOLDED_COLUMN}, to_tsquery('simple', %s), %s)",
+            }
+            select_params = [
+                tsquery, tsquery,
+                f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, '
+                f'MaxWords={SNIPPET_WORDS}, MinWords={SNIPPET_WORDS // 2}',
+            ]
+            where = [f"{table}.document @@ to_tsquery('simple', %s)", f"{table}.id = {source}.id"]
+            params = [tsquery]
+        else:
+            condition = Q()
+            for term in terms:
+                term_q = Q()
+                for fields in self.columns.values():
+                    for field in fields:
+                        if not callable(field):
+                            term_q |= Q(**{f'{field}__icontains': term})
+                condition &= term_q
+            return queryset.filter(condition).annotate(
+                search_rank=Value(0.0, output_field=FloatField()),
+                search_snippet=Value('', output_field=CharField()),
+            )
+
+        return queryset.extra(
+            select=select, select_params=select_params, tables=[table], where=where, params=params,
+        ).order_by('search_rank', '-pk')
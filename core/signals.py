@@ -0,0 +1,28 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from taggit.models import TaggedItem
+from .media import PROTECTED_MEDIA, invalidate_access
+from .tags import record_usage
+
+
+@receiver(post_save, sender=TaggedItem)
+def count_tag_added(sender, instance, created, **kwargs):
+    """Bump the tag's usage count when it is applied to an object."""
+    if created:
+        record_usage(instance.content_type_id, instance.tag_id, 1)
+
+
+@receiver(post_delete, sender=TaggedItem)
+def count_tag_removed(sender, instance, **kwargs):
+    """Lower the count when a tag is removed or its object is deleted."""
+    record_usage(instance.content_type_id, instance.tag_id, -1)
+
+
+def forget_media_access(sender, instance, **kwargs):
+    """Re-check who may fetch a row's files after it is published, hidden or deleted."""
+    invalidate_access(instance)
+
+
+for label in PROTECTED_MEDIA:
+    post_save.connect(forget_media_access, sender=label, dispatch_uid=f'forget_media_access:{label}')
+    post_delete.connect(forget_media_access, sender=label, dispatch_uid=f'forget_media_access:{label}')
@@ -0,0 +1,246 @@
+"""
+Content similarity
+Recommendations for insights and book reviews by TF-IDF cosine similarity
+over their text. Each model keeps its top neighbours in a table
+(RelatedInsight, RelatedReview) that detail pages read in one indexed query.
+
+Each item's vector is stored as SimilarityTerm rows, an inverted index in the
+database. A save that changes an item's text or visibility queues a job that
+re-vectorises only that item, scores it against the items sharing its terms,
+and then inserts, moves or drops it in those items' lists. Stored vectors and
+untouched lists keep the IDF of the corpus as it was when they were computed,
+so `rebuild_similar_content` re-vectorises everything now and then to correct
+the drift.
+
+Vectors are sparse dicts, which is plenty for corpora of a few thousand
+posts without pulling in numpy.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from django.db import transaction
+from django.db.models import Count
+from django.utils.html import strip_tags
+from .models import SimilarityTerm
+from .normalization import fold
+
+SIMILAR_LIMIT = 9
+# Terms kept per stored vector; weaker ones add little to any similarity
+TERMS_PER_ITEM = 200
+MAX_TERM_LENGTH = 100
+
+WORD_RE = re.compile(r'[^\W\d_]{2,}', re.UNICODE)
+STOP_WORDS = frozenset('''
+    about after again all also an and any are as at be because been before being between both but by can could
+    did do does doing down during each few for from further had has have having he her here hers him his how if
+    in into is it its itself just me more most my no nor not now of off on once only or other our out over own
+    same she should so some such than that the their them then there these they this those through to too under
+    until up very was we were what when where which while who whom why will with would you your
+'''.split())
+
+
+def tokenize(text):
+    """Folded words of `text` minus stop words"""
+    return [
+        word for word in WORD_RE.findall(fold(text))
+        if word not in STOP_WORDS and len(word) <= MAX_TERM_LENGTH
+    ]
+
+
+def term_weights(counts, frequency, total, limit=TERMS_PER_ITEM):
+    """
+    Unit-length TF-IDF vector ({term: weight}) of one document's term
+    `counts`, using log-scaled term frequency and smoothed IDF over `total`
+    documents with document `frequency` per term. Only the `limit` strongest
+    terms are kept, though all of them count towards the length.
+    """
+    weights = {
+        term: (1 + math.log(count)) * (math.log((1 + total) / (1 + frequency[term])) + 1)
+        for term, count in counts.items()
+    }
+    norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+    return {term: weight / norm for term, weight in top_scores(weights, limit)}
+
+
+def tfidf_vectors(documents, limit=TERMS_PER_ITEM):
+    """Unit-length TF-IDF vectors ({term: weight}) for `documents` ({pk: text})"""
+    counts = {pk: Counter(tokenize(text)) for pk, text in documents.items()}
+    frequency = Counter(term for terms in counts.values() for term in terms)
+    return {pk: term_weights(terms, frequency, len(counts), limit) for pk, terms in counts.items()}
+
+
+def build_postings(vectors):
+    """Inverted index: term -> [(pk, weight)]"""
+    postings = defaultdict(list)
+    for pk, vector in vectors.items():
+        for term, weight in vector.items():
+            postings[term].append((pk, weight))
+    return postings
+
+
+def similarities(vectors, postings, pk):
+    """Cosine similarity of `pk` to every other document sharing a term with it"""
+    scores = defaultdict(float)
+    for term, weight in vectors.get(pk, {}).items():
+        for other, other_weight in postings[term]:
+            if other != pk:
+                scores[other] += weight * other_weight
+    return scores
+
+
+def has_changed(instance, fields):
+    """True if `instance` is unsaved or differs from its stored row in any of `fields`"""
+    if instance.pk is None:
+        return True
+    stored = type(instance)._default_manager.filter(pk=instance.pk).values(*fields).first()
+    return stored is None or any(stored[field] != getattr(instance, field) for field in fields)
+
+
+def top_scores(scores, limit):
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+class SimilarityIndex:
+    """
+    The neighbour table of one model.
+
+    `queryset` returns the items that can be recommended (and get
+    recommendations); `fields` are the attributes, or callables taking the
+    instance, whose text is compared. `link_model` has a `source` foreign key
+    (named by `source_field`), a `related` foreign key and a float `score`;
+    its label also names the index's SimilarityTerm rows.
+    """
+
+    def __init__(self, queryset, fields, link_model, source_field, limit=SIMILAR_LIMIT):
+        self.queryset = queryset
+        self.fields = fields
+        self.link_model = link_model
+        self.source_field = source_field
+        self.source_id = f'{source_field}_id'
+        self.limit = limit
+        self.name = link_model._meta.label_lower
+
+    def document(self, instance):
+        parts = [field(instance) if callable(field) else getattr(instance, field, '') for field in self.fields]
+        return ' '.join(strip_tags(str(part)) for part in parts if part)
+
+    def vectors(self):
+        return tfidf_vectors({obj.pk: self.document(obj) for obj in self.queryset().iterator(chunk_size=500)})
+
+    def terms(self):
+        return SimilarityTerm.objects.filter(index=self.name)
+
+    def _term_rows(self, pk, vector):
+        return [SimilarityTerm(index=self.name, object_id=pk, term=term, weight=weight) for term, weight in vector.items()]
+
+    def _vector(self, instance):
+        """A fresh vector for `instance`, weighted by the stored document frequencies"""
+        counts = Counter(tokenize(self.document(instance)))
+        stored = dict(
+            self.terms().filter(term__in=list(counts)).exclude(object_id=instance.pk)
+            .values('term').annotate(items=Count('id')).values_list('term', 'items')
+        )
+        frequency = {term: stored.get(term, 0) + 1 for term in counts}
+        return term_weights(counts, frequency, self.queryset().count())
+
+    def _scores(self, pk, vector):
+        """Cosine similarity of `vector` (item `pk`) to every stored item sharing a term with it"""
+        scores = defaultdict(float)
+        rows = self.terms().filter(term__in=list(vector)).exclude(object_id=pk)
+        for other, term, weight in rows.values_list('object_id', 'term', 'weight').iterator(chunk_size=2000):
+            scores[other] += vector[term] * weight
+        return scores
+
+    def _write(self, lists):
+        """Replace the stored lists of the given items ({pk: [(related pk, score)]})"""
+        rows = [
+            self.link_model(**{self.source_id: pk}, related_id=other, score=score)
+            for pk, entries in lists.items()
+            for other, score in entries
+            if score > 0
+        ]
+        self.link_model.objects.filter(**{f'{self.source_id}__in': list(lists)}).delete()
+        self.link_model.objects.bulk_create(rows, batch_size=500)
+
+    def _store(self, vectors, postings, sources):
+        self._write({
+            pk: top_scores(similarities(vectors, postings, pk), self.limit)
+            for pk in sources if pk in vectors
+        })
+
+    def _place(self, pk, scores, listed_in):
+        """
+        Insert, move or drop item `pk` in the lists of the items it now scores
+        against (`scores`) or was listed by (`listed_in`). Returns the items
+        whose list must be recomputed because pk fell in a full list, where an
+        item outside it may now rank higher.
+        """
+        candidates = set(scores) | set(listed_in)
+        current = defaultdict(dict)
+        rows = self.link_model.objects.filter(**{f'{self.source_id}__in': list(candidates)})
+        for source, related, score in rows.values_list(self.source_id, 'related_id', 'score'):
+            current[source][related] = score
+        changed, refill = {}, set()
+        for other in candidates:
+            entries = current[other]
+            old, new = entries.get(pk), scores.get(other, 0.0)
+            if old is not None and new < old and len(entries) >= self.limit:
+                refill.add(other)
+                continue
+            updated = {**entries, pk: new} if new > 0 else {key: value for key, value in entries.items() if key != pk}
+            kept = top_scores(updated, self.limit)
+            if dict(kept) != entries:
+                changed[other] = kept
+        self._write(changed)
+        return refill
+
+    def refresh(self, pk):
+        """
+        Re-vectorise item `pk` and update its list and every list it could
+        enter, leave or move in, without touching the rest of the corpus.
+        """
+        if not self.terms().exists():
+            self.rebuild()
+            return
+        instance = self.queryset().filter(pk=pk).first()
+        listed_in = set(self.link_model.objects.filter(related_id=pk).values_list(self.source_id, flat=True))
+        with transaction.atomic():
+            self.terms().filter(object_id=pk).delete()
+            if instance is None:
+                self._write(dict.fromkeys([pk], []))
+                refill = listed_in
+            else:
+                vector = self._vector(instance)
+                SimilarityTerm.objects.bulk_create(self._term_rows(pk, vector))
+                scores = self._scores(pk, vector)
+                self._write({pk: top_scores(scores, self.limit)})
+                refill = self._place(pk, scores, listed_in)
+            self.refill(refill)
+
+    def refill(self, pks, removed=()):
+        """
+        Recompute the given items' lists from their stored vectors, e.g. after
+        one of their entries was deleted. Items in `removed` are dropped from
+        the index first.
+        """
+        pks = set(pks)
+        with transaction.atomic():
+            if removed:
+                self.terms().filter(object_id__in=list(removed)).delete()
+            vectors = defaultdict(dict)
+            for pk, term, weight in self.terms().filter(object_id__in=list(pks)).values_list('object_id', 'term', 'weight'):
+                vectors[pk][term] = weight
+            self._write({pk: top_scores(self._scores(pk, vectors[pk]), self.limit) for pk in pks})
+
+    def rebuild(self):
+        """Re-vectorise every item and recompute every list; returns the number of items indexed"""
+        vectors = self.vectors()
+        postings = build_postings(vectors)
+        with transaction.atomic():
+            self.terms().delete()
+            SimilarityTerm.objects.bulk_create(
+                [row for pk, vector in vectors.items() for row in self._term_rows(pk, vector)], batch_size=1000
+            )
+            self.link_model.objects.all().delete()
+            self._store(vectors, postings, set(vectors))
+        return len(vectors)
@@ -0,0 +1,159 @@
+// Resumable Chunked Uploads for Igbo Archives
+// Sends large video/audio files to /api/uploads/ in small chunks (tus 1.0 style)
+// before the archive form is submitted, so a dropped connection only costs one chunk.
+
+const CHUNK_SIZE = 4 * 1024 * 1024;
+const MAX_RETRIES = 5;
+
+function toBase64(text) {
+    return btoa(unescape(encodeURIComponent(text)));
+}
+
+function bufferToBase64(buffer) {
+    let binary = '';
+    new Uint8Array(buffer).forEach(byte => binary += String.fromCharCode(byte));
+    return btoa(binary);
+}
+
+function bufferToHex(buffer) {
+    return Array.from(new Uint8Array(buffer)).map(byte => byte.toString(16).padStart(2, '0')).join('');
+}
+
+async function sha256(data) {
+    // crypto.subtle is only available on HTTPS (and localhost)
+    if (!window.crypto || !window.crypto.subtle) return null;
+    return window.crypto.subtle.digest('SHA-256', data);
+}
+
+function sleep(ms) {
+    return new Promise(resolve => setTimeout(resolve, ms));
+}
+
+async function getUploadOffset(url, csrfToken) {
+    const response = await fetch(url, {
+        method: 'HEAD',
+        headers: { 'Tus-Resumable': '1.0.0', 'X-CSRFToken': csrfToken },
+        credentials: 'same-origin'
+    });
+    if (!response.ok) return null;
+    return parseInt(response.headers.get('Upload-Offset'), 10);
+}
+
+async function createUpload(file, kind, csrfToken) {
+    const digest = await sha256(await file.arrayBuffer());
+    const metadata = [
+        'filename ' + toBase64(file.name),
+        'kind ' + toBase64(kind)
+    ];
+    if (digest) metadata.push('checksum ' + toBase64(bufferToHex(digest)));
+
+    const response = await fetch('/api/uploads/', {
+        method: 'POST',
+        headers: {
+            'Tus-Resumable': '1.0.0',
+            'Upload-Length': String(file.size),
+            'Upload-Metadata': metadata.join(','),
+            'X-CSRFToken': csrfToken
+        },
+        credentials: 'same-origin'
+    });
+    if (response.status !== 201) {
+        const data = await response.json().catch(() => ({}));
+        throw new Error(data.message || 'Could not start upload');
+    }
+    return response.headers.get('Location');
+}
+
+async function uploadFileInChunks(file, kind, csrfToken, onProgress) {
+    const storageKey = `chunked-upload:${kind}:${file.name}:${file.size}:${file.lastModified}`;
+    let url = localStorage.getItem(storageKey);
+    let offset = url ? await getUploadOffset(url, csrfToken) : null;
+
+    if (offset === null || isNaN(offset)) {
+        url = await createUpload(file, kind, csrfToken);
+        localStorage.setItem(storageKey, url);
+        offset = 0;
+    }
+
+    let retries = 0;
+    while (offset < file.size) {
+        const chunk = await file.slice(offset, offset + CHUNK_SIZE).arrayBuffer();
+        const headers = {
+            'Tus-Resumable': '1.0.0',
+            'Upload-Offset': String(offset),
+            'Content-Type': 'application/offset+octet-stream',
+            'X-CSRFToken': csrfToken
+        };
+        const digest = await sha256(chunk);
+        if (digest) headers['Upload-Checksum'] = 'sha256 ' + bufferToBase64(digest);
+
+        try {
+            const response = await fetch(url, {
+                method: 'PATCH',
+                headers: headers,
+                body: chunk,
+                credentials: 'same-origin'
+            });
+            if (response.status === 204) {
+                offset = parseInt(response.headers.get('Upload-Offset'), 10);
+                retries = 0;
+                onProgress(offset / file.size);
+                continue;
+            }
+            if (response.status === 409) {
+                // Out of sync (e.g. a retried chunk already arrived): ask the server
+                offset = await getUploadOffset(url, csrfToken);
+                if (offset === null) throw new Error('Upload was lost, please try again');
+                continue;
+            }
+            if (response.status === 404 || response.status === 413 || response.status === 415) {
+                localStorage.removeItem(storageKey);
+                const data = await response.json().catch(() => ({}));
+                throw new Error(data.message || 'Upload was rejected');
+            }
+        } catch (error) {
+            if (!(error instanceof TypeError)) throw error;  // TypeError = network failure
+        }
+
+        if (++retries > MAX_RETRIES) throw new Error('Upload failed after several retries');
+        await sleep(Math.min(1000 * 2 ** retries, 30000));
+    }
+
+    localStorage.removeItem(storageKey);
+    return url.replace(/\/$/, '').split('/').pop();
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    document.querySelectorAll('form[data-chunked-upload]').forEach(form => {
+        form.addEventListener('submit', async event => {
+            const typeSelect = form.querySelector('[name="archive_type"]');
+            const kind = typeSelect ? typeSelect.value : '';
+            const input = form.querySelector(`input[type="file"][name="${kind}"][data-chunked]`);
+            if (!input || !input.files.length || form.dataset.uploading) return;
+
+            event.preventDefault();
+            form.dataset.uploading = '1';
+            const submitButton = form.querySelector('[type="submit"]');
+            const progress = form.querySelector(`[data-upload-progress="${kind}"]`);
+            const csrfToken = form.querySelector('[name="csrfmiddlewaretoken"]').value;
+            if (submitButton) submitButton.disabled = true;
+            if (progress) progress.hidden = false;
+
+            try {
+                const uploadId = await uploadFileInChunks(input.files[0], kind, csrfToken, fraction => {
+                    if (progress) progress.value = Math.round(fraction * 100);
+                });
+                form.querySelector('[name="upload_id"]').value = uploadId;
+                // The file is already on the server; don't send it again with the form
+                input.removeAttribute('required');
+                input.disabled = true;
+                form.submit();
+            } catch (error) {
+                alert(error.message);
+                delete form.dataset.uploading;
+                if (submitButton) submitButton.disabled = false;
+                if (progress) progress.hidden = true;
+            }
+        });
+    });
+});
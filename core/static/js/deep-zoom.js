@@ -0,0 +1,44 @@
+// Deep-zoom viewer for archive photos
+// Loads OpenSeadragon only when the visitor asks to zoom, then reads the IIIF
+// info.json so just the tiles in view are downloaded.
+
+const OPENSEADRAGON_URL = 'https://cdn.jsdelivr.net/npm/openseadragon@4.1.0/build/openseadragon/openseadragon.min.js';
+const OPENSEADRAGON_IMAGES = 'https://cdn.jsdelivr.net/npm/openseadragon@4.1.0/build/openseadragon/images/';
+
+function loadOpenSeadragon() {
+    if (window.OpenSeadragon) return Promise.resolve(window.OpenSeadragon);
+    return new Promise((resolve, reject) => {
+        const script = document.createElement('script');
+        script.src = OPENSEADRAGON_URL;
+        script.onload = () => resolve(window.OpenSeadragon);
+        script.onerror = () => reject(new Error('Could not load the zoom viewer'));
+        document.head.appendChild(script);
+    });
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    document.querySelectorAll('[data-deep-zoom]').forEach(button => {
+        button.addEventListener('click', async () => {
+            const container = document.getElementById(button.dataset.deepZoom);
+            if (!container || container.dataset.loaded) return;
+            button.disabled = true;
+            try {
+                const OpenSeadragon = await loadOpenSeadragon();
+                container.hidden = false;
+                container.dataset.loaded = '1';
+                OpenSeadragon({
+                    element: container,
+                    prefixUrl: OPENSEADRAGON_IMAGES,
+                    tileSources: container.dataset.iiifInfo,
+                    showRotationControl: false
+                });
+                button.hidden = true;
+                const preview = document.getElementById(button.dataset.deepZoomPreview);
+                if (preview) preview.hidden = true;
+            } catch (error) {
+                alert(error.message);
+                button.disabled = false;
+            }
+        });
+    });
+});
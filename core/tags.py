@@ -0,0 +1,164 @@
+"""
+Tag usage counts
+The insight and book lists show their tags without joining the whole taggit
+through table on every render. TagUsage holds one row per (content type, tag)
+with a running count, updated by core.signals whenever a TaggedItem row is
+added or removed, so "top N" and weighted clouds are a single indexed query.
+
+sync_tags() is the write path used by the create/edit views: it applies only
+the difference between an object's current and desired tags.
+"""
+import math
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.signals import m2m_changed
+from django.utils import timezone
+from taggit.models import Tag, TaggedItem
+from .models import TagUsage
+
+CLOUD_STEPS = 5
+
+
+def record_usage(content_type_id, tag_id, delta):
+    """Add `delta` (+1 / -1) to a tag's count for one content type"""
+    usage = TagUsage.objects.filter(content_type_id=content_type_id, tag_id=tag_id)
+    if delta < 0:
+        usage.filter(count__gte=-delta).update(count=F('count') + delta)
+        return
+    now = timezone.now()
+    if usage.update(count=F('count') + delta, last_used_at=now):
+        return
+    try:
+        with transaction.atomic():
+            TagUsage.objects.create(content_type_id=content_type_id, tag_id=tag_id, count=delta, last_used_at=now)
+    except IntegrityError:
+        # Another request created the row first
+        usage.update(count=F('count') + delta, last_used_at=now)
+
+
+def top_tags(model, limit=None):
+    """TagUsage rows (with their tag) for `model`, most used first"""
+    usages = (
+        TagUsage.objects.filter(content_type=ContentType.objects.get_for_model(model), count__gt=0)
+        .select_related('tag')
+        .order_by('-count', 'tag__name')
+    )
+    return usages[:limit] if limit else usages
+
+
+def tag_cloud(model, limit=None, steps=CLOUD_STEPS):
+    """
+    Tags for `model` with a `weight` from 1 to `steps`, scaled logarithmically
+    so a few very common tags don't flatten the rest. Sorted by name.
+    """
+    usages = list(top_tags(model, limit))
+    if not usages:
+        return []
+    low = math.log(usages[-1].count)
+    spread = math.log(usages[0].count) - low
+    cloud = []
+    for usage in usages:
+        weight = 1 + round((math.log(usage.count) - low) / spread * (steps - 1)) if spread else 1
+        cloud.append({'name': usage.tag.name, 'slug': usage.tag.slug, 'count': usage.count, 'weight': weight})
+    return sorted(cloud, key=lambda item: item['name'].lower())
+
+
+def rebuild_tag_usage():
+    """Recount every TagUsage row from the taggit through table"""
+    now = timezone.now()
+    rows = TaggedItem.objects.order_by().values('content_type_id', 'tag_id').annotate(total=Count('id'))
+    with transaction.atomic():
+        TagUsage.objects.all().delete()
+        TagUsage.objects.bulk_create(
+            [
+                TagUsage(content_type_id=row['content_type_id'], tag_id=row['tag_id'], count=row['total'], last_used_at=now)
+                for row in rows
+            ],
+            batch_size=500,
+        )
+    return len(rows)
+
+
+def parse_tags(value):
+    """Tag names from comma-separated input (or an iterable), stripped and de-duplicated in order"""
+    if isinstance(value, str):
+        value = value.split(',')
+    names = []
+    for name in value or ():
+        name = str(name).strip()[:Tag._meta.get_field('name').max_length]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def get_or_create_tags(names):
+    """Tag objects by name, inserting the missing ones in one statement where their slugs are free"""
+    tags = {tag.name: tag for tag in Tag.objects.filter(name__in=names)}
+    missing = [name for name in names if name not in tags]
+    if missing:
+        slugs = {name: Tag(name=name).slugify(name) for name in missing}
+        taken = set(Tag.objects.filter(slug__in=slugs.values()).values_list('slug', flat=True))
+        fresh, seen = [], set()
+        for name in missing:
+            slug = slugs[name]
+            if slug and slug not in taken and slug not in seen:
+                fresh.append(Tag(name=name, slug=slug))
+                seen.add(slug)
+        # Rows a concurrent request inserted first are skipped and re-read below
+        Tag.objects.bulk_create(fresh, ignore_conflicts=True)
+        tags.update({tag.name: tag for tag in Tag.objects.filter(name__in=missing)})
+        for name in missing:
+            if name not in tags:
+                # Slug collision: let taggit pick a unique suffix
+                tags[name], _ = Tag.objects.get_or_create(name=name)
+    return tags
+
+
+def _send_m2m(instance, action, pk_set):
+    m2m_changed.send(
+        sender=TaggedItem, instance=instance, action=action, reverse=False,
+        model=Tag, pk_set=pk_set, using=instance._state.db,
+    )
+
+
+def sync_tags(instance, value):
+    """
+    Make `instance`'s tags exactly `value` (comma-separated or an iterable),
+    inserting and deleting only the differences in a single transaction.
+    Returns the (added, removed) tag names.
+    """
+    names = parse_tags(value)
+    content_type = ContentType.objects.get_for_model(instance)
+    with transaction.atomic():
+        current = {
+            name: (item_id, tag_id)
+            for item_id, tag_id, name in TaggedItem.objects.filter(
+                content_type=content_type, object_id=instance.pk
+            ).values_list('id', 'tag_id', 'tag__name')
+        }
+        added = [name for name in names if name not in current]
+        removed = [name for name in current if name not in names]
+
+        if removed:
+            removed_ids = {current[name][1] for name in removed}
+            _send_m2m(instance, 'pre_remove', removed_ids)
+            # Deleted through the ORM so the usage-count signals still fire
+            TaggedItem.objects.filter(id__in=[current[name][0] for name in removed]).delete()
+            _send_m2m(instance, 'post_remove', removed_ids)
+
+        if added:
+            tags = get_or_create_tags(added)
+            added_ids = {tags[name].pk for name in added}
+            _send_m2m(instance, 'pre_add', added_ids)
+            TaggedItem.objects.bulk_create([
+                TaggedItem(content_type=content_type, object_id=instance.pk, tag=tags[name])
+                for name in added
+            ])
+            # bulk_create skips post_save, so count the new usages here
+            for tag_id in added_ids:
+                record_usage(content_type.pk, tag_id, 1)
+            _send_m2m(instance, 'post_add', added_ids)
+
+    getattr(instance, '_prefetched_objects_cache', {}).pop('tags', None)
+    return added, removed
@@ -0,0 +1,98 @@
+"""
+Background tasks
+Functions run by the job queue (see core/jobs.py). Arguments must be JSON
+serialisable, so model instances are passed as jobs.model_ref() references.
+Tasks raise on failure so the worker can retry them.
+"""
+from django.conf import settings
+from django.core.mail import send_mail
+from notifications.signals import notify
+from .jobs import resolve_ref
+
+
+def send_email(to_email, subject, message):
+    """Send a plain-text email"""
+    send_mail(
+        subject=subject,
+        message=message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[to_email] if isinstance(to_email, str) else to_email,
+        fail_silently=False,
+    )
+
+
+def send_notification(sender, recipient, verb, description='', action_object=None, target=None):
+    """Create an in-app notification from model references"""
+    sender_obj = resolve_ref(sender)
+    recipient_obj = resolve_ref(recipient)
+    if sender_obj is None or recipient_obj is None:
+        return
+    extra = {}
+    for key, ref in (('action_object', action_object), ('target', target)):
+        obj = resolve_ref(ref)
+        if obj is not None:
+            extra[key] = obj
+    notify.send(
+        sender=sender_obj,
+        recipient=recipient_obj,
+        verb=verb,
+        description=description,
+        **extra
+    )
+
+
+def submit_to_indexnow(url):
+    """Ping IndexNow about a published URL"""
+    from .indexnow import submit_url_to_indexnow
+    if not submit_url_to_indexnow(url):
+        raise RuntimeError(f"IndexNow submission failed for {url}")
+
+
+def generate_image_derivatives(ref, force=False):
+    """Write responsive image derivatives for a model instance"""
+    from .images import generate_for_instance
+    instance = resolve_ref(ref)
+    if instance is not None:
+        generate_for_instance(instance, force=force)
+
+
+def build_image_tiles(ref, field_name='image', force=False):
+    """Cut a model instance's image into a deep-zoom tile pyramid"""
+    from .tiles import build_pyramid
+    instance = resolve_ref(ref)
+    if instance is not None:
+        fieldfile = getattr(instance, field_name)
+        if fieldfile and build_pyramid(fieldfile, force=force) is None:
+            raise RuntimeError(f"Could not tile {fieldfile.name}")
+
+
+def refresh_related_archives(ref):
+    """Rescore the tag/category recommendations an archive's change can affect"""
+    from archives.related import refresh_related
+    archive = resolve_ref(ref)
+    if archive is not None:
+        refresh_related(archive)
+
+
+def refresh_similar(index, pk):
+    """Rescore the text-similarity recommendations touched by a changed item"""
+    from django.utils.module_loading import import_string
+    import_string(index).refresh(pk)
+
+
+def refill_similar(index, pks, removed=()):
+    """Recompute recommendation lists that lost an entry, dropping deleted items from the index"""
+    from django.utils.module_loading import import_string
+    import_string(index).refill(pks, removed)
+
+
+def flush_view_counts(counts):
+    """Apply page views buffered by a worker process (see core/counters.py)"""
+    from .counters import apply_view_counts
+    apply_view_counts(counts)
+
+
+def decay_view_scores():
+    """Periodic: decay popular/trending scores by the time since the last run"""
+    from .counters import decay_elapsed
+    decay_elapsed()
@@ -0,0 +1,16 @@
+from django import template
+from core import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(fieldfile, alt='', sizes='100vw', **attrs):
+    """Render a responsive <picture> for an image field, e.g. {% picture archive.image alt=archive.alt_text class="card-img-top" %}"""
+    return images.picture(fieldfile, alt=alt, sizes=sizes, **attrs)
+
+
+@register.filter
+def thumbnail(fieldfile, width=320):
+    """URL of a resized copy of an image field at least `width` pixels wide"""
+    return images.thumbnail_url(fieldfile, int(width))
@@ -0,0 +1,10 @@
+from django import template
+from core.search import render_snippet
+
+register = template.Library()
+
+
+@register.filter
+def highlight(snippet):
+    """Render a search snippet with matched terms wrapped in <mark>"""
+    return render_snippet(snippet)
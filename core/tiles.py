@@ -0,0 +1,144 @@
+"""
+Deep-zoom tile pyramids
+High-resolution photos are cut once into fixed-size JPEG tiles at
+power-of-two scale factors and stored under `tiles/` in media storage, so a
+zooming viewer only downloads the tiles in view and the IIIF endpoint (see
+archives/iiif.py) serves them as static files without touching Pillow.
+Each pyramid has an `info.json` with the original size and scale factors.
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+from io import BytesIO
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = 512
+TILE_QUALITY = 85
+TILES_PREFIX = 'tiles'
+INFO_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def pyramid_dir(name):
+    """Storage directory holding the pyramid of the image stored as `name`"""
+    return f'{TILES_PREFIX}/{os.path.splitext(name)[0]}'
+
+
+def tile_name(name, scale, col, row):
+    return f'{pyramid_dir(name)}/{scale}/{col}_{row}.jpg'
+
+
+def _info_cache_key(name):
+    return 'image-tiles:' + hashlib.md5(name.encode()).hexdigest()
+
+
+def scale_factors(width, height, tile_size=TILE_SIZE):
+    """Power-of-two scale factors down to the level that fits in a single tile"""
+    factors = [1]
+    while math.ceil(width / factors[-1]) > tile_size or math.ceil(height / factors[-1]) > tile_size:
+        factors.append(factors[-1] * 2)
+    return factors
+
+
+def level_size(info, scale):
+    return math.ceil(info['width'] / scale), math.ceil(info['height'] / scale)
+
+
+def build_pyramid(fieldfile, force=False):
+    """
+    Cut an image field's file into tiles at every scale factor.
+    Returns the pyramid info dict, or None if the image cannot be read.
+    """
+    if not fieldfile:
+        return None
+    if not force:
+        info = pyramid_info(fieldfile)
+        if info:
+            return info
+
+    storage = fieldfile.storage
+    name = fieldfile.name
+    try:
+        with storage.open(name, 'rb') as handle:
+            image = Image.open(handle)
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except Exception as e:
+        logger.error(f"Could not open image {name} for tiling: {str(e)}")
+        return None
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    info = {
+        'width': image.width,
+        'height': image.height,
+        'tile_size': TILE_SIZE,
+        'scale_factors': scale_factors(image.width, image.height),
+    }
+    level = image
+    for scale in info['scale_factors']:
+        width, height = level_size(info, scale)
+        if level.size != (width, height):
+            # Each level is resized from the previous one, halving the work
+            level = level.resize((width, height), Image.LANCZOS)
+        for row in range(math.ceil(height / TILE_SIZE)):
+            for col in range(math.ceil(width / TILE_SIZE)):
+                box = (col * TILE_SIZE, row * TILE_SIZE, min((col + 1) * TILE_SIZE, width), min((row + 1) * TILE_SIZE, height))
+                buffer = BytesIO()
+                level.crop(box).save(buffer, 'JPEG', quality=TILE_QUALITY, optimize=True)
+                _replace(storage, tile_name(name, scale, col, row), buffer.getvalue())
+
+    # Written last: its presence marks the pyramid as complete
+    _replace(storage, f'{pyramid_dir(name)}/info.json', json.dumps(info).encode())
+    cache.set(_info_cache_key(name), info, INFO_CACHE_TIMEOUT)
+    return info
+
+
+def _replace(storage, name, content):
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(content))
+
+
+def pyramid_info(fieldfile):
+    """The pyramid info dict for `fieldfile`, or None if it has not been built (cached)"""
+    if not fieldfile:
+        return None
+    key = _info_cache_key(fieldfile.name)
+    info = cache.get(key)
+    if info is None:
+        storage = fieldfile.storage
+        info_name = f'{pyramid_dir(fieldfile.name)}/info.json'
+        info = {}
+        if storage.exists(info_name):
+            try:
+                with storage.open(info_name, 'rb') as handle:
+                    info = json.load(handle)
+            except (OSError, ValueError):
+                info = {}
+        # Re-check a missing pyramid sooner; the worker may be building it
+        cache.set(key, info, INFO_CACHE_TIMEOUT if info else 300)
+    return info or None
+
+
+def delete_pyramid(fieldfile):
+    """Remove every tile and the info file of `fieldfile`'s pyramid"""
+    if not fieldfile:
+        return
+    storage = fieldfile.storage
+    root = pyramid_dir(fieldfile.name)
+    try:
+        levels, files = storage.listdir(root)
+    except (FileNotFoundError, NotImplementedError):
+        return
+    for level in levels:
+        for tile in storage.listdir(f'{root}/{level}')[1]:
+            storage.delete(f'{root}/{level}/{tile}')
+    for filename in files:
+        storage.delete(f'{root}/{filename}')
+    cache.delete(_info_cache_key(fieldfile.name))
@@ -1,16 +1,15 @@
 from django.shortcuts import render
 from django.contrib import messages
-from django.core.mail import send_mail
 from django.conf import settings
 from django.utils import timezone
-from archives.models import Archive
+from .featured import featured_archives
+from .jobs import enqueue
 
 
 def home(request):
-    # Get all approved archives and randomize (no featured filtering)
-    all_archives = Archive.objects.filter(is_approved=True).order_by('?')[:10]
+    # Random approved archives, sampled from a cached ID pool
     context = {
-        'featured_archives': all_archives
+        'featured_archives': featured_archives()
     }
     return render(request, 'core/home.html', context)
 
@@ -50,13 +49,8 @@ Subject: {subject}
 Message:
 {message_text}
 """
-                send_mail(
-                    f'Contact Form: {subject}',
-                    full_message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [settings.ADMIN_EMAIL],
-                    fail_silently=False,
-                )
+                # Sent by the background worker
+                enqueue('core.tasks.send_email', settings.ADMIN_EMAIL, f'Contact Form: {subject}', full_message)
                 messages.success(request, 'Thank you for your message! We will get back to you soon.')
             except Exception as e:
                 messages.error(request, 'There was an error sending your message. Please try again later.')
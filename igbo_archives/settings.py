@@ -82,6 +82,7 @@ TEMPLATES = [
                 'django.template.context_processors.media',
                 'core.context_processors.pwa_settings',
                 'core.context_processors.monetization_settings',
+                'core.context_processors.message_counts',
             ],
         },
     },
@@ -115,6 +116,30 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Media is served by core.media.serve_media. Behind nginx, set MEDIA_ACCEL_REDIRECT_PREFIX
+# to an internal location aliased to MEDIA_ROOT (or MEDIA_SENDFILE_HEADER=X-Sendfile for
+# Apache) so the front-end server streams the files.
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '')
+MEDIA_SENDFILE_HEADER = os.getenv('MEDIA_SENDFILE_HEADER', '')
+MEDIA_CACHE_MAX_AGE = 60 * 60 * 24 * 30
+
+# Resumable (chunked) uploads are assembled here before being attached to an archive
+CHUNKED_UPLOAD_DIR = os.getenv('CHUNKED_UPLOAD_DIR', str(BASE_DIR / 'tmp' / 'uploads'))
+CHUNKED_UPLOAD_MAX_CHUNK = 5 * 1024 * 1024
+CHUNKED_UPLOAD_EXPIRY_HOURS = 24
+
+# Shared by every process on the host (gunicorn workers, runworker, cron commands), so
+# cache invalidation from a signal or command reaches the web workers. Use Redis or
+# Memcached instead once the site runs on more than one host.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_DIR', str(BASE_DIR / 'tmp' / 'cache')),
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.CustomUser'
@@ -325,3 +350,13 @@ ENABLE_DONATIONS = bool(STRIPE_SECRET_KEY)
 # INDEXNOW CONFIGURATION
 # ============================================
 INDEXNOW_API_KEY = os.getenv('INDEXNOW_API_KEY', '')
+
+# ============================================
+# BACKGROUND JOBS
+# ============================================
+# Jobs are stored in the database and run by `python manage.py runworker`.
+# Set JOB_QUEUE_EAGER=True to run them inline (e.g. local development without a worker).
+JOB_QUEUE_EAGER = os.getenv('JOB_QUEUE_EAGER', 'False') == 'True'
+JOB_VISIBILITY_TIMEOUT = int(os.getenv('JOB_VISIBILITY_TIMEOUT', '300'))
+# How often the worker decays the "Most viewed"/"Trending" scores
+VIEW_DECAY_INTERVAL = int(os.getenv('VIEW_DECAY_INTERVAL', '3600'))
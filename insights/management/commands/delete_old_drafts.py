@@ -1,17 +1,74 @@
+"""
+Management command to purge stale drafts in small batches
+"""
+import time
+from datetime import timedelta
+from django.core.files.storage import default_storage
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.utils import timezone
-from datetime import timedelta
-from insights.models import InsightPost
+from books.models import BookReview
+from core.images import IMAGE_FIELDS
+from core.media_gc import still_referenced
+from insights.models import InsightPost, UploadedImage
+
+
+def _media_names(model, pks):
+    """Files owned by the rows `pks`: their image fields and, for posts, their uploaded images"""
+    fields = IMAGE_FIELDS[model._meta.label]
+    names = [name for row in model.objects.filter(pk__in=pks).values_list(*fields) for name in row if name]
+    if model is InsightPost:
+        names += list(UploadedImage.objects.filter(insight_id__in=pks).values_list('image', flat=True))
+    return names
+
 
 class Command(BaseCommand):
-    help = 'Delete draft posts older than 30 days'
-    
-    def handle(self, *args, **options):
-        cutoff_date = timezone.now() - timedelta(days=30)
-        old_drafts = InsightPost.objects.filter(
-            is_published=False,
-            created_at__lt=cutoff_date
+    help = 'Delete unsubmitted draft insights and book reviews not edited for 30 days, with their media files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Age of the last edit before a draft is deleted')
+        parser.add_argument('--batch-size', type=int, default=50, help='Drafts deleted per transaction')
+        parser.add_argument(
+            '--max-rate', type=float, default=0,
+            help='Maximum drafts deleted per second, to run during traffic (default: no limit)',
         )
-        count = old_drafts.count()
-        old_drafts.delete()
-        self.stdout.write(self.style.SUCCESS(f'Deleted {count} old draft(s)'))
+        parser.add_argument('--dry-run', action='store_true', help='Count drafts only; change nothing')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        batch_size = max(1, options['batch_size'])
+        for model, label in ((InsightPost, 'insight'), (BookReview, 'book review')):
+            # Drafts waiting for moderation are not abandoned
+            drafts = model.objects.filter(is_published=False, pending_approval=False, updated_at__lt=cutoff)
+            if options['dry_run']:
+                self.stdout.write(f'Dry run: would delete {drafts.count()} {label} draft(s)')
+                continue
+            self.purge(drafts, model, label, batch_size, options['max_rate'])
+
+    def purge(self, drafts, model, label, batch_size, max_rate):
+        started = time.monotonic()
+        deleted = files = 0
+        while True:
+            pks = list(drafts.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            names = _media_names(model, pks)
+            # Each batch is its own short transaction so readers are never blocked for long
+            with transaction.atomic():
+                model.objects.filter(pk__in=pks).delete()
+            # Resized copies go with the rows (see the post_delete signals); the
+            # originals are removed here unless another row shares them
+            for name in set(names) - still_referenced(names):
+                default_storage.delete(name)
+                files += 1
+            deleted += len(pks)
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'Deleted {deleted} {label} draft(s) ({deleted / max(elapsed, 0.001):.1f}/s)')
+            if max_rate:
+                # Sleep off any time gained on the rate limit
+                time.sleep(max(0.0, deleted / max_rate - elapsed))
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} {label} draft(s) and {files} media file(s) in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,138 @@
+"""
+Full-text index for insight posts.
+
+The table layout, indexed columns and text folding are copied here as they
+stood when this migration was written (see insights/search.py, core/search.py
+and core/editorjs.py), so later changes to the live index cannot change what
+this migration builds.
+"""
+import json
+import re
+import unicodedata
+from html import unescape
+from django.db import migrations
+
+TABLE = 'insights_insightpost_fts'
+FOLDED_COLUMN = 'folded'
+FOLD_LETTERS = {
+    'ị': 'i', 'ọ': 'o', 'ụ': 'u', 'ṅ': 'n',
+    'Ị': 'i', 'Ọ': 'o', 'Ụ': 'u', 'Ṅ': 'n',
+    'ŋ': 'n', 'Ŋ': 'n',
+}
+
+
+def fold(text):
+    text = ''.join(FOLD_LETTERS.get(ch, ch) for ch in text or '')
+    decomposed = unicodedata.normalize('NFD', text)
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return unicodedata.normalize('NFC', stripped).casefold()
+
+
+TAG_RE = re.compile(r'<[^>]+>')
+
+
+def load_blocks(content_json):
+    data = content_json
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except ValueError:
+            return []
+    if not isinstance(data, dict):
+        return []
+    blocks = data.get('blocks')
+    return blocks if isinstance(blocks, list) else []
+
+
+def item_text(item):
+    if isinstance(item, dict):
+        parts = [item.get('content') or item.get('text') or '']
+        parts.extend(item_text(child) for child in item.get('items') or [])
+        return ' '.join(parts)
+    return str(item or '')
+
+
+def plain_text(content_json):
+    parts = []
+    for block in load_blocks(content_json):
+        data = block.get('data') or {}
+        for key in ('text', 'caption', 'title', 'message', 'code'):
+            if isinstance(data.get(key), str):
+                parts.append(data[key])
+        for item in data.get('items') or []:
+            parts.append(item_text(item))
+        for row in data.get('content') or []:
+            if isinstance(row, list):
+                parts.extend(str(cell) for cell in row)
+    text = ' '.join(part for part in parts if part)
+    return ' '.join(unescape(TAG_RE.sub(' ', text)).split())
+
+
+def content_text(instance):
+    return plain_text(instance.content_json) or instance.legacy_content
+
+
+COLUMNS = {
+    'title': ['title'],
+    'body': ['excerpt', content_text],
+}
+
+def document(instance):
+    values = []
+    for fields in COLUMNS.values():
+        parts = [str((field(instance) if callable(field) else getattr(instance, field)) or '') for field in fields]
+        values.append(' '.join(part for part in parts if part))
+    return values
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in ('sqlite', 'postgresql'):
+        return
+    cols = ', '.join(COLUMNS)
+    placeholders = ', '.join(['%s'] * len(COLUMNS))
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+            f"{cols}, {FOLDED_COLUMN}, tokenize='unicode61 remove_diacritics 2')"
+        )
+        insert = f"INSERT INTO {TABLE} (rowid, {cols}, {FOLDED_COLUMN}) VALUES (%s, {placeholders}, %s)"
+    else:
+        text_cols = ', '.join(f'{name} text NOT NULL' for name in COLUMNS)
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {TABLE} ("
+            f"id bigint PRIMARY KEY REFERENCES insights_insightpost(id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            f"{text_cols}, {FOLDED_COLUMN} text NOT NULL, document tsvector NOT NULL)"
+        )
+        schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {TABLE}_document_idx ON {TABLE} USING GIN (document)")
+        vector = ' || '.join(
+            f"setweight(to_tsvector('simple', %s), '{'ABCD'[min(i, 3)]}')" for i in range(len(COLUMNS))
+        )
+        insert = f"INSERT INTO {TABLE} (id, {cols}, {FOLDED_COLUMN}, document) VALUES (%s, {placeholders}, %s, {vector})"
+
+    InsightPost = apps.get_model('insights', 'InsightPost')
+    with schema_editor.connection.cursor() as cursor:
+        for post in InsightPost.objects.order_by('pk').iterator(chunk_size=500):
+            values = document(post)
+            if vendor == 'sqlite':
+                params = [post.pk, *values, ' '.join(fold(value) for value in values if value)]
+            else:
+                folded = [fold(value) for value in values]
+                params = [post.pk, *values, folded[-1], *folded]
+            cursor.execute(insert, params)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('insights', '0002_remove_insightpost_content_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
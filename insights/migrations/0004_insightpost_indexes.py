@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('insights', '0003_insightpost_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='insightpost',
+            index=models.Index(fields=['is_published', 'is_approved', '-created_at'], name='insight_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='insightpost',
+            index=models.Index(condition=models.Q(('is_approved', True), ('is_published', True)), fields=['-created_at', '-id'], name='insight_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='insightpost',
+            index=models.Index(condition=models.Q(('is_approved', False), ('pending_approval', True)), fields=['-created_at'], name='insight_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='insightpost',
+            index=models.Index(fields=['author', '-created_at'], name='insight_author_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='insightpost',
+            index=models.Index(condition=models.Q(('is_published', False)), fields=['author', '-updated_at'], name='insight_author_drafts_idx'),
+        ),
+    ]
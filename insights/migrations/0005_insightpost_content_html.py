@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('insights', '0004_insightpost_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='insightpost',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='insightpost',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
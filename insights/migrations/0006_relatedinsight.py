@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('insights', '0005_insightpost_content_html'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedInsight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('insight', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='insights.insightpost')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommended_in', to='insights.insightpost')),
+            ],
+            options={
+                'ordering': ['-score'],
+                'indexes': [models.Index(fields=['insight', '-score'], name='related_insight_score_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='relatedinsight',
+            constraint=models.UniqueConstraint(fields=('insight', 'related'), name='unique_related_insight'),
+        ),
+    ]
@@ -30,6 +30,10 @@ class InsightPost(models.Model):
     
     # Legacy CKEditor content (for backward compatibility)
     legacy_content = models.TextField(blank=True, help_text="Legacy HTML content")
+
+    # Sanitised HTML rendered from the fields above on save (core.editorjs)
+    content_html = models.TextField(blank=True, editable=False)
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
     
     excerpt = models.TextField(max_length=500, blank=True)
     featured_image = models.ImageField(
@@ -60,12 +64,53 @@ class InsightPost(models.Model):
     is_approved = models.BooleanField(default=False)
     pending_approval = models.BooleanField(default=False, help_text="Post is pending admin approval")
     submitted_at = models.DateTimeField(null=True, blank=True, help_text="When post was submitted for approval")
+
+    # Popularity, updated in batches by core.counters
+    view_count = models.PositiveIntegerField(default=0, editable=False)
+    popular_score = models.FloatField(default=0, editable=False)
+    trending_score = models.FloatField(default=0, editable=False)
     
     posted_to_social = models.BooleanField(default=False)
     tags = TaggableManager()
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Public listings, prev/next navigation and sitemaps
+            models.Index(fields=['is_published', 'is_approved', '-created_at'], name='insight_status_created_idx'),
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=models.Q(is_published=True, is_approved=True),
+                name='insight_published_idx',
+            ),
+            # Moderation queue
+            models.Index(
+                fields=['-created_at'],
+                condition=models.Q(pending_approval=True, is_approved=False),
+                name='insight_pending_idx',
+            ),
+            # Dashboard and profile pages
+            models.Index(fields=['author', '-created_at'], name='insight_author_created_idx'),
+            models.Index(fields=['author', '-updated_at'], condition=models.Q(is_published=False), name='insight_author_drafts_idx'),
+            # "Most viewed" and "Trending" sorts
+            models.Index(
+                fields=['-popular_score', '-id'],
+                condition=models.Q(is_published=True, is_approved=True),
+                name='insight_popular_idx',
+            ),
+            models.Index(
+                fields=['-trending_score', '-id'],
+                condition=models.Q(is_published=True, is_approved=True),
+                name='insight_trending_idx',
+            ),
+        ]
+    
+    def save(self, *args, **kwargs):
+        """Persist the re-rendered HTML alongside a targeted save of the body"""
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'content_json', 'legacy_content'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'content_html', 'content_hash'}
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return self.title
@@ -75,6 +120,25 @@ class InsightPost(models.Model):
         """Return content_json if available, otherwise legacy_content"""
         return self.content_json if self.content_json else self.legacy_content
 
+
+class RelatedInsight(models.Model):
+    """Precomputed recommendation for insight_detail, scored by text similarity (core.similarity)"""
+    insight = models.ForeignKey(InsightPost, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(InsightPost, on_delete=models.CASCADE, related_name='recommended_in')
+    score = models.FloatField()
+    
+    class Meta:
+        ordering = ['-score']
+        constraints = [
+            models.UniqueConstraint(fields=['insight', 'related'], name='unique_related_insight'),
+        ]
+        indexes = [
+            models.Index(fields=['insight', '-score'], name='related_insight_score_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.related} for {self.insight} ({self.score})"
+
 class EditSuggestion(models.Model):
     post = models.ForeignKey(InsightPost, on_delete=models.CASCADE, related_name='suggestions')
     suggested_by = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
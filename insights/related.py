@@ -0,0 +1,16 @@
+"""
+Related insights
+The TF-IDF neighbour index behind insight_detail's recommendations (see
+core/similarity.py), comparing titles, excerpts and rendered post text.
+"""
+from core.similarity import SimilarityIndex
+from .models import InsightPost, RelatedInsight
+
+insight_similarity = SimilarityIndex(
+    queryset=lambda: InsightPost.objects.filter(is_published=True, is_approved=True).only(
+        'title', 'excerpt', 'content_html'
+    ),
+    fields=['title', 'excerpt', 'content_html'],
+    link_model=RelatedInsight,
+    source_field='insight',
+)
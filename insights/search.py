@@ -0,0 +1,17 @@
+from core.editorjs import plain_text
+from core.search import SearchIndex
+from .models import InsightPost
+
+
+def content_text(post):
+    return plain_text(post.content_json) or post.legacy_content
+
+
+insight_index = SearchIndex(
+    InsightPost,
+    table='insights_insightpost_fts',
+    columns={
+        'title': ['title'],
+        'body': ['excerpt', content_text],
+    },
+)
@@ -1,11 +1,30 @@
-from django.db.models.signals import post_save
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
 from django.dispatch import receiver
-from notifications.signals import notify
-from .models import InsightPost, EditSuggestion
+from core.notifications_utils import queue_notification
+from .models import InsightPost, RelatedInsight, EditSuggestion
+from .related import insight_similarity
+from .search import insight_index
+from core.images import needs_derivatives, delete_for_instance
+from core.jobs import enqueue, model_ref
+from core.editorjs import refresh_content_html
+from core.similarity import has_changed
 import logging
 
 logger = logging.getLogger(__name__)
 
+# What the similarity index reads; content_hash stands in for the rendered body
+SIMILARITY_FIELDS = ['title', 'excerpt', 'content_hash', 'is_published', 'is_approved']
+SIMILARITY_SOURCE_FIELDS = {*SIMILARITY_FIELDS, 'content_json', 'legacy_content'}
+
+
+@receiver(pre_save, sender=InsightPost)
+def render_post_content_html(sender, instance, update_fields=None, **kwargs):
+    """Re-render the stored HTML when the post body has changed."""
+    if update_fields is not None and not {'content_json', 'legacy_content'} & set(update_fields):
+        return
+    refresh_content_html(instance)
+
 
 @receiver(post_save, sender=InsightPost)
 def handle_insight_post_approval(sender, instance, created, **kwargs):
@@ -18,6 +37,31 @@ def handle_insight_post_approval(sender, instance, created, **kwargs):
             logger.info(f"Post approved: {instance.title}")
 
 
+@receiver(post_save, sender=InsightPost)
+def update_insight_search_index(sender, instance, **kwargs):
+    """Keep the full-text index in step with the post row."""
+    insight_index.update(instance)
+
+
+@receiver(post_delete, sender=InsightPost)
+def remove_insight_from_search_index(sender, instance, **kwargs):
+    """Drop a deleted post from the full-text index."""
+    insight_index.delete(instance.pk)
+
+
+@receiver(post_save, sender=InsightPost)
+def generate_insight_image_derivatives(sender, instance, **kwargs):
+    """Queue resized copies of new or replaced images."""
+    if needs_derivatives(instance):
+        enqueue('core.tasks.generate_image_derivatives', model_ref(instance))
+
+
+@receiver(post_delete, sender=InsightPost)
+def delete_insight_image_derivatives(sender, instance, **kwargs):
+    """Remove the resized copies of a deleted post's images."""
+    delete_for_instance(instance)
+
+
 @receiver(post_save, sender=EditSuggestion)
 def notify_author_of_suggestion(sender, instance, created, **kwargs):
     """
@@ -25,13 +69,51 @@ def notify_author_of_suggestion(sender, instance, created, **kwargs):
     """
     if created and instance.post.author:
         try:
-            notify.send(
+            queue_notification(
                 sender=instance.suggested_by if instance.suggested_by else instance.post.author,
                 recipient=instance.post.author,
                 verb='suggested an edit for',
                 target=instance.post,
                 description=f'{instance.suggested_by.full_name if instance.suggested_by else "A guest"} suggested an edit for your post "{instance.post.title}"'
             )
-            logger.info(f"Notification sent to {instance.post.author.full_name} for edit suggestion")
+            logger.info(f"Notification queued for {instance.post.author.full_name} for edit suggestion")
         except Exception as e:
             logger.error(f"Error sending edit suggestion notification: {str(e)}")
+
+
+@receiver(pre_save, sender=InsightPost)
+def note_similarity_changes(sender, instance, update_fields=None, **kwargs):
+    """Note whether the save changes the text or visibility the recommendations use."""
+    if update_fields is not None and not SIMILARITY_SOURCE_FIELDS & set(update_fields):
+        instance._similarity_changed = False
+    else:
+        instance._similarity_changed = has_changed(instance, SIMILARITY_FIELDS)
+
+
+@receiver(post_save, sender=InsightPost)
+def update_similar_posts(sender, instance, **kwargs):
+    """Queue a rescore of the text-similarity recommendations the post appears in."""
+    if not getattr(instance, '_similarity_changed', True):
+        return
+    indexed = (
+        insight_similarity.terms().filter(object_id=instance.pk).exists()
+        or RelatedInsight.objects.filter(Q(insight=instance) | Q(related=instance)).exists()
+    )
+    if (instance.is_published and instance.is_approved) or indexed:
+        enqueue('core.tasks.refresh_similar', 'insights.related.insight_similarity', instance.pk, unique=True)
+
+
+@receiver(pre_delete, sender=InsightPost)
+def remember_similar_lists(sender, instance, **kwargs):
+    """Note which recommendation lists include a post about to be deleted."""
+    instance._listed_in = list(
+        RelatedInsight.objects.filter(related=instance).values_list('insight_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=InsightPost)
+def refill_similar_lists(sender, instance, **kwargs):
+    """Drop a deleted post from the similarity index and refill the lists that lost it."""
+    listed_in = getattr(instance, '_listed_in', [])
+    if listed_in or (instance.is_published and instance.is_approved):
+        enqueue('core.tasks.refill_similar', 'insights.related.insight_similarity', listed_in, [instance.pk])
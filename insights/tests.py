@@ -1,3 +1,227 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from books.models import BookReview
+from core.models import Job, SimilarityTerm
+from insights.models import InsightPost, RelatedInsight, UploadedImage
+from insights.related import insight_similarity
+from insights.search import insight_index
 
-# Create your tests here.
+REFRESH_TASK = 'core.tasks.refresh_similar'
+
+
+@override_settings(JOB_QUEUE_EAGER=True)
+class SimilarInsightTests(TestCase):
+    """insight_detail reads its recommendations from RelatedInsight, kept current per saved post"""
+
+    texts = [
+        'Masquerade festival in Enugu with dancers and drummers',
+        'Dancers and drummers at the masquerade festival',
+        'Yam harvest and farming in the rainy season',
+        'Farming yam for the new yam harvest festival',
+        'Pottery made by women in Ishiagu villages',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('writer', 'writer@example.com', 'password')
+
+    def setUp(self):
+        self.posts = [self.publish(f'p{i}', text) for i, text in enumerate(self.texts)]
+
+    def publish(self, slug, text):
+        # A slug-like title shares no words with the other posts
+        return InsightPost.objects.create(
+            title=slug, slug=slug, author=self.user, content_json=f'<p>{text}</p>',
+            is_published=True, is_approved=True,
+        )
+
+    def related(self, post):
+        return list(RelatedInsight.objects.filter(insight=post).values_list('related_id', flat=True))
+
+    def lists(self):
+        return {post.pk: self.related(post) for post in self.posts}
+
+    def assertMatchesRebuild(self):
+        live = self.lists()
+        insight_similarity.rebuild()
+        self.assertEqual(live, self.lists())
+
+    def test_lists(self):
+        masquerade, dancers, yam, farming, pottery = self.posts
+        self.assertEqual(self.related(masquerade)[0], dancers.pk)
+        self.assertEqual(self.related(yam)[0], farming.pk)
+        self.assertEqual(self.related(pottery), [])
+        self.assertMatchesRebuild()
+
+    def test_edit_moves_post_between_lists(self):
+        masquerade, dancers, yam, farming, pottery = self.posts
+        dancers.content_json = '<p>Pottery from Ishiagu, made by the women of the villages</p>'
+        dancers.save()
+        self.assertEqual(self.related(pottery), [dancers.pk])
+        self.assertNotIn(dancers.pk, self.related(masquerade))
+        self.assertMatchesRebuild()
+
+    def test_unpublish_and_delete(self):
+        masquerade, dancers, yam, farming, pottery = self.posts
+        dancers.is_published = False
+        dancers.save()
+        self.assertFalse(RelatedInsight.objects.filter(related=dancers).exists())
+        self.assertFalse(insight_similarity.terms().filter(object_id=dancers.pk).exists())
+
+        farming.delete()
+        self.posts.remove(farming)
+        self.posts.remove(dancers)
+        self.assertFalse(insight_similarity.terms().filter(object_id=farming.pk).exists())
+        self.assertMatchesRebuild()
+
+    def test_refresh_does_not_revectorise_the_corpus(self):
+        post = self.posts[0]
+        post.title = 'Masquerade dancers'
+        with mock.patch.object(insight_similarity, 'vectors', side_effect=AssertionError('full re-vectorisation')):
+            post.save()
+        self.assertEqual(SimilarityTerm.objects.filter(object_id=post.pk, term='dancers').count(), 1)
+
+    def test_first_refresh_builds_the_index(self):
+        SimilarityTerm.objects.all().delete()
+        RelatedInsight.objects.all().delete()
+        insight_similarity.refresh(self.posts[0].pk)
+        self.assertTrue(self.related(self.posts[2]))
+        self.assertMatchesRebuild()
+
+
+@override_settings(JOB_QUEUE_EAGER=False)
+class SimilarityJobTests(TestCase):
+    """Only saves that change the compared text or visibility queue a rescore"""
+
+    def jobs(self):
+        return Job.objects.filter(task=REFRESH_TASK).count()
+
+    def test_queued_on_relevant_changes(self):
+        user = get_user_model().objects.create_user('writer', 'writer@example.com', 'password')
+        post = InsightPost.objects.create(
+            title='T', slug='t', author=user, content_json='<p>x</p>', is_published=True, is_approved=True,
+        )
+        self.assertEqual(self.jobs(), 1)
+        Job.objects.all().delete()
+
+        post = InsightPost.objects.get(pk=post.pk)
+        post.posted_to_social = True
+        post.save()
+        post.save(update_fields=['posted_to_social'])
+        self.assertEqual(self.jobs(), 0)
+
+        post.title = 'New'
+        post.save()
+        post.content_json = '<p>y</p>'
+        post.save(update_fields=['content_json'])
+        # Both changes are covered by the one waiting job
+        self.assertEqual(self.jobs(), 1)
+
+    def test_unpublishing_an_indexed_post_is_queued(self):
+        user = get_user_model().objects.create_user('writer', 'writer@example.com', 'password')
+        post = InsightPost.objects.create(title='T', slug='t', author=user, content_json='<p>x</p>')
+        self.assertEqual(self.jobs(), 0)
+        SimilarityTerm.objects.create(index=insight_similarity.name, object_id=post.pk, term='x', weight=1.0)
+        post.title = 'Hidden'
+        post.save()
+        self.assertEqual(self.jobs(), 1)
+
+
+class InsightApiTests(TestCase):
+    """/api/v1/insights/ serves published posts only"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user('writer', 'writer@example.com', 'password')
+        post = InsightPost.objects.create(
+            title='Published', slug='published', author=user, content_json={'blocks': []},
+            is_published=True, is_approved=True,
+        )
+        post.tags.add('igbo')
+        InsightPost.objects.create(title='Draft', slug='draft', author=user, content_json={'blocks': []})
+
+    def test_api(self):
+        data = self.client.get('/api/v1/insights/published/?fields=slug,content,tags').json()
+        self.assertEqual(data, {'slug': 'published', 'content': {'blocks': []}, 'tags': ['igbo']})
+        self.assertEqual(self.client.get('/api/v1/insights/draft/').status_code, 404)
+        results = self.client.get('/api/v1/insights/?tag=igbo').json()['results']
+        self.assertEqual([item['slug'] for item in results], ['published'])
+
+
+class DeleteOldDraftsTests(TestCase):
+    """delete_old_drafts removes stale drafts in batches, with the media files no other row uses"""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        settings_override = override_settings(MEDIA_ROOT=self.media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = get_user_model().objects.create_user('writer', 'writer@example.com', 'password')
+
+    def draft(self, slug, **kwargs):
+        return InsightPost.objects.create(title=slug, slug=slug, author=self.user, content_json='<p>x</p>', **kwargs)
+
+    def files(self):
+        return sorted(name for _root, _dirs, names in os.walk(self.media) for name in names)
+
+    def test_purge(self):
+        for i in range(5):
+            self.draft(f't{i}').featured_image.save(f'f{i}.jpg', ContentFile(b'x'))
+        post = InsightPost.objects.get(slug='t4')
+        upload = UploadedImage(insight=post, caption='c', description='d', alt_text='a')
+        upload.image.save('u.jpg', ContentFile(b'x'))
+        # A published post sharing a draft's image keeps the file
+        shared = self.draft('shared', is_published=True, is_approved=True, featured_image=post.featured_image.name)
+        pending = self.draft('pending', pending_approval=True)
+        BookReview.objects.create(
+            book_title='b', author='x', review_title='r', slug='r', rating=3, reviewer=self.user, content_json='<p>x</p>',
+        )
+        InsightPost.objects.update(updated_at=timezone.now() - timedelta(days=40))
+        BookReview.objects.update(updated_at=timezone.now() - timedelta(days=40))
+
+        call_command('delete_old_drafts', '--dry-run', stdout=StringIO())
+        self.assertEqual(InsightPost.objects.count(), 7)
+        out = StringIO()
+        call_command('delete_old_drafts', '--batch-size', '2', '--max-rate', '1000', stdout=out)
+        self.assertIn('Deleted 5 insight draft(s) and 5 media file(s)', out.getvalue())
+        self.assertEqual(set(InsightPost.objects.all()), {shared, pending})
+        self.assertFalse(BookReview.objects.exists())
+        self.assertEqual(self.files(), [os.path.basename(shared.featured_image.name)])
+
+    def test_recent_drafts_are_kept(self):
+        self.draft('recent')
+        call_command('delete_old_drafts', stdout=StringIO())
+        self.assertTrue(InsightPost.objects.filter(slug='recent').exists())
+
+
+@skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'Needs a full-text backend')
+class InsightSearchTests(TestCase):
+    """Insight search matches Igbo text with or without diacritics, in titles and Editor.js blocks"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user('writer', 'writer@example.com', 'password')
+        cls.post = InsightPost.objects.create(
+            title='Ụlọ Ọnịcha', slug='ulo', author=user, is_published=True, is_approved=True,
+            content_json={'blocks': [
+                {'type': 'paragraph', 'data': {'text': 'The <b>Ọbị</b> of the palace &amp; more'}},
+                {'type': 'list', 'data': {'items': ['ịgba egwu']}},
+            ]},
+        )
+
+    def test_search(self):
+        for query in ['ulo', 'obi palace', 'igba', 'Ọbị']:
+            self.assertEqual(list(insight_index.search(InsightPost.objects.all(), query)), [self.post], query)
+        self.assertEqual(list(insight_index.search(InsightPost.objects.all(), 'amp')), [])
+        self.assertContains(self.client.get('/insights/', {'search': 'onicha'}), 'Ọnịcha')
@@ -3,46 +3,59 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
 from .models import InsightPost, EditSuggestion
+from .search import insight_index
 from archives.models import Archive
 from django.core.paginator import Paginator
+from core.counters import VIEW_SORTS, record_view
+from core.pagination import keyset_paginate
+from core.similarity import SIMILAR_LIMIT
+from core.tags import sync_tags, top_tags
 from django.utils.text import slugify
 import json
 import re
 
 def insight_list(request):
-    from taggit.models import Tag
-    
     insights = InsightPost.objects.filter(is_published=True, is_approved=True)
     
-    search = request.GET.get('search')
-    if search:
-        insights = insights.filter(title__icontains=search)
-    
     tag = request.GET.get('tag')
     if tag:
         insights = insights.filter(tags__name=tag)
     
-    sort = request.GET.get('sort', '-created_at')
-    insights = insights.order_by(sort)
-    
-    paginator = Paginator(insights, 12)
-    page = request.GET.get('page')
-    posts = paginator.get_page(page)
+    # Ranked, diacritic-insensitive search; best matches first unless a sort is chosen
+    search = request.GET.get('search')
+    sort = request.GET.get('sort') or ('relevance' if search else '-created_at')
+    if search:
+        insights = insight_index.search(insights, search)
+    if sort in VIEW_SORTS:
+        insights = insights.order_by(*VIEW_SORTS[sort])
+    elif sort != 'relevance':
+        insights = insights.order_by(sort)
+    elif not search:
+        insights = insights.order_by('-created_at')
     
-    tags = Tag.objects.filter(insightpost__isnull=False).distinct()
+    # Date-ordered grids scroll by cursor; other sorts keep numbered pages
+    if sort in ('-created_at', 'created_at'):
+        posts = keyset_paginate(
+            insights, request.GET.get('cursor'), 12,
+            descending=sort == '-created_at', querydict=request.GET
+        )
+    else:
+        paginator = Paginator(insights, 12)
+        page = request.GET.get('page')
+        posts = paginator.get_page(page)
     
-    context = {
-        'posts': posts,
-        'tags': tags
-    }
+    context = {'posts': posts}
     
+    # The grid partial has no tag filter, so skip the tag query for HTMX swaps
     if request.htmx:
         return render(request, 'insights/partials/insight_grid.html', context)
     
+    context['tags'] = top_tags(InsightPost)
     return render(request, 'insights/list.html', context)
 
 def insight_detail(request, slug):
     insight = get_object_or_404(InsightPost, slug=slug, is_published=True, is_approved=True)
+    record_view(request, insight)
     
     # Get previous and next insights
     previous_insight = InsightPost.objects.filter(
@@ -57,32 +70,17 @@ def insight_detail(request, slug):
         created_at__gt=insight.created_at
     ).order_by('created_at').first()
     
-    # Get recommended insights (9 total: same tags, same author, or recent)
-    recommended = InsightPost.objects.filter(
-        is_published=True,
-        is_approved=True
-    ).exclude(slug=insight.slug)
-    
-    tag_names = insight.tags.values_list('name', flat=True)
-    if tag_names:
-        recommended = recommended.filter(tags__name__in=tag_names).distinct()
-    
-    # If we need more, add by author
-    if recommended.count() < 9:
-        recommended = InsightPost.objects.filter(
-            is_published=True,
-            is_approved=True,
-            author=insight.author
-        ).exclude(slug=insight.slug)
-    
-    # If still need more, add recent
-    if recommended.count() < 9:
-        recommended = InsightPost.objects.filter(
-            is_published=True,
-            is_approved=True
-        ).exclude(slug=insight.slug).order_by('-created_at')
-    
-    recommended = recommended[:9]
+    # Get recommended insights (9 total) from the precomputed text-similarity
+    # table, topped up with the newest insights when it has fewer entries
+    published = InsightPost.objects.filter(is_published=True, is_approved=True).select_related('author')
+    recommended = list(
+        published.filter(recommended_in__insight=insight).order_by('-recommended_in__score')[:SIMILAR_LIMIT]
+    )
+    if len(recommended) < SIMILAR_LIMIT:
+        recommended += list(
+            published.exclude(pk__in=[insight.pk] + [item.pk for item in recommended])
+            .order_by('-created_at')[:SIMILAR_LIMIT - len(recommended)]
+        )
     
     context = {
         'insight': insight,
@@ -204,11 +202,7 @@ def insight_create(request):
                 # For now, we'll just note it in a comment
                 pass
         
-        # Add tags
-        tags = request.POST.get('tags', '').split(',')
-        for tag in tags:
-            if tag.strip():
-                insight.tags.add(tag.strip())
+        sync_tags(insight, request.POST.get('tags', ''))
         
         insight.save()
         
@@ -247,12 +241,7 @@ def insight_edit(request, slug):
         if request.FILES.get('featured_image'):
             insight.featured_image = request.FILES['featured_image']
         
-        # Clear existing tags and add new ones
-        insight.tags.clear()
-        tags = request.POST.get('tags', '').split(',')
-        for tag in tags:
-            if tag.strip():
-                insight.tags.add(tag.strip())
+        sync_tags(insight, request.POST.get('tags', ''))
         
         insight.save()
         return redirect('users:dashboard')
@@ -5,6 +5,9 @@ from insights.models import InsightPost
 from books.models import BookReview
 from core.notifications_utils import send_post_approved_notification, send_post_rejected_notification
 from django.utils import timezone
+from django.urls import reverse
+from django.conf import settings
+from core.jobs import enqueue
 
 
 @staff_member_required
@@ -34,6 +37,10 @@ def approve_insight(request, pk):
     # Send notification to author
     send_post_approved_notification(post, 'insight')
     
+    # Ask search engines to crawl the new page
+    if settings.INDEXNOW_API_KEY:
+        enqueue('core.tasks.submit_to_indexnow', request.build_absolute_uri(reverse('insights:detail', args=[post.slug])))
+    
     messages.success(request, f'Insight "{post.title}" has been approved and published.')
     return redirect('users:moderation_dashboard')
 
@@ -72,6 +79,10 @@ def approve_book_review(request, pk):
     # Send notification to reviewer
     send_post_approved_notification(review, 'book review')
     
+    # Ask search engines to crawl the new page
+    if settings.INDEXNOW_API_KEY:
+        enqueue('core.tasks.submit_to_indexnow', request.build_absolute_uri(reverse('books:detail', args=[review.slug])))
+    
     messages.success(request, f'Book review "{review.review_title}" has been approved and published.')
     return redirect('users:moderation_dashboard')
 
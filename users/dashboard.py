@@ -0,0 +1,136 @@
+"""
+Contributor dashboard
+The dashboard page itself only shows a per-user summary (counts and the
+newest item of each section), cached until one of the user's archives,
+posts, reviews, suggestions or message threads changes (see users/signals.py).
+Each tab's list is a separate HTMX panel, loaded when the tab is opened and
+keyset-paginated, so prolific contributors cost no more than new ones.
+"""
+from django.core.cache import cache
+from django.db.models import Q
+from django.urls import reverse
+from core.pagination import keyset_paginate
+from .messaging import annotate_threads, attach_last_messages
+
+SUMMARY_TIMEOUT = 60 * 60
+PANEL_SIZE = 10
+
+
+class Panel:
+    """One dashboard tab: the user's rows it lists and how to page through them"""
+
+    def __init__(self, name, label, queryset, title, url, order_field='created_at', prepare=None):
+        self.name = name
+        self.label = label
+        self.queryset = queryset
+        self.title = title
+        self.url = url
+        self.order_field = order_field
+        self.prepare = prepare
+
+    @property
+    def template(self):
+        return f'users/partials/dashboard_{self.name}.html'
+
+    def page(self, user, cursor=None, querydict=None):
+        page = keyset_paginate(
+            self.queryset(user), cursor, PANEL_SIZE, querydict=querydict, field=self.order_field
+        )
+        if self.prepare:
+            page.object_list = self.prepare(page.object_list)
+        return page
+
+    def latest(self, user):
+        """Title and URL of the newest row, or None"""
+        obj = self.queryset(user).order_by(f'-{self.order_field}', '-pk').first()
+        return {'title': self.title(obj), 'url': self.url(obj)} if obj else None
+
+
+def _insights(user):
+    from insights.models import InsightPost
+    return InsightPost.objects.filter(Q(is_published=True) | Q(pending_approval=True), author=user)
+
+
+def _drafts(user):
+    from insights.models import InsightPost
+    return InsightPost.objects.filter(author=user, is_published=False, pending_approval=False)
+
+
+def _reviews(user):
+    from books.models import BookReview
+    return BookReview.objects.filter(reviewer=user)
+
+
+def _archives(user):
+    from archives.models import Archive
+    return Archive.objects.filter(uploaded_by=user).select_related('category')
+
+
+def _suggestions(user):
+    from insights.models import EditSuggestion
+    return EditSuggestion.objects.filter(
+        post__author=user, is_approved=False, is_rejected=False
+    ).select_related('post', 'suggested_by')
+
+
+PANELS = {panel.name: panel for panel in (
+    Panel(
+        'messages', 'My Messages',
+        lambda user: annotate_threads(user.message_threads.all(), user),
+        title=lambda thread: thread.subject,
+        url=lambda thread: reverse('users:thread', args=[thread.pk]),
+        order_field='updated_at',
+        prepare=attach_last_messages,
+    ),
+    Panel(
+        'insights', 'My Insights', _insights,
+        title=lambda post: post.title,
+        url=lambda post: reverse('insights:detail', args=[post.slug]),
+    ),
+    Panel(
+        'drafts', 'My Drafts', _drafts,
+        title=lambda post: post.title,
+        url=lambda post: reverse('insights:edit', args=[post.slug]),
+        order_field='updated_at',
+    ),
+    Panel(
+        'reviews', 'My Book Reviews', _reviews,
+        title=lambda review: review.review_title,
+        url=lambda review: reverse('books:detail', args=[review.slug]),
+    ),
+    Panel(
+        'archives', 'My Archives', _archives,
+        title=lambda archive: archive.title,
+        url=lambda archive: reverse('archives:detail', args=[archive.pk]),
+    ),
+    Panel(
+        'suggestions', 'Edit Suggestions', _suggestions,
+        title=lambda suggestion: suggestion.post.title,
+        url=lambda suggestion: reverse('insights:detail', args=[suggestion.post.slug]),
+    ),
+)}
+
+
+def _summary_key(user_id):
+    return f'dashboard-summary:{user_id}'
+
+
+def dashboard_summary(user):
+    """{panel name: {'count', 'latest'}} for `user` (cached)"""
+    key = _summary_key(user.pk)
+    summary = cache.get(key)
+    if summary is None:
+        summary = {}
+        for name, panel in PANELS.items():
+            latest = panel.latest(user)
+            summary[name] = {
+                'count': panel.queryset(user).count() if latest else 0,
+                'latest': latest,
+            }
+        cache.set(key, summary, SUMMARY_TIMEOUT)
+    return summary
+
+
+def invalidate_summary(*user_ids):
+    """Drop the cached summaries of the given users"""
+    cache.delete_many([_summary_key(user_id) for user_id in user_ids if user_id])
@@ -0,0 +1,122 @@
+"""
+Private message threads
+The inbox is one annotated query over the user's threads: the latest
+message id and the user's unread count come from subqueries, participants
+are prefetched and the latest messages are fetched together, so listing
+fifty threads costs the same as listing one.
+
+Each participant has a ThreadReadState row whose last_read_at watermark
+marks what they have read: messages from others created after it are
+unread. Its unread_count caches how many there are. The count is recounted
+from the watermark, never incremented, whenever a message is sent
+(users/signals.py) or the thread is opened. A message racing with either
+update is therefore still counted by whichever runs last.
+
+A thread page shows its latest THREAD_PAGE_SIZE messages and loads older
+ones by (created_at, id) cursor as the reader scrolls up. Opening a thread
+moves the reader's watermark to the newest message shown, with a
+single-row UPDATE however long the conversation is.
+"""
+from datetime import datetime, timezone as dt_timezone
+from django.db.models import Count, DateTimeField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from core.pagination import keyset_paginate
+from .models import Message, ThreadReadState
+
+THREAD_PAGE_SIZE = 30
+NEVER_READ = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def annotate_threads(threads, user):
+    """Add `last_message_id` and the user's `unread` count to a Thread queryset"""
+    latest = Message.objects.filter(thread=OuterRef('pk')).order_by('-created_at', '-pk')
+    unread = ThreadReadState.objects.filter(thread=OuterRef('pk'), user=user)
+    return threads.annotate(
+        last_message_id=Subquery(latest.values('pk')[:1]),
+        unread=Coalesce(Subquery(unread.values('unread_count')[:1]), 0),
+    ).prefetch_related('participants')
+
+
+def attach_last_messages(threads):
+    """Set `last_message` on annotated threads with a single query"""
+    threads = list(threads)
+    ids = [thread.last_message_id for thread in threads if thread.last_message_id]
+    messages = Message.objects.select_related('sender').in_bulk(ids)
+    for thread in threads:
+        thread.last_message = messages.get(thread.last_message_id)
+    return threads
+
+
+def inbox_threads(user):
+    """The user's threads, most recently active first, ready for the inbox template"""
+    return attach_last_messages(annotate_threads(user.message_threads.order_by('-updated_at'), user))
+
+
+def add_participants(thread, user_ids):
+    """Create read-state rows for new participants"""
+    ThreadReadState.objects.bulk_create(
+        [ThreadReadState(thread=thread, user_id=user_id) for user_id in user_ids],
+        ignore_conflicts=True,
+    )
+
+
+def unread_since(since=None):
+    """
+    The number of messages in a ThreadReadState row's thread sent by others
+    after `since`, or after the row's own watermark if `since` is None; for
+    use in an UPDATE of ThreadReadState.
+    """
+    if since is None:
+        since = Coalesce(OuterRef('last_read_at'), Value(NEVER_READ), output_field=DateTimeField())
+    newer = (
+        Message.objects.filter(thread=OuterRef('thread'), created_at__gt=since)
+        .exclude(sender=OuterRef('user'))
+        .order_by()
+        .values('thread')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(newer), 0)
+
+
+def record_message(message):
+    """Recount the unread messages of every participant but the sender"""
+    add_participants(message.thread, message.thread.participants.values_list('id', flat=True))
+    ThreadReadState.objects.filter(thread_id=message.thread_id).exclude(user_id=message.sender_id).update(
+        unread_count=unread_since()
+    )
+
+
+def thread_messages(thread, cursor=None):
+    """
+    A KeysetPage of `thread`'s messages, newest first, starting before
+    `cursor`; `object_list` is put back in chronological order for display.
+    """
+    page = keyset_paginate(thread.messages.select_related('sender'), cursor, THREAD_PAGE_SIZE)
+    page.object_list.reverse()
+    return page
+
+
+def mark_thread_read(thread, user, until=None):
+    """
+    Move the user's watermark in `thread` forward to `until` (now by default)
+    and recount what is left unread after it: normally nothing, but a message
+    sent since the page was rendered stays unread.
+    """
+    until = until or timezone.now()
+    states = ThreadReadState.objects.filter(thread=thread, user=user)
+    # A page rendered earlier (another tab) never moves the watermark back
+    updated = states.filter(Q(last_read_at__isnull=True) | Q(last_read_at__lt=until)).update(
+        last_read_at=until, unread_count=unread_since(until)
+    )
+    if not updated and not states.exists():
+        unread = thread.messages.filter(created_at__gt=until).exclude(sender=user).count()
+        ThreadReadState.objects.create(thread=thread, user=user, last_read_at=until, unread_count=unread)
+
+
+def unread_message_count(user):
+    """Unread messages across all of the user's threads"""
+    return ThreadReadState.objects.filter(user=user, unread_count__gt=0).aggregate(
+        total=Coalesce(Sum('unread_count'), 0)
+    )['total']
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_read_states(apps, schema_editor):
+    Thread = apps.get_model('users', 'Thread')
+    Message = apps.get_model('users', 'Message')
+    ThreadReadState = apps.get_model('users', 'ThreadReadState')
+    states = []
+    for thread in Thread.objects.prefetch_related('participants').iterator(chunk_size=200):
+        for user in thread.participants.all():
+            # The watermark is the newest message from others already marked read
+            received = Message.objects.filter(thread=thread).exclude(sender=user)
+            last_read = received.filter(is_read=True).order_by('-created_at').first()
+            last_read_at = last_read.created_at if last_read else None
+            unread = received.filter(created_at__gt=last_read_at).count() if last_read_at else received.count()
+            states.append(ThreadReadState(thread=thread, user=user, unread_count=unread, last_read_at=last_read_at))
+    ThreadReadState.objects.bulk_create(states, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_thread_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThreadReadState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('last_read_at', models.DateTimeField(blank=True, null=True)),
+                ('thread', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_states', to='users.thread')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='thread_read_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('unread_count__gt', 0)), fields=['user'], name='thread_unread_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='threadreadstate',
+            constraint=models.UniqueConstraint(fields=('thread', 'user'), name='unique_thread_read_state'),
+        ),
+        migrations.RunPython(create_read_states, migrations.RunPython.noop),
+    ]
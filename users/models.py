@@ -30,10 +30,36 @@ class Message(models.Model):
     sender = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
-    is_read = models.BooleanField(default=False)
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Thread pages: the latest messages, then older ones by (created_at, id) cursor
+            models.Index(fields=['thread', 'created_at', 'id'], name='message_thread_idx'),
+        ]
     
     def __str__(self) -> str:
         return f"Message from {self.sender.get_display_name()} in {self.thread.subject}"
+
+class ThreadReadState(models.Model):
+    """
+    What a participant has read in a thread. Messages from others created
+    after last_read_at are unread; unread_count caches how many there are
+    (see users/messaging.py).
+    """
+    thread = models.ForeignKey(Thread, on_delete=models.CASCADE, related_name='read_states')
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='thread_read_states')
+    unread_count = models.PositiveIntegerField(default=0)
+    last_read_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['thread', 'user'], name='unique_thread_read_state'),
+        ]
+        indexes = [
+            # Navbar badge: the user's threads with unread messages
+            models.Index(fields=['user'], condition=models.Q(unread_count__gt=0), name='thread_unread_idx'),
+        ]
+    
+    def __str__(self) -> str:
+        return f"{self.user} in {self.thread}: {self.unread_count} unread"
@@ -1,12 +1,36 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from notifications.signals import notify
-from .models import Message
+from archives.models import Archive
+from books.models import BookReview
+from core.notifications_utils import queue_notification
+from insights.models import EditSuggestion, InsightPost
+from .dashboard import invalidate_summary
+from .messaging import add_participants, record_message
+from .models import Message, Thread
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+@receiver(post_save, sender=Message)
+def count_unread_message(sender, instance, created, **kwargs):
+    """Add a new message to the other participants' unread counts."""
+    if created:
+        record_message(instance)
+
+
+@receiver(m2m_changed, sender=Thread.participants.through)
+def create_thread_read_states(sender, instance, action, reverse, pk_set=None, **kwargs):
+    """Give people added to a thread an unread counter."""
+    if action != 'post_add' or not pk_set:
+        return
+    if reverse:
+        for thread in Thread.objects.filter(pk__in=pk_set):
+            add_participants(thread, [instance.pk])
+    else:
+        add_participants(instance, pk_set)
+
+
 @receiver(post_save, sender=Message)
 def notify_message_recipient(sender, instance, created, **kwargs):
     """
@@ -18,14 +42,59 @@ def notify_message_recipient(sender, instance, created, **kwargs):
         
         for recipient in recipients:
             try:
-                # Send in-app notification
-                notify.send(
+                # Queue in-app notification
+                queue_notification(
                     sender=instance.sender,
                     recipient=recipient,
                     verb='sent you a message',
                     target=instance.thread,
                     description=f'{instance.sender.username} sent you a message in "{instance.thread.subject}"'
                 )
-                logger.info(f"Message notification sent to {recipient.username}")
+                logger.info(f"Message notification queued for {recipient.username}")
             except Exception as e:
                 logger.error(f"Error sending message notification: {str(e)}")
+
+
+@receiver(post_save, sender=Archive)
+@receiver(post_delete, sender=Archive)
+def refresh_uploader_dashboard(sender, instance, **kwargs):
+    """Drop the uploader's cached dashboard summary."""
+    invalidate_summary(instance.uploaded_by_id)
+
+
+@receiver(post_save, sender=InsightPost)
+@receiver(post_delete, sender=InsightPost)
+def refresh_author_dashboard(sender, instance, **kwargs):
+    """Drop the author's cached dashboard summary."""
+    invalidate_summary(instance.author_id)
+
+
+@receiver(post_save, sender=BookReview)
+@receiver(post_delete, sender=BookReview)
+def refresh_reviewer_dashboard(sender, instance, **kwargs):
+    """Drop the reviewer's cached dashboard summary."""
+    invalidate_summary(instance.reviewer_id)
+
+
+@receiver(post_save, sender=EditSuggestion)
+@receiver(post_delete, sender=EditSuggestion)
+def refresh_post_author_dashboard(sender, instance, **kwargs):
+    """Drop the post author's cached dashboard summary."""
+    invalidate_summary(*InsightPost.objects.filter(pk=instance.post_id).values_list('author_id', flat=True))
+
+
+@receiver(post_save, sender=Message)
+def refresh_participant_dashboards(sender, instance, **kwargs):
+    """Drop the cached summaries of everyone in a thread with a new message."""
+    invalidate_summary(*instance.thread.participants.values_list('id', flat=True))
+
+
+@receiver(m2m_changed, sender=Thread.participants.through)
+def refresh_dashboards_on_participants(sender, instance, action, pk_set=None, **kwargs):
+    """Drop cached summaries when people join or leave a thread."""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if isinstance(instance, Thread):
+        invalidate_summary(*(pk_set or instance.participants.values_list('id', flat=True)))
+    else:
+        invalidate_summary(instance.pk)
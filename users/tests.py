@@ -1,3 +1,150 @@
-from django.test import TestCase
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from archives.models import Archive
+from insights.models import InsightPost
+from users.dashboard import PANEL_SIZE, dashboard_summary
+from users.messaging import THREAD_PAGE_SIZE, mark_thread_read, unread_message_count
+from users.models import Message, Thread, ThreadReadState
 
-# Create your tests here.
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class DashboardTests(TestCase):
+    """The dashboard renders from a cached summary and loads each tab as its own panel"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('member', 'member@example.com', 'password')
+        for i in range(PANEL_SIZE + 3):
+            Archive.objects.create(title=f'a{i}', description='d', archive_type='video', uploaded_by=self.user)
+        InsightPost.objects.create(title='Draft', slug='draft', author=self.user, content_json='<p>x</p>')
+        self.client.force_login(self.user)
+
+    def test_summary_is_cached(self):
+        response = self.client.get('/profile/dashboard/')
+        self.assertContains(response, 'Latest archive')
+        # Session, user, and the notification and message badges
+        with self.assertNumQueries(4):
+            self.client.get('/profile/dashboard/')
+        self.assertEqual(dashboard_summary(self.user)['drafts']['count'], 1)
+
+    def test_summary_follows_changes(self):
+        self.assertEqual(dashboard_summary(self.user)['archives']['count'], PANEL_SIZE + 3)
+        Archive.objects.first().delete()
+        self.assertEqual(dashboard_summary(self.user)['archives']['count'], PANEL_SIZE + 2)
+        InsightPost.objects.create(title='Second', slug='second', author=self.user, content_json='<p>x</p>')
+        self.assertEqual(dashboard_summary(self.user)['drafts']['count'], 2)
+
+    def test_panels(self):
+        response = self.client.get('/profile/dashboard/archives/')
+        self.assertEqual(len(response.context['page']), PANEL_SIZE)
+        self.assertContains(response, 'Loading more')
+        response = self.client.get('/profile/dashboard/archives/?' + response.context['page'].next_querystring)
+        self.assertEqual(len(response.context['page']), 3)
+        # Later pages append rows without the panel wrapper
+        self.assertNotContains(response, 'class="row"')
+        for name in ('messages', 'insights', 'drafts', 'reviews', 'suggestions'):
+            self.assertEqual(self.client.get(f'/profile/dashboard/{name}/').status_code, 200, name)
+        self.assertEqual(self.client.get('/profile/dashboard/nope/').status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get('/profile/dashboard/archives/').status_code, 302)
+
+
+class InboxTests(TestCase):
+    """The inbox annotates each thread in a fixed number of queries and keeps unread counts per reader"""
+
+    def setUp(self):
+        users = get_user_model().objects
+        self.reader = users.create_user('reader', 'reader@example.com', 'password')
+        self.sender = users.create_user('sender', 'sender@example.com', 'password')
+        self.client.force_login(self.reader)
+
+    def start_threads(self, count):
+        for i in range(count):
+            thread = Thread.objects.create(subject=f's{i}')
+            thread.participants.add(self.reader, self.sender)
+            Message.objects.create(thread=thread, sender=self.sender, content=f'hello {i}')
+            Message.objects.create(thread=thread, sender=self.sender, content=f'latest {i}')
+
+    def test_inbox(self):
+        self.start_threads(2)
+        self.assertEqual((unread_message_count(self.reader), unread_message_count(self.sender)), (4, 0))
+        response = self.client.get('/profile/messages/')
+        self.assertContains(response, 'latest 1')
+        self.assertContains(response, '2 new')
+        with self.assertNumQueries(7):
+            self.client.get('/profile/messages/')
+        self.start_threads(20)
+        with self.assertNumQueries(7):
+            self.client.get('/profile/messages/')
+
+    def test_counts_follow_reads_and_replies(self):
+        self.start_threads(3)
+        thread = Thread.objects.first()
+        self.client.get(f'/profile/messages/{thread.pk}/')
+        self.assertEqual(ThreadReadState.objects.get(thread=thread, user=self.reader).unread_count, 0)
+        self.assertEqual(unread_message_count(self.reader), 4)
+        self.client.post('/profile/messages/compose/sender/', {'subject': 'x', 'content': 'hi'})
+        self.assertEqual(unread_message_count(self.sender), 1)
+        self.assertEqual(self.client.get('/profile/dashboard/messages/').status_code, 200)
+
+
+class MessageThreadTests(TestCase):
+    """Threads open on the newest page, load older messages on scroll and mark reads by watermark"""
+
+    def setUp(self):
+        users = get_user_model().objects
+        self.reader = users.create_user('reader', 'reader@example.com', 'password')
+        self.sender = users.create_user('sender', 'sender@example.com', 'password')
+        self.thread = Thread.objects.create(subject='s')
+        self.thread.participants.add(self.reader, self.sender)
+        self.client.force_login(self.reader)
+
+    def send(self, content, sender=None):
+        return Message.objects.create(thread=self.thread, sender=sender or self.sender, content=content)
+
+    def test_pages(self):
+        total = THREAD_PAGE_SIZE * 2 + 5
+        for i in range(total):
+            self.send(f'msg-{i:03d}-end')
+        self.assertEqual(unread_message_count(self.reader), total)
+        url = f'/profile/messages/{self.thread.pk}/'
+        with self.assertNumQueries(7):
+            response = self.client.get(url)
+        self.assertContains(response, f'msg-{total - 1:03d}-end')
+        self.assertContains(response, f'msg-{total - THREAD_PAGE_SIZE:03d}-end')
+        self.assertNotContains(response, f'msg-{total - THREAD_PAGE_SIZE - 1:03d}-end')
+        self.assertContains(response, 'Loading older')
+        self.assertEqual(unread_message_count(self.reader), 0)
+        self.assertEqual(
+            ThreadReadState.objects.get(thread=self.thread, user=self.reader).last_read_at,
+            Message.objects.latest('created_at', 'pk').created_at,
+        )
+
+        older = self.client.get(f'{url}?{response.context["page"].next_querystring}', HTTP_HX_REQUEST='true')
+        self.assertContains(older, 'msg-005-end')
+        self.assertNotContains(older, f'msg-{total - THREAD_PAGE_SIZE:03d}-end')
+        self.assertNotContains(older, 'Reply')
+        oldest = self.client.get(f'{url}?{older.context["page"].next_querystring}', HTTP_HX_REQUEST='true')
+        self.assertNotContains(oldest, 'Loading older')
+        content = oldest.content.decode()
+        self.assertLess(content.index('msg-000'), content.index('msg-004'))
+
+    def test_read_watermark(self):
+        first = self.send('1')
+        # Arrives after the page was rendered
+        second = self.send('2')
+        self.send('mine', sender=self.reader)
+        self.assertEqual(unread_message_count(self.reader), 2)
+        mark_thread_read(self.thread, self.reader, first.created_at)
+        self.assertEqual(unread_message_count(self.reader), 1)
+        # An older watermark never moves the read state back
+        mark_thread_read(self.thread, self.reader, first.created_at - timedelta(seconds=1))
+        self.assertEqual(unread_message_count(self.reader), 1)
+        mark_thread_read(self.thread, self.reader, second.created_at)
+        self.assertEqual((unread_message_count(self.reader), unread_message_count(self.sender)), (0, 1))
+
+        ThreadReadState.objects.all().delete()
+        mark_thread_read(self.thread, self.reader, first.created_at)
+        self.assertEqual(unread_message_count(self.reader), 1)
@@ -7,6 +7,7 @@ app_name = 'users'
 
 urlpatterns = [
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/<str:panel>/', views.dashboard_panel, name='dashboard_panel'),
     path('delete-account/', views.delete_account, name='delete_account'),
     path('messages/', views.message_inbox, name='inbox'),
     path('messages/<int:thread_id>/', views.message_thread, name='thread'),
@@ -1,61 +1,31 @@
+from django.http import Http404
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
 from .models import Thread, Message
+from .dashboard import PANELS, dashboard_summary
+from .messaging import inbox_threads, mark_thread_read, thread_messages
 from .forms import ProfileEditForm
 from django.contrib import messages as django_messages
-from django.db import models
 
 User = get_user_model()
 
 @login_required
 def dashboard(request):
-    from archives.models import Archive
-    from insights.models import InsightPost, EditSuggestion
-    from books.models import BookReview
-    
-    # Get user's data
-    messages_threads = request.user.message_threads.all()
-    
-    # My Insights (published and pending)
-    my_insights = InsightPost.objects.filter(
-        author=request.user
-    ).filter(
-        models.Q(is_published=True) | models.Q(pending_approval=True)
-    ).order_by('-created_at')
-    
-    # My Drafts (saved progress, not submitted)
-    my_drafts = InsightPost.objects.filter(
-        author=request.user,
-        is_published=False,
-        pending_approval=False
-    ).order_by('-updated_at')
-    
-    # My Book Reviews
-    my_book_reviews = BookReview.objects.filter(reviewer=request.user).order_by('-created_at')
-    
-    # My Archives
-    my_archives = Archive.objects.filter(uploaded_by=request.user).order_by('-created_at')
-    
-    # Edit Suggestions Received on my posts
-    my_posts = InsightPost.objects.filter(author=request.user)
-    edit_suggestions = EditSuggestion.objects.filter(
-        post__in=my_posts,
-        is_approved=False,
-        is_rejected=False
-    ).select_related('post', 'suggested_by').order_by('-created_at')
-    
+    # Counts and newest items only; each tab loads its own panel
     context = {
-        'messages_threads': messages_threads,
-        'my_insights': my_insights,
-        'my_drafts': my_drafts,
-        'my_book_reviews': my_book_reviews,
-        'my_archives': my_archives,
-        'edit_suggestions': edit_suggestions,
+        'summary': dashboard_summary(request.user),
     }
-    
     return render(request, 'users/dashboard.html', context)
 
+@login_required
+def dashboard_panel(request, panel):
+    panel = PANELS.get(panel)
+    if panel is None:
+        raise Http404('Unknown dashboard panel')
+    page = panel.page(request.user, request.GET.get('cursor'), request.GET)
+    return render(request, panel.template, {'page': page, 'panel': panel})
+
 def profile_view(request, username):
     from archives.models import Archive
     from insights.models import InsightPost
@@ -96,8 +66,7 @@ def profile_edit(request, username):
 
 @login_required
 def message_inbox(request):
-    threads = request.user.message_threads.all()
-    return render(request, 'users/inbox.html', {'threads': threads})
+    return render(request, 'users/inbox.html', {'threads': inbox_threads(request.user)})
 
 @login_required
 def message_thread(request, thread_id):
@@ -107,8 +76,13 @@ def message_thread(request, thread_id):
         if content:
             Message.objects.create(thread=thread, sender=request.user, content=content)
             return redirect('users:thread', thread_id=thread_id)
-    thread.messages.exclude(sender=request.user).update(is_read=True)
-    return render(request, 'users/thread.html', {'thread': thread})
+    page = thread_messages(thread, request.GET.get('cursor'))
+    # Older messages are only ever loaded into an open thread
+    if page.cursor:
+        return render(request, 'users/partials/thread_messages.html', {'thread': thread, 'page': page})
+    newest = page.object_list[-1].created_at if page else None
+    mark_thread_read(thread, request.user, newest)
+    return render(request, 'users/thread.html', {'thread': thread, 'page': page})
 
 @login_required
 def compose_message(request, username):